@@ -0,0 +1,47 @@
+"""
+Times ChildrenGenerator.generate with each child's draws served from blocks of uniforms drawn in bulk
+(buffered_random=True, the default) against a Random per child seeded from its own SeedSequence
+(buffered_random=False). Also times the scalar draws the generators make most, and setting up a child's stream.
+
+Run with: python benchmarks/buffered_random.py [num_children]
+"""
+import datetime
+import sys
+import time
+import timeit
+import numpy as np
+from cscsynth import ChildrenGenerator
+from cscsynth.rng import BufferedRandom, Random, UniformBlocks
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+buffered, unbuffered = BufferedRandom(1), Random(1)
+for statement in ['random()', 'randint(1, 30)', "choice('ABCDEFGH')", 'poisson(0.15)']:
+    buffered_time = min(timeit.repeat(f'rng.{statement}', globals={'rng': buffered}, number=200_000, repeat=3))
+    unbuffered_time = min(timeit.repeat(f'rng.{statement}', globals={'rng': unbuffered}, number=200_000, repeat=3))
+    print(f'{statement:<20} Random {unbuffered_time * 5000:6.0f} ns, BufferedRandom {buffered_time * 5000:6.0f} ns')
+
+entropy = np.random.SeedSequence(1).entropy
+blocks = UniformBlocks(entropy)
+start = time.perf_counter()
+for index in range(num_children):
+    Random(int.from_bytes(np.random.SeedSequence(entropy, spawn_key=(index,)).generate_state(4).tobytes(), 'little'))
+seeded_time = time.perf_counter() - start
+start = time.perf_counter()
+for rng in blocks.streams(range(num_children)):
+    pass
+blocks_time = time.perf_counter() - start
+print(f'Stream per child:    Random {seeded_time / num_children * 1e6:6.1f} us, '
+      f'UniformBlocks {blocks_time / num_children * 1e6:6.1f} us')
+
+times = {True: [], False: []}
+for _ in range(3):
+    for buffered_random in times:
+        gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1),
+                                seed=0, buffered_random=buffered_random)
+        start = time.perf_counter()
+        gen.generate(num_children)
+        times[buffered_random].append(time.perf_counter() - start)
+
+print(f'generate({num_children}): Random {min(times[False]):.2f} s, BufferedRandom {min(times[True]):.2f} s '
+      f'({min(times[False]) / min(times[True]):.2f}x faster)')
@@ -0,0 +1,35 @@
+"""
+Compares the event-driven episode change sampling in generate_care_episode with the original approach of
+rolling for a change on every day of the care period.
+
+Run with: python benchmarks/care_episode.py
+"""
+import random
+import timeit
+from cscsynth.types import Probabilities
+from cscsynth.generators import _days_until_event
+
+probabilities = Probabilities()
+lengths = [random.randint(0, 6000) for _ in range(2000)]
+
+
+def per_day():
+    for length in lengths:
+        changes = [i for i in range(length) if random.random() < probabilities.daily_episode_changing]
+
+
+def event_driven():
+    for length in lengths:
+        changes = []
+        change_day = _days_until_event(probabilities.daily_episode_changing)
+        while change_day < length:
+            changes.append(change_day)
+            change_day += 1 + _days_until_event(probabilities.daily_episode_changing)
+
+
+per_day_time = min(timeit.repeat(per_day, number=1, repeat=3))
+event_driven_time = min(timeit.repeat(event_driven, number=1, repeat=3))
+
+print(f'Care periods sampled: {len(lengths)} (mean length {sum(lengths) / len(lengths):.0f} days)')
+print(f'Per-day sampling:      {per_day_time * 1000:.1f} ms')
+print(f'Event-driven sampling: {event_driven_time * 1000:.1f} ms ({per_day_time / event_driven_time:.0f}x faster)')
@@ -0,0 +1,93 @@
+"""
+Times snapshot_children_for_period, which shares unchanged records with the population, against the original
+implementation, which deep copied every child in the census and then every episode and missing period again. The
+memory allocated for the snapshots is measured in a second, traced pass.
+
+Also times snapshotting every collection year covered by the population, one call per year against a single
+snapshot_children_for_periods sweep.
+
+Run with: python benchmarks/census.py [num_children]
+"""
+import datetime
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period, snapshot_children_for_periods
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+population = gen.generate_arrays(num_children).to_children()
+census_start = datetime.datetime(2019, 4, 1)
+census_end = datetime.datetime(2020, 4, 1)
+
+
+def snapshot_with_deepcopy(start_date, end_date, all_children):
+    # The original implementation
+    children = [
+        deepcopy(c) for c in all_children
+        if min(e.start_date for e in c.episodes) < end_date and max(e.end_date for e in c.episodes) > start_date
+    ]
+
+    for c in children:
+        if c.mother_child_dob is not None and c.mother_child_dob > end_date:
+            c.mother_child_dob = None
+
+        if (end_date - c.dob).days / 365 <= 17:
+            c.leaving_care_data = None
+
+        if c.adoption_data is not None:
+            starts_in_year = start_date < c.adoption_data.start_date < end_date
+            ends_in_year = start_date < c.adoption_data.end_date < end_date
+            if starts_in_year and c.adoption_data.end_date > end_date:
+                c.adoption_data.end_date = None
+                c.adoption_data.reason_ceased = None
+            elif not (starts_in_year or ends_in_year):
+                c.adoption_data = None
+
+        if min(e.start_date for e in c.episodes) > end_date - datetime.timedelta(days=365):
+            c.outcomes_data = None
+
+        c.missing_periods = [deepcopy(m) for m in c.missing_periods if start_date < m.start_date < end_date or start_date < m.end_date < end_date]
+        for episode in c.missing_periods:
+            if episode.end_date > end_date:
+                episode.end_date = None
+
+        c.episodes = [deepcopy(e) for e in c.episodes if start_date < e.start_date < end_date or start_date < e.end_date < end_date]
+        for episode in c.episodes:
+            if episode.end_date > end_date:
+                episode.end_date = None
+
+    return children
+
+
+print(f'Children: {num_children}')
+for name, snapshot in [('deepcopy', snapshot_with_deepcopy), ('shared', snapshot_children_for_period)]:
+    start = time.perf_counter()
+    children = snapshot(census_start, census_end, population)
+    elapsed = time.perf_counter() - start
+    del children
+
+    tracemalloc.start()
+    children = snapshot(census_start, census_end, population)
+    allocated = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    print(f'{name:<10} {elapsed:6.2f} s  {allocated:7.1f} MB for {len(children)} snapshots')
+    del children
+
+periods = [(datetime.datetime(year, 4, 1), datetime.datetime(year + 1, 3, 31)) for year in range(2015, 2021)]
+
+start = time.perf_counter()
+per_year = [snapshot_children_for_period(period_start, period_end, population) for period_start, period_end in periods]
+per_year_time = time.perf_counter() - start
+del per_year
+
+start = time.perf_counter()
+swept = snapshot_children_for_periods(periods, population)
+sweep_time = time.perf_counter() - start
+
+print(f'{len(periods)} years, {sum(len(children) for children in swept.values())} snapshots')
+print(f'one call per year  {per_year_time:6.2f} s')
+print(f'single sweep       {sweep_time:6.2f} s')
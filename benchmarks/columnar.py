@@ -0,0 +1,37 @@
+"""
+Compares the object based ChildrenGenerator.generate with the columnar ChildrenGenerator.generate_arrays, in
+time and peak traced memory. Timings are taken without tracing, as tracemalloc slows the object path down a lot.
+
+Run with: python benchmarks/columnar.py [num_children]
+"""
+import datetime
+import sys
+import time
+import tracemalloc
+from cscsynth import ChildrenGenerator
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+
+    del result
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+_, object_time, object_peak = measure(gen.generate, num_children)
+arrays, array_time, array_peak = measure(gen.generate_arrays, num_children)
+_, convert_time, _ = measure(arrays.to_children)
+
+print(f'Children: {num_children}')
+print(f'generate:        {object_time:7.2f} s  {object_peak:8.1f} MiB')
+print(f'generate_arrays: {array_time:7.2f} s  {array_peak:8.1f} MiB ({object_time / array_time:.0f}x faster)')
+print(f'to_children:     {convert_time:7.2f} s')
@@ -0,0 +1,41 @@
+"""
+Times taking a census and writing it as CSV from ChildrenArrays, with snapshot_arrays_for_period and
+create_csv_from_arrays, against converting the population to Child objects and using snapshot_children_for_period
+and create_csv.
+
+Run with: python benchmarks/columnar_census.py [num_children]
+"""
+import datetime
+import sys
+import tempfile
+import time
+from pathlib import Path
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_arrays_for_period, snapshot_children_for_period
+from cscsynth.csv import create_csv, create_csv_from_arrays
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+arrays = gen.generate_arrays(num_children)
+census_start = datetime.datetime(2019, 4, 1)
+census_end = datetime.datetime(2020, 3, 31)
+
+with tempfile.TemporaryDirectory() as directory:
+    start = time.perf_counter()
+    children = snapshot_children_for_period(census_start, census_end, arrays.to_children())
+    objects_snapshot = time.perf_counter() - start
+    start = time.perf_counter()
+    create_csv(children, Path(directory) / 'objects')
+    objects_csv = time.perf_counter() - start
+    del children
+
+    start = time.perf_counter()
+    snapshot = snapshot_arrays_for_period(census_start, census_end, arrays)
+    arrays_snapshot = time.perf_counter() - start
+    start = time.perf_counter()
+    create_csv_from_arrays(snapshot, Path(directory) / 'arrays')
+    arrays_csv = time.perf_counter() - start
+
+print(f'{num_children} children, {len(snapshot)} in the census')
+print(f'objects: to_children + snapshot {objects_snapshot:7.2f} s, create_csv             {objects_csv:7.2f} s')
+print(f'arrays:  snapshot               {arrays_snapshot:7.2f} s, create_csv_from_arrays {arrays_csv:7.2f} s')
@@ -0,0 +1,36 @@
+"""
+Times create_csv, which renders each table straight to CSV text, against building the same tables as DataFrames with
+the create_* functions and writing them with DataFrame.to_csv.
+
+Run with: python benchmarks/csv_writer.py [num_children]
+"""
+import datetime
+import sys
+import tempfile
+import time
+from pathlib import Path
+from cscsynth import ChildrenGenerator
+from cscsynth.csv import TABLES, create_csv, _ChildFields
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+children = gen.generate_arrays(num_children).to_children()
+
+with tempfile.TemporaryDirectory() as output_dir:
+    start = time.perf_counter()
+    create_csv(children, output_dir)
+    csv_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for table in TABLES:
+        table.dataframe(children).to_csv(Path(output_dir) / table.file_name, index=False)
+    dataframe_time = time.perf_counter() - start
+
+fields = _ChildFields.from_children(children)
+print(f'Children: {num_children}')
+print(f'create_csv:              {csv_time:6.2f} s')
+print(f'create_* and to_csv:     {dataframe_time:6.2f} s')
+for table in TABLES:
+    start = time.perf_counter()
+    rows = len(table.lines(fields))
+    print(f'  {table.file_name:<24} {time.perf_counter() - start:6.2f} s to render {rows} rows')
@@ -0,0 +1,104 @@
+"""
+Times generate_care_episode, which builds the episodes as lists of fields with the dates as day numbers and makes
+the Episode objects and datetimes once at the end, against the original implementation, which did its date
+arithmetic with datetimes and timedeltas and deep copied the previous episode for every change. Both are given the
+same random streams, so they draw the same episodes.
+
+Also times ChildrenGenerator.generate as a whole.
+
+Run with: python benchmarks/day_ordinals.py [num_children]
+"""
+import datetime
+import sys
+import time
+from copy import deepcopy
+from cscsynth import ChildrenGenerator
+from cscsynth.generators import (
+    _days_until_event,
+    _generate_legal_status,
+    _generate_reason_end,
+    CIN_CODES,
+    generate_care_episode,
+    generate_reason_place_change,
+    PLACEMENT_PROVIDER_SAMPLERS,
+    PLACEMENT_TYPE_SAMPLERS_BY_AGE,
+    reason_for_episode_change_sampler,
+)
+from cscsynth.postcodes import RANDOM_POSTCODES
+from cscsynth.rng import Random
+from cscsynth.types import Episode, Probabilities, intern_date
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+probabilities = Probabilities()
+start_date = datetime.datetime(2015, 1, 1)
+
+
+def new_placement_with_datetimes(current_date, dob, rng):
+    age_in_years = (current_date - dob) / datetime.timedelta(days=365)
+    placement_sampler = next(sampler for max_age, sampler in PLACEMENT_TYPE_SAMPLERS_BY_AGE if age_in_years < max_age)
+    placement_type = placement_sampler(rng)
+    placement_code = PLACEMENT_PROVIDER_SAMPLERS[placement_type](rng)
+    return (placement_type, placement_code, RANDOM_POSTCODES.postcode(rng), RANDOM_POSTCODES.postcode(rng),
+            rng.randint(1000000, 9999999))
+
+
+def care_episode_with_datetimes(start_date, length_of_episode, probabilities, dob, rng):
+    # The original implementation
+    place, place_provider, home_postcode, place_postcode, urn = new_placement_with_datetimes(start_date, dob, rng)
+    episodes = [Episode(
+        start_date=start_date, end_date=None, reason_end=None, reason_for_new_episode='S',
+        legal_status=_generate_legal_status(rng), cin=rng.choice(CIN_CODES), place=place,
+        place_provider=place_provider, home_postcode=home_postcode, place_postcode=place_postcode, urn=urn,
+    )]
+    reason_sampler = reason_for_episode_change_sampler(probabilities)
+    change_day = _days_until_event(probabilities.daily_episode_changing, rng)
+    while change_day < length_of_episode:
+        current_date = intern_date(start_date + datetime.timedelta(days=change_day))
+        last_episode = episodes[-1]
+        last_episode.end_date = current_date
+        last_episode.reason_end = 'X1'
+        new_reason = reason_sampler(rng)
+        next_episode = deepcopy(last_episode)
+        next_episode.start_date = current_date
+        next_episode.end_date = None
+        next_episode.reason_for_new_episode = new_reason
+        if new_reason in ['L', 'B', 'U']:
+            next_episode.legal_status = _generate_legal_status(rng)
+        if new_reason in ['P', 'B']:
+            (next_episode.place, next_episode.place_provider, next_episode.home_postcode, next_episode.place_postcode,
+             next_episode.urn) = new_placement_with_datetimes(current_date, dob, rng)
+            last_episode.reason_place_change = generate_reason_place_change(rng)
+        episodes.append(next_episode)
+        change_day += 1 + _days_until_event(probabilities.daily_episode_changing, rng)
+    episodes[-1].end_date = intern_date(start_date + datetime.timedelta(days=length_of_episode))
+    episodes[-1].reason_end = _generate_reason_end(rng)
+    return episodes
+
+
+setup_rng = Random(0)
+periods = [
+    (start_date + datetime.timedelta(days=setup_rng.randint(0, 2000)), setup_rng.randint(0, 4000),
+     datetime.datetime(2003, 1, 1) + datetime.timedelta(days=setup_rng.randint(0, 4000)))
+    for _ in range(num_children)
+]
+
+
+def time_care_episodes(function):
+    rng = Random(1)
+    start = time.perf_counter()
+    episodes = [function(period_start, length, probabilities, dob, rng) for period_start, length, dob in periods]
+    return time.perf_counter() - start, episodes
+
+
+datetime_time, datetime_episodes = time_care_episodes(care_episode_with_datetimes)
+days_time, days_episodes = time_care_episodes(generate_care_episode)
+assert datetime_episodes == days_episodes
+
+print(f'{num_children} care periods, {sum(len(e) for e in days_episodes)} episodes')
+print(f'datetimes and deepcopy: {datetime_time:7.2f} s')
+print(f'day numbers:            {days_time:7.2f} s ({datetime_time / days_time:.1f}x faster)')
+
+gen = ChildrenGenerator(start_date=start_date, end_date=datetime.datetime(2021, 1, 1), seed=0)
+start = time.perf_counter()
+gen.generate(num_children)
+print(f'ChildrenGenerator.generate({num_children}): {time.perf_counter() - start:.2f} s')
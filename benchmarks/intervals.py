@@ -0,0 +1,50 @@
+"""
+Times the PopulationIndex against scanning the population: building the index, snapshotting short census periods
+with and without it, and counting the children looked after on each day of a year.
+
+Run with: python benchmarks/intervals.py [num_children]
+"""
+import datetime
+import sys
+import time
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period
+from cscsynth.intervals import PopulationIndex
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+arrays = gen.generate_arrays(num_children)
+population = arrays.to_children()
+
+print(f'Children: {num_children}')
+
+start = time.perf_counter()
+index = PopulationIndex.from_children(population)
+print(f'index from children  {time.perf_counter() - start:6.2f} s')
+
+start = time.perf_counter()
+PopulationIndex.from_arrays(arrays)
+print(f'index from arrays    {time.perf_counter() - start:6.2f} s')
+
+# A month long census each quarter
+periods = [
+    (datetime.datetime(year, month, 1), datetime.datetime(year, month + 1, 1))
+    for year in range(2016, 2021) for month in (1, 4, 7, 10)
+]
+for name, kwargs in [('scan', {}), ('index', {'index': index})]:
+    start = time.perf_counter()
+    snapshots = sum(len(snapshot_children_for_period(s, e, population, **kwargs)) for s, e in periods)
+    print(f'{len(periods)} monthly snapshots, {name:<5} {time.perf_counter() - start:6.2f} s  ({snapshots} snapshots)')
+
+first_day, last_day = datetime.datetime(2019, 4, 1), datetime.datetime(2020, 3, 31)
+days = [first_day + datetime.timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+
+start = time.perf_counter()
+scanned = [sum(any(e.start_date <= d < e.end_date for e in c.episodes) for c in population) for d in days[::30]]
+scan_time = (time.perf_counter() - start) * len(days) / len(days[::30])
+print(f'looked after per day, scan   {scan_time:8.2f} s (estimated from every 30th day)')
+
+start = time.perf_counter()
+counts = index.looked_after_per_day(first_day, last_day)
+print(f'looked after per day, index  {time.perf_counter() - start:8.4f} s')
+assert counts[::30].tolist() == scanned
@@ -0,0 +1,59 @@
+"""
+Compares the peak memory (max RSS) of the list based pipeline (generate, snapshot_children_for_period, create_csv and
+create_xml) with the streaming pipeline (iter_children and iter_snapshot_children_for_period feeding the same
+writers) as the number of children grows. Each run is made in a fresh process, as max RSS never goes down.
+
+Streaming memory still grows at first, until the census children fill a whole chunk of the writers (about 50k
+children for the default census and chunk size), and is flat from then on.
+
+Run with: python benchmarks/memory.py [num_children ...]
+"""
+import datetime
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from cscsynth import ChildrenGenerator
+from cscsynth.census import iter_snapshot_children_for_period, snapshot_children_for_period
+from cscsynth.csv import create_csv
+from cscsynth.xml import create_xml
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2021, 1, 1)
+census_start = datetime.datetime(2019, 4, 1)
+census_end = datetime.datetime(2020, 4, 1)
+
+
+def run(mode, num_children, output_dir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=0)
+    if mode == 'list':
+        children = snapshot_children_for_period(census_start, census_end, gen.generate(num_children))
+        create_csv(children, output_dir)
+        create_xml(children, output_dir / 'fake_903.xml')
+    else:
+        # Each writer consumes its own lazy stream, as an iterator can only be read once
+        streams = [iter_snapshot_children_for_period(census_start, census_end, gen.iter_children(num_children))
+                   for _ in range(2)]
+        create_csv(streams[0], output_dir)
+        create_xml(streams[1], output_dir / 'fake_903.xml')
+
+    # ru_maxrss is in kilobytes on Linux
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(sys.argv[2], int(sys.argv[3]), Path(sys.argv[4]))
+        sys.exit()
+
+    sizes = [int(n) for n in sys.argv[1:]] or [10_000, 20_000, 40_000]
+    print(f'{"Children":>10} {"List (MB)":>10} {"Streaming (MB)":>15}')
+    for num_children in sizes:
+        peaks = []
+        for mode in ['list', 'streaming']:
+            with tempfile.TemporaryDirectory() as output_dir:
+                result = subprocess.run([sys.executable, __file__, '--run', mode, str(num_children), output_dir],
+                                        check=True, capture_output=True, text=True)
+            peaks.append(int(result.stdout))
+        print(f'{num_children:>10} {peaks[0]:>10} {peaks[1]:>15}')
@@ -0,0 +1,44 @@
+"""
+Compares the Parquet output of create_parquet with the CSV output of create_csv: the time to write each, the size of
+the files, and the time for a downstream reader to load every table back into pandas. Each is timed writing both Child
+objects and a ChildrenArrays.
+
+Run with: python benchmarks/parquet_writer.py [num_children]
+"""
+import datetime
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pandas as pd
+from cscsynth import ChildrenGenerator
+from cscsynth.csv import TABLES, create_csv, create_csv_from_arrays
+from cscsynth.parquet import create_parquet, create_parquet_from_arrays
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+arrays = gen.generate_arrays(num_children)
+children = arrays.to_children()
+
+print(f'Children: {num_children}')
+print(f'{"Format":<18} {"Write (s)":>10} {"Size (MB)":>10} {"Read (s)":>10}')
+for name, write, population, suffix, read in [
+    ('CSV', create_csv, children, '.csv', pd.read_csv),
+    ('Parquet', create_parquet, children, '.parquet', pd.read_parquet),
+    ('CSV (arrays)', create_csv_from_arrays, arrays, '.csv', pd.read_csv),
+    ('Parquet (arrays)', create_parquet_from_arrays, arrays, '.parquet', pd.read_parquet),
+]:
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        write(population, output_dir)
+        write_time = time.perf_counter() - start
+
+        paths = [Path(output_dir) / Path(table.file_name).with_suffix(suffix).name for table in TABLES]
+        size = sum(path.stat().st_size for path in paths) / 1e6
+
+        start = time.perf_counter()
+        for path in paths:
+            read(path)
+        read_time = time.perf_counter() - start
+
+    print(f'{name:<18} {write_time:>10.2f} {size:>10.1f} {read_time:>10.2f}')
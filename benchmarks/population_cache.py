@@ -0,0 +1,37 @@
+"""
+Times a PopulationCache miss (generating and storing a population) against a hit (loading it), for both engines.
+A hit on generate returns a ChildrenSequence, which decodes the children as they are used, so the time to decode
+them all is given as well.
+
+Run with: python benchmarks/population_cache.py [num_children]
+"""
+import datetime
+import sys
+import tempfile
+import time
+from cscsynth import ChildrenGenerator
+from cscsynth.cache import PopulationCache
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=1)
+
+with tempfile.TemporaryDirectory() as directory:
+    cache = PopulationCache(directory)
+    for engine in ['generate', 'generate_arrays']:
+        start = time.perf_counter()
+        getattr(cache, engine)(gen, num_children)
+        miss = time.perf_counter() - start
+
+        start = time.perf_counter()
+        population = getattr(cache, engine)(gen, num_children)
+        hit = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for child in population if engine == 'generate' else []:
+            pass
+        decode = time.perf_counter() - start
+
+        size = cache.path(gen, num_children, engine).stat().st_size
+        print(f'{engine:<16} {num_children} children: miss {miss:7.2f} s, hit {hit:6.2f} s, '
+              f'decoding {decode:5.2f} s, {size / 1e6:.1f} MB')
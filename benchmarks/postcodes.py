@@ -0,0 +1,55 @@
+"""
+Times the postcode providers: the original string concatenation in generators._generate_postcode, RandomPostcodes
+one at a time and in bulk, and a PostcodePool built from an ONS-style file of a million postcodes.
+
+Run with: python benchmarks/postcodes.py
+"""
+import string
+import tempfile
+import time
+import timeit
+from pathlib import Path
+import numpy as np
+from cscsynth.postcodes import PostcodePool, RandomPostcodes
+from cscsynth.rng import Random
+
+num_draws = 200_000
+pool_size = 1_000_000
+
+
+def concatenated_postcode(rng):
+    # The original implementation
+    first_letter = rng.choice(string.ascii_uppercase)
+    numbers = rng.randint(1, 30)
+
+    last_number = rng.randint(1, 9)
+    last_letters = ''.join(rng.choice(string.ascii_uppercase) for _ in range(2))
+
+    return first_letter + str(numbers) + ' ' + str(last_number) + last_letters
+
+
+def timed(function):
+    return min(timeit.repeat(function, number=1, repeat=3))
+
+
+random_postcodes = RandomPostcodes()
+rng = Random(0)
+print(f'Postcodes drawn: {num_draws}')
+print(f'concatenated           {timed(lambda: [concatenated_postcode(rng) for _ in range(num_draws)]) * 1000:7.1f} ms')
+print(f'RandomPostcodes        {timed(lambda: [random_postcodes.postcode(rng) for _ in range(num_draws)]) * 1000:7.1f} ms')
+print(f'RandomPostcodes, bulk  {timed(lambda: random_postcodes.postcodes(np.random.default_rng(0), num_draws)) * 1000:7.1f} ms')
+
+with tempfile.TemporaryDirectory() as directory:
+    source = Path(directory) / 'onspd.csv'
+    postcodes = random_postcodes.postcodes(np.random.default_rng(1), pool_size)
+    with open(source, 'w') as f:
+        f.write('pcds,doterm\n')
+        f.writelines(f'{postcode.decode()},\n' for postcode in postcodes)
+
+    start = time.perf_counter()
+    pool = PostcodePool.build(source, Path(directory) / 'postcodes.npy')
+    build_time = time.perf_counter() - start
+
+    print(f'Pool of {len(pool)} built in {build_time:.2f} s ({(Path(directory) / "postcodes.npy").stat().st_size / 1e6:.1f} MB)')
+    print(f'PostcodePool           {timed(lambda: [pool.postcode(rng) for _ in range(num_draws)]) * 1000:7.1f} ms')
+    print(f'PostcodePool, bulk     {timed(lambda: pool.postcodes(np.random.default_rng(0), num_draws)) * 1000:7.1f} ms')
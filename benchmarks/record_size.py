@@ -0,0 +1,41 @@
+"""
+Reports the memory used by a population of Child objects, as bytes per child and bytes per episode. Sizes are found
+by walking the objects reachable from the population and adding up sys.getsizeof, counting every object once, so
+values shared between records (interned codes and dates) only count towards the first record holding them.
+
+Both generation paths are measured: the per-child ChildrenGenerator.generate and the columnar generate_arrays
+converted with to_children.
+
+Run with: python benchmarks/record_size.py [num_children]
+"""
+import dataclasses
+import datetime
+import sys
+from cscsynth import ChildrenGenerator
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+
+
+def deep_size(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if dataclasses.is_dataclass(obj):
+        if hasattr(obj, '__dict__'):
+            size += sys.getsizeof(obj.__dict__)
+        size += sum(deep_size(getattr(obj, f.name), seen) for f in dataclasses.fields(obj))
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+print(f'Children: {num_children}')
+for name, children in [('generate', gen.generate(num_children)),
+                       ('to_children', gen.generate_arrays(num_children).to_children())]:
+    episodes = [e for c in children for e in c.episodes]
+    per_child = deep_size(children, set()) / len(children)
+    per_episode = deep_size(episodes, set()) / len(episodes)
+    print(f'{name:<12} {per_child:8.0f} bytes per child  {per_episode:6.0f} bytes per episode')
@@ -0,0 +1,62 @@
+"""
+Times the reviews stage of generation: the original day by day scan, generate_reviews (bisecting the
+cumulative episode lengths) and generate_reviews_batch (one searchsorted for all children).
+
+Run with: python benchmarks/reviews.py [num_children]
+"""
+import datetime
+import sys
+import time
+import numpy as np
+from cscsynth import ChildrenGenerator
+from cscsynth.columnar import generate_reviews_batch
+from cscsynth.generators import generate_reviews, _generate_review_code
+from cscsynth.rng import Random
+from cscsynth.types import Review
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+episodes_by_child = [child.episodes for child in gen.generate_arrays(num_children).to_children()]
+review_frequency = gen.probabilities.review_frequency
+
+
+def generate_reviews_day_by_day(episodes, review_frequency, rng):
+    # The original implementation, scanning every day in care for each review
+    total_days_in_care = sum((e.end_date - e.start_date).days for e in episodes)
+    num_reviews = max([total_days_in_care > 20, int(rng.poisson(review_frequency * total_days_in_care))])
+    review_days = [rng.randint(0, total_days_in_care - 1) for _ in range(num_reviews)]
+
+    reviews = []
+    current_days = 0
+    for e in episodes:
+        episode_length = (e.end_date - e.start_date).days
+        for episode_day in range(episode_length):
+            for review_day in review_days:
+                if review_day == current_days:
+                    reviews.append(Review(
+                        review_date=e.start_date + datetime.timedelta(days=episode_day),
+                        review_code=_generate_review_code(rng),
+                    ))
+            current_days += 1
+
+    return reviews
+
+
+def time_per_child(function):
+    rng = Random(0)
+    start = time.perf_counter()
+    num_reviews = sum(len(function(episodes, review_frequency, rng)) for episodes in episodes_by_child)
+    return time.perf_counter() - start, num_reviews
+
+
+day_by_day_time, day_by_day_reviews = time_per_child(generate_reviews_day_by_day)
+bisect_time, bisect_reviews = time_per_child(generate_reviews)
+
+start = time.perf_counter()
+batch_reviews = sum(len(r) for r in generate_reviews_batch(episodes_by_child, review_frequency, np.random.default_rng(0)))
+batch_time = time.perf_counter() - start
+
+print(f'Children: {num_children}')
+print(f'Day by day scan:        {day_by_day_time:7.2f} s ({day_by_day_reviews} reviews)')
+print(f'generate_reviews:       {bisect_time:7.2f} s ({bisect_reviews} reviews, {day_by_day_time / bisect_time:.0f}x faster)')
+print(f'generate_reviews_batch: {batch_time:7.2f} s ({batch_reviews} reviews, {day_by_day_time / batch_time:.0f}x faster)')
@@ -0,0 +1,48 @@
+"""
+Compares sampling placement types and providers with Random.choices, which rebuilds the cumulative weights on every
+call, against the samplers compiled once in cscsynth.generators. Both give the same values for the same seed.
+
+Run with: python benchmarks/samplers.py
+"""
+import timeit
+import numpy as np
+from cscsynth.generators import (
+    PLACEMENT_PROVIDER_CODES,
+    PLACEMENT_PROVIDER_SAMPLERS,
+    PLACEMENT_PROVIDER_WEIGHTS,
+    PLACEMENT_TYPE_SAMPLERS_BY_AGE,
+    PLACEMENT_TYPE_WEIGHTS_BY_AGE,
+)
+from cscsynth.rng import Random
+
+num_draws = 200_000
+placement_weights = PLACEMENT_TYPE_WEIGHTS_BY_AGE[1][1]
+placement_sampler = PLACEMENT_TYPE_SAMPLERS_BY_AGE[1][1]
+
+
+def with_choices():
+    rng = Random(0)
+    for _ in range(num_draws):
+        placement_type = rng.choices(list(placement_weights), weights=list(placement_weights.values()))[0]
+        rng.choices(PLACEMENT_PROVIDER_CODES, weights=PLACEMENT_PROVIDER_WEIGHTS[placement_type])[0]
+
+
+def with_samplers():
+    rng = Random(0)
+    for _ in range(num_draws):
+        placement_type = placement_sampler(rng)
+        PLACEMENT_PROVIDER_SAMPLERS[placement_type](rng)
+
+
+def bulk():
+    placement_sampler.sample(np.random.default_rng(0), num_draws)
+
+
+choices_time = min(timeit.repeat(with_choices, number=1, repeat=3))
+samplers_time = min(timeit.repeat(with_samplers, number=1, repeat=3))
+bulk_time = min(timeit.repeat(bulk, number=1, repeat=3))
+
+print(f'Placements sampled: {num_draws}')
+print(f'Random.choices:     {choices_time * 1000:7.1f} ms')
+print(f'Compiled samplers:  {samplers_time * 1000:7.1f} ms ({choices_time / samplers_time:.1f}x faster)')
+print(f'Bulk placement types: {bulk_time * 1000:5.1f} ms')
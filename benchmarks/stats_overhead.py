@@ -0,0 +1,42 @@
+"""
+Measures the cost of the instrumentation in cscsynth.stats, by generating and writing the same children with stats
+off and with them being collected, and prints the stats collected.
+
+Run with: python benchmarks/stats_overhead.py [num_children]
+"""
+import datetime
+import sys
+import tempfile
+import timeit
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period
+from cscsynth.csv import create_csv
+from cscsynth.stats import collect_stats
+from cscsynth.xml import create_xml
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+
+
+def run():
+    children = snapshot_children_for_period(datetime.datetime(2019, 4, 1), datetime.datetime(2020, 4, 1),
+                                            gen.generate(num_children))
+    with tempfile.TemporaryDirectory() as output_dir:
+        create_csv(children, output_dir)
+        create_xml(children, f'{output_dir}/fake_903.xml')
+
+
+def run_with_stats():
+    with collect_stats() as stats:
+        run()
+    return stats
+
+
+off = min(timeit.repeat(run, number=1, repeat=3))
+on = min(timeit.repeat(run_with_stats, number=1, repeat=3))
+
+print(f'Children: {num_children}')
+print(f'stats off  {off:6.2f} s')
+print(f'stats on   {on:6.2f} s ({(on / off - 1) * 100:+.1f}%)')
+print()
+print(run_with_stats().summary())
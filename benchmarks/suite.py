@@ -0,0 +1,168 @@
+"""
+Benchmark suite for the main steps of the pipeline: ChildrenGenerator.generate, generate_episodes, generate_reviews,
+snapshot_children_for_period, create_csv and create_xml, each at several population sizes. Every run uses the same
+seeds, so the work done is identical from run to run.
+
+Each benchmark is timed (best of --repeat runs), then run once more under tracemalloc for the peak memory it
+allocates. The results are written as JSON, along with the version, commit and environment they came from. Passing
+an earlier results file with --compare prints the change in each benchmark, and exits with an error if any got
+slower or bigger by more than --threshold.
+
+Run with: python benchmarks/suite.py [--sizes 1000 10000 100000] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period
+from cscsynth.csv import create_csv
+from cscsynth.generators import generate_episodes, generate_reviews
+from cscsynth.rng import Random
+from cscsynth.types import Probabilities
+from cscsynth.xml import create_xml
+
+SEED = 2021
+START_DATE = datetime.datetime(2015, 1, 1)
+END_DATE = datetime.datetime(2021, 1, 1)
+CENSUS_START = datetime.datetime(2019, 4, 1)
+CENSUS_END = datetime.datetime(2020, 4, 1)
+
+
+def benchmarks(num_children, output_dir):
+    """
+    :returns: The benchmarks for a population size, as (name, function) pairs. The population the later steps work
+        on is generated here, outside of any timing.
+    """
+    gen = ChildrenGenerator(start_date=START_DATE, end_date=END_DATE, seed=SEED)
+    population = gen.generate(num_children)
+    snapshot = snapshot_children_for_period(CENSUS_START, CENSUS_END, population)
+    probabilities = Probabilities()
+    dobs = [c.dob for c in population]
+    episodes = [c.episodes for c in population]
+
+    def episodes_for_all():
+        rng = Random(SEED)
+        for dob in dobs:
+            generate_episodes(START_DATE, dob, probabilities, rng)
+
+    def reviews_for_all():
+        rng = Random(SEED)
+        for child_episodes in episodes:
+            generate_reviews(child_episodes, probabilities.review_frequency, rng)
+
+    return [
+        ('generate', lambda: gen.generate(num_children)),
+        ('generate_episodes', episodes_for_all),
+        ('generate_reviews', reviews_for_all),
+        ('snapshot_children_for_period', lambda: snapshot_children_for_period(CENSUS_START, CENSUS_END, population)),
+        ('create_csv', lambda: create_csv(snapshot, output_dir)),
+        ('create_xml', lambda: create_xml(snapshot, output_dir / 'fake_903.xml')),
+    ]
+
+
+def measure(function, repeat, memory):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    result = {'seconds': min(times)}
+    if memory:
+        tracemalloc.start()
+        function()
+        result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    try:
+        from importlib.metadata import version
+        cscsynth_version = version('cscsynth')
+    except Exception:
+        cscsynth_version = None
+
+    return {
+        'version': cscsynth_version,
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the ratio of each result to the baseline.
+
+    :returns: The names of the benchmarks that got worse by more than the threshold.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for measure_name in ['seconds', 'peak_mb']:
+            if measure_name not in result or measure_name not in baseline[key]:
+                continue
+            ratio = result[measure_name] / max(baseline[key][measure_name], 1e-9)
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = '  REGRESSION'
+                regressions.append(f'{key} {measure_name}')
+            print(f'{key:<40} {measure_name:<8} {baseline[key][measure_name]:10.3f} -> {result[measure_name]:10.3f}'
+                  f'  {ratio:5.2f}x{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3, help='Runs to take the best time from')
+    parser.add_argument('--no-memory', action='store_true', help='Skip measuring peak memory')
+    parser.add_argument('--only', nargs='+', help='Names of the benchmarks to run')
+    parser.add_argument('--output', type=Path, default=Path('benchmark_results.json'))
+    parser.add_argument('--compare', type=Path, help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Fractional slowdown or growth that counts as a regression')
+    args = parser.parse_args()
+
+    results = {}
+    for num_children in args.sizes:
+        with tempfile.TemporaryDirectory() as output_dir:
+            for name, function in benchmarks(num_children, Path(output_dir)):
+                if args.only and name not in args.only:
+                    continue
+                result = measure(function, args.repeat, not args.no_memory)
+                results[f'{name}[{num_children}]'] = result
+                peak = f'{result["peak_mb"]:9.1f} MB' if 'peak_mb' in result else ''
+                print(f'{name:<30} {num_children:>8} {result["seconds"]:9.3f} s {peak}', flush=True)
+
+    args.output.write_text(json.dumps({'environment': environment(), 'results': results}, indent=2))
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regressions: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Measures the throughput of create_xml in MB/s of XML written, plain and gzip compressed, against building the whole
+EXPSSDA903 tree in memory and writing it with ElementTree.write, as create_xml used to. The peak memory of each
+writer is measured in a second, traced pass.
+
+Run with: python benchmarks/xml_writer.py [num_children]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period
+from cscsynth.xml import create_xml, _create_child_element
+
+num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=0)
+children = snapshot_children_for_period(datetime.datetime(2019, 4, 1), datetime.datetime(2020, 4, 1),
+                                        gen.generate_arrays(num_children).to_children())
+
+
+def create_xml_in_memory(children, file_name):
+    root = ET.Element('EXPSSDA903')
+    root.extend(_create_child_element(child) for child in children)
+    ET.ElementTree(element=root).write(file_name, xml_declaration=True)
+
+
+writers = [
+    ('ElementTree.write', create_xml_in_memory),
+    ('create_xml', create_xml),
+    ('create_xml (gzip)', lambda children, file_name: create_xml(children, file_name, compress=True)),
+]
+
+with tempfile.TemporaryDirectory() as output_dir:
+    output_path = os.path.join(output_dir, 'fake_903.xml')
+
+    create_xml(children, output_path)
+    xml_mb = os.path.getsize(output_path) / 1e6
+    print(f'Children: {num_children} ({len(children)} in the census), {xml_mb:.1f} MB of XML')
+
+    for name, writer in writers:
+        start = time.perf_counter()
+        writer(children, output_path)
+        elapsed = time.perf_counter() - start
+        file_mb = os.path.getsize(output_path) / 1e6
+
+        tracemalloc.start()
+        writer(children, output_path)
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+        print(f'{name:<20} {elapsed:6.2f} s {xml_mb / elapsed:6.1f} MB/s  file {file_mb:6.1f} MB  peak {peak:7.1f} MB')
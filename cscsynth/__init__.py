@@ -1 +1,4 @@
-from .childrengenerator import ChildrenGenerator
\ No newline at end of file
+__version__ = '0.1.0'
+
+from .childrengenerator import ChildrenGenerator
+from .columnar import ChildrenArrays
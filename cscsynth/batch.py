@@ -0,0 +1,196 @@
+import csv
+import datetime
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .census import Period, write_census_for_periods
+from .childrengenerator import CHUNK_SIZE, ChildrenGenerator
+from .ids import DEFAULT_UPN_NUMBER_RANGE, IdService, child_id_range_for
+from .stats import collect_stats
+from .types import Probabilities
+
+
+@dataclass
+class LocalAuthority:
+    """
+    The population to generate for one local authority.
+
+    :param name: The name of the local authority, which is also the name of its output directory, so must be a
+        single path component such as "Barnet".
+    :param num_children: The number of children in the population.
+    :param probabilities: The probabilities to generate the population with.
+    :param seed: The seed for the population. If None, one is derived from the seed of the batch.
+    """
+    name: str
+    num_children: int
+    probabilities: Probabilities = field(default_factory=Probabilities)
+    seed: Optional[int] = None
+
+
+def read_manifest(file_name: Union[Path, str]) -> List[LocalAuthority]:
+    """
+    Reads a manifest of local authorities from a JSON file holding a list of objects with a name, num_children and
+    optionally a seed and probabilities, e.g.
+
+        [{"name": "Barnet", "num_children": 5000, "probabilities": {"is_uasc": 0.1}}, ...]
+
+    Any probabilities not given take their default values.
+
+    :param file_name: The manifest file.
+    :returns: The local authorities in the manifest.
+    """
+    specs = json.loads(Path(file_name).read_text())
+    return [
+        LocalAuthority(
+            name=spec['name'],
+            num_children=spec['num_children'],
+            probabilities=Probabilities(**spec.get('probabilities', {})),
+            seed=spec.get('seed'),
+        )
+        for spec in specs
+    ]
+
+
+def generate_local_authorities(local_authorities: Sequence[LocalAuthority], output_dir: Union[Path, str],
+                               start_date: datetime.datetime, end_date: datetime.datetime, periods: Sequence[Period],
+                               file_format: str = 'csv', seed: Optional[int] = None, workers: Optional[int] = None,
+                               chunk_size: int = CHUNK_SIZE, child_id_range: Optional[Tuple[int, int]] = None,
+                               upn_number_range: Tuple[int, int] = DEFAULT_UPN_NUMBER_RANGE) -> Dict[str, Any]:
+    """
+    Generates a population for each local authority and writes its census for each period into a directory named
+    after the local authority, e.g. output_dir/Barnet/2019-04-01_2020-03-31. Each local authority is streamed from
+    generation to the writers as by write_census_for_periods, and with workers the local authorities are generated
+    side by side across a pool of processes.
+
+    Child ids and UPNs are unique across all of the local authorities: they share one IdService key and id ranges,
+    and each takes the ids of its own range of indices, following on from the local authority before it.
+
+    An index of the batch is written to output_dir/index.json, with the settings of the run and the seed, index range
+    and output directory of each local authority, and every child is listed with their local authority in
+    output_dir/children.csv.
+
+    :param local_authorities: The local authorities to generate.
+    :param output_dir: The directory to write the local authority directories and the index into.
+    :param start_date: No episode will have a start date before this date.
+    :param end_date: Missing periods start before this date.
+    :param periods: The (start_date, end_date) of each census period.
+    :param file_format: 'csv', 'xml' or 'parquet'.
+    :param seed: Seed for the batch, from which the id key and the seeds of the local authorities without one are
+        derived. The same seed and manifest give the same output.
+    :param workers: If more than 1, the local authorities are generated across a pool of this many processes.
+    :param chunk_size: The number of children generated and written at a time.
+    :param child_id_range: The smallest and largest child id, inclusive. By default, the default range of IdService,
+        widened if need be to fit the children of every local authority.
+    :param upn_number_range: The smallest and largest number for the digits of a UPN, inclusive.
+    :returns: The index, as written to index.json.
+    :raises ValueError: If the local authority names aren't unique, or aren't usable as directory names, or if there
+        are more children than ids. These are checked before anything is written.
+    """
+    names = [la.name for la in local_authorities]
+    if len(set(names)) != len(names):
+        raise ValueError('Local authority names must be unique, as they name the output directories')
+    for name in names:
+        _check_directory_name(name)
+
+    seed_sequence = np.random.SeedSequence(seed)
+    key = int(seed_sequence.generate_state(1, np.uint64)[0])
+
+    offsets = np.cumsum([0] + [la.num_children for la in local_authorities]).tolist()
+    child_id_range = tuple(child_id_range or child_id_range_for(offsets[-1]))
+    upn_number_range = tuple(upn_number_range)
+    capacity = IdService(key, child_id_range, upn_number_range).capacity
+    if offsets[-1] > capacity:
+        raise ValueError(f'Only {capacity} children can be given unique ids, but {offsets[-1]} were asked for')
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    for i, la in enumerate(local_authorities):
+        la_seed = la.seed
+        if la_seed is None:
+            la_seed = int(np.random.SeedSequence(seed_sequence.entropy, spawn_key=(i,)).generate_state(1, np.uint64)[0])
+        jobs.append(dict(
+            la=la, seed=la_seed, key=key, child_id_range=child_id_range, upn_number_range=upn_number_range,
+            offset=offsets[i], output_dir=output_dir / la.name,
+            start_date=start_date, end_date=end_date, periods=list(periods), file_format=file_format,
+            chunk_size=chunk_size,
+        ))
+
+    if workers is None or workers <= 1:
+        results = [_generate_local_authority(**job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # The largest local authorities are started first, so that they don't hold up the end of the batch
+            order = sorted(range(len(jobs)), key=lambda i: -local_authorities[i].num_children)
+            futures = {i: pool.submit(_generate_local_authority, **jobs[i]) for i in order}
+            results = [futures[i].result() for i in range(len(jobs))]
+
+    index = {
+        'start_date': f'{start_date:%Y-%m-%d}',
+        'end_date': f'{end_date:%Y-%m-%d}',
+        'periods': [[f'{period_start:%Y-%m-%d}', f'{period_end:%Y-%m-%d}'] for period_start, period_end in periods],
+        'format': file_format,
+        'seed': seed_sequence.entropy,
+        'id_key': key,
+        'child_id_range': list(child_id_range),
+        'upn_number_range': list(upn_number_range),
+        'local_authorities': results,
+    }
+    (output_dir / 'index.json').write_text(json.dumps(index, indent=2))
+    ids = IdService(key, child_id_range, upn_number_range)
+    _write_children_index(local_authorities, offsets, ids, output_dir / 'children.csv')
+    return index
+
+
+def _check_directory_name(name: str):
+    # The name is joined onto the output directory, so anything other than a single plain path component could
+    # write outside of it, into a nested directory, or over the index files
+    if (name in ('', '.', '..', 'index.json', 'children.csv') or '\0' in name
+            or PurePosixPath(name).name != name or PureWindowsPath(name).name != name):
+        raise ValueError(f'Local authority name {name!r} must be a single directory name, with no path separators')
+
+
+def _generate_local_authority(la: LocalAuthority, seed: int, key: int, child_id_range: Tuple[int, int],
+                              upn_number_range: Tuple[int, int], offset: int, output_dir: Path,
+                              start_date: datetime.datetime, end_date: datetime.datetime, periods: List[Period],
+                              file_format: str, chunk_size: int) -> Dict[str, Any]:
+    # Runs in the worker processes, so must be a module level function
+    ids = IdService(key, child_id_range, upn_number_range, offset=offset)
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, probabilities=la.probabilities, seed=seed,
+                            ids=ids)
+
+    start = time.perf_counter()
+    with collect_stats() as stats:
+        write_census_for_periods(periods, gen.iter_children(la.num_children, chunk_size), output_dir, file_format,
+                                 chunk_size)
+
+    return {
+        'name': la.name,
+        'num_children': la.num_children,
+        'seed': seed,
+        'first_index': offset,
+        'census_records': stats['snapshot'].items,
+        'seconds': round(time.perf_counter() - start, 3),
+        'directory': output_dir.name,
+        'probabilities': asdict(la.probabilities),
+    }
+
+
+def _write_children_index(local_authorities: Sequence[LocalAuthority], offsets: List[int], batch_ids: IdService,
+                          file_name: Path):
+    with open(file_name, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['local_authority', 'child_id', 'upn'])
+        for la, offset in zip(local_authorities, offsets):
+            ids = IdService(batch_ids.key, batch_ids.child_id_range, batch_ids.upn_number_range, offset=offset)
+            # Written in blocks, so that the ids of a large local authority are never all in memory at once
+            for start in range(0, la.num_children, CHUNK_SIZE):
+                indices = np.arange(start, min(start + CHUNK_SIZE, la.num_children))
+                upns = np.char.decode(ids.upns(indices), 'ascii')
+                writer.writerows(zip([la.name] * len(indices), ids.child_ids(indices).tolist(), upns.tolist()))
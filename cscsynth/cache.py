@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from . import __version__
+from .childrengenerator import ChildrenGenerator
+from .columnar import ChildrenArrays
+from .population import ChildrenSequence
+from .postcodes import PostcodePool, PostcodeProvider, RandomPostcodes
+from .stats import add, stage
+from .types import Child
+
+# Changed whenever the layout of the cached files, or the population generated from the same settings, changes, so
+# that files in an older layout or of an older population are never read
+CACHE_FORMAT = 2
+
+_SUFFIX = '.npz'
+
+
+def fingerprint(gen: ChildrenGenerator, num_children: int, engine: str = 'generate') -> str:
+    """
+    Fingerprints everything that determines the population a generator makes: the library version, the engine,
+    the number of children, the dates, the seed and random streams, every probability, the id assignment and the
+    postcode provider.
+    Two calls give the same fingerprint exactly when they would generate the same population.
+
+    :param gen: The generator.
+    :param num_children: The number of children in the population.
+    :param engine: 'generate' or 'generate_arrays', which draw different populations from the same settings.
+    :returns: The fingerprint, as a hex string.
+    """
+    config = {
+        'format': CACHE_FORMAT,
+        'version': __version__,
+        'engine': engine,
+        'num_children': num_children,
+        'start_date': gen.start_date.isoformat(),
+        'end_date': gen.end_date.isoformat(),
+        'entropy': gen.entropy,
+        'buffered_random': gen.buffered_random,
+        'probabilities': {
+            **asdict(gen.probabilities),
+            # The order of the reasons sets which reason each draw picks, so is kept rather than sorted with the keys
+            'reason_for_episode_change': [
+                [reason, weight] for reason, weight in gen.probabilities.reason_for_episode_change.items()
+            ],
+        },
+        'ids': {
+            'key': gen.ids.key,
+            'child_id_range': gen.ids.child_id_range,
+            'upn_number_range': gen.ids.upn_number_range,
+            'offset': gen.ids.offset,
+        },
+        'postcodes': _postcodes_config(gen.postcodes),
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def _postcodes_config(postcodes: Optional[PostcodeProvider]) -> Dict[str, Any]:
+    if postcodes is None or isinstance(postcodes, RandomPostcodes):
+        return {'type': 'random'}
+    if isinstance(postcodes, PostcodePool):
+        # A pool rebuilt in place gives different postcodes, so the file's size and modification time are included
+        stat = postcodes.path.stat()
+        return {'type': 'pool', 'path': str(postcodes.path.resolve()), 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns}
+    raise ValueError(f'Populations with postcodes from a {type(postcodes).__name__} can not be cached')
+
+
+class PopulationCache:
+    """
+    Keeps generated populations on disk, so that running the same population through different census periods or
+    output formats only generates it once:
+
+        cache = PopulationCache('.population_cache')
+        children = cache.generate(gen, 100_000)  # Generates and stores the population
+        children = cache.generate(gen, 100_000)  # Loads the stored population
+
+    Populations are looked up by their fingerprint, and stored as ChildrenArrays in uncompressed .npz files.
+    When the files take up more than max_bytes, the least recently used are removed.
+
+    :param directory: The directory to keep the populations in. It is created if it doesn't exist.
+    :param max_bytes: The most space the populations may take up.
+    """
+
+    def __init__(self, directory: Union[Path, str], max_bytes: int = 2_000_000_000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def generate(self, gen: ChildrenGenerator, num_children: int, workers: Optional[int] = None) -> Sequence[Child]:
+        """
+        Cached version of ChildrenGenerator.generate.
+
+        :param gen: The generator.
+        :param num_children: The number of children to generate.
+        :param workers: If more than 1, and the population isn't cached, it is generated across a pool of this many
+            processes.
+        :returns: The generated children. When the population is loaded from the cache, this is a ChildrenSequence,
+            which decodes the children from the stored arrays as they are used rather than making them all up front.
+        """
+        arrays = self._load(gen, num_children, 'generate')
+        if arrays is not None:
+            return ChildrenSequence(arrays)
+
+        children = gen.generate(num_children, workers=workers)
+        self._store(gen, num_children, 'generate', ChildrenArrays.from_children(children))
+        return children
+
+    def generate_arrays(self, gen: ChildrenGenerator, num_children: int) -> ChildrenArrays:
+        """
+        Cached version of ChildrenGenerator.generate_arrays.
+
+        :param gen: The generator.
+        :param num_children: The number of children to generate.
+        :returns: The population as a ChildrenArrays.
+        """
+        arrays = self._load(gen, num_children, 'generate_arrays')
+        if arrays is not None:
+            return arrays
+
+        arrays = gen.generate_arrays(num_children)
+        self._store(gen, num_children, 'generate_arrays', arrays)
+        return arrays
+
+    def path(self, gen: ChildrenGenerator, num_children: int, engine: str = 'generate') -> Path:
+        """
+        :returns: The file the population is stored in, which may not exist.
+        """
+        return self.directory / (fingerprint(gen, num_children, engine) + _SUFFIX)
+
+    def invalidate(self, gen: Optional[ChildrenGenerator] = None, num_children: Optional[int] = None) -> int:
+        """
+        Removes populations from the cache.
+
+        :param gen: If given, only the populations of this generator are removed. Otherwise, every population is.
+        :param num_children: The number of children in the population to remove. Must be given with gen.
+        :returns: The number of populations removed.
+        """
+        if gen is None:
+            paths = [path for path, _ in self._entries()]
+        else:
+            if num_children is None:
+                raise ValueError('num_children must be given to invalidate the populations of a generator')
+            paths = [self.path(gen, num_children, engine) for engine in ['generate', 'generate_arrays']]
+
+        return sum(_unlink(path) for path in paths)
+
+    def size(self) -> int:
+        """
+        :returns: The number of bytes taken up by the cached populations.
+        """
+        return sum(size for _, size in self._entries())
+
+    def _entries(self) -> List[tuple]:
+        """
+        :returns: The (path, size) of each cached population, least recently used first.
+        """
+        entries = []
+        for path in self.directory.glob('*' + _SUFFIX):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Removed by another process
+                continue
+            entries.append((stat.st_mtime_ns, path, stat.st_size))
+        return [(path, size) for _, path, size in sorted(entries)]
+
+    def _load(self, gen: ChildrenGenerator, num_children: int, engine: str) -> Optional[ChildrenArrays]:
+        path = self.path(gen, num_children, engine)
+        if not path.exists():
+            add('cache_misses', 1)
+            return None
+
+        try:
+            with stage('cache_load'):
+                arrays = ChildrenArrays.load(path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # A damaged file is thrown away and the population generated again
+            _unlink(path)
+            add('cache_misses', 1)
+            return None
+
+        # The modification time records when each population was last used, for evicting the least recently used
+        os.utime(path)
+        add('cache_hits', 1)
+        return arrays
+
+    def _store(self, gen: ChildrenGenerator, num_children: int, engine: str, arrays: ChildrenArrays):
+        path = self.path(gen, num_children, engine)
+        with stage('cache_store'):
+            # Written under a temporary name and then renamed, so that other processes never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            try:
+                arrays.save(temp_path)
+                os.replace(temp_path, path)
+            except BaseException:
+                _unlink(Path(temp_path))
+                raise
+
+        self._evict()
+
+    def _evict(self):
+        # The population just stored is the most recently used, so it is only removed if it is bigger than
+        # max_bytes on its own
+        entries = self._entries()
+        total = sum(size for _, size in entries)
+        for path, size in entries:
+            if total <= self.max_bytes:
+                break
+            _unlink(path)
+            total -= size
+
+
+def _unlink(path: Path) -> bool:
+    try:
+        path.unlink()
+        return True
+    except FileNotFoundError:
+        # Already removed, e.g. by another process
+        return False
@@ -1,50 +1,453 @@
 import datetime
-from copy import deepcopy
-from typing import List
+import bisect
+import queue
+import threading
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .childrengenerator import CHUNK_SIZE
+from .columnar import OUTCOME_FLAGS, ChildrenArrays, _offsets
+from .intervals import PopulationIndex
+from .population import ChildrenSequence
+from .stats import add, stage
 from .types import Child
 
-def snapshot_children_for_period(start_date: datetime.datetime, end_date: datetime.datetime, all_children: List[Child]):
-    # Keep any children who have their first interaction before the end date, and haven't totally finished with care
-    children = [
-        deepcopy(c) for c in all_children 
-        if min(e.start_date for e in c.episodes) < end_date and max(e.end_date for e in c.episodes) > start_date
-    ]
+Period = Tuple[datetime.datetime, datetime.datetime]
+
+# The formats write_census_for_periods can write
+FORMATS = ('csv', 'xml', 'parquet')
+
+def snapshot_children_for_period(start_date: datetime.datetime, end_date: datetime.datetime, all_children: Iterable[Child],
+                                 index: Optional[PopulationIndex] = None) -> List[Child]:
+    """
+    Takes a census snapshot of the children for the period, keeping only the children, episodes and other events
+    visible in the period and removing any dates after its end.
+
+    Snapshots are shallow copies: they share every episode, missing period and other record that the census doesn't
+    change with the population, and only the changed records are new objects. Treat both the population and the
+    snapshots as read only, as changing a shared record changes it in both.
+
+    :param start_date: The start of the census period.
+    :param end_date: The end of the census period.
+    :param all_children: The population.
+    :param index: A PopulationIndex of all_children, which must then be a sequence. With an index, only the children
+        in the census are visited, rather than every child in the population. This pays off when the same
+        population is snapshotted many times.
+    :returns: The snapshot of each child in the census.
+    """
+    if index is not None:
+        all_children = _children_at(all_children, index.children_in_period(start_date, end_date))
+    with stage('snapshot'):
+        return list(iter_snapshot_children_for_period(start_date, end_date, all_children))
+
+def iter_snapshot_children_for_period(start_date: datetime.datetime, end_date: datetime.datetime, all_children: Iterable[Child]) -> Iterator[Child]:
+    """
+    Lazy version of snapshot_children_for_period. Children are read from all_children and snapshotted one at a
+    time, so this can be chained between ChildrenGenerator.iter_children and the writers without holding the
+    whole population in memory.
+    """
+    for c in all_children:
+        first_start_date, last_end_date = _care_span(c)
+        # Keep any children who have their first interaction before the end date, and haven't totally finished with care
+        if first_start_date < end_date and last_end_date > start_date:
+            yield _snapshot_child(start_date, end_date, c, first_start_date)
+
+def snapshot_children_for_periods(periods: Iterable[Period], all_children: Iterable[Child],
+                                  output_dir: Optional[Union[Path, str]] = None,
+                                  writer: Optional[Callable[[List[Child], Path], None]] = None,
+                                  index: Optional[PopulationIndex] = None) -> Dict[Period, List[Child]]:
+    """
+    Takes census snapshots of the children for several periods at once, e.g. every collection year covered by a
+    population.
+
+    If the population is a sequence, such as a list or a MappedPopulation, a PopulationIndex of it is built once (or
+    the given one used), and only the children in each period's census are visited. Otherwise the population is read
+    once, and each child is only snapshotted for the periods its care overlaps, which are found by bisecting the
+    sorted periods. Either way, the cost is in proportion to the population plus the snapshots, rather than to the
+    population times the number of periods.
+
+    :param periods: The (start_date, end_date) of each census period.
+    :param all_children: The population. This can be any iterable, as it is only read once.
+    :param output_dir: If given, the snapshots for each period are also written to a directory in here named after
+        the period, e.g. 2019-04-01_2020-03-31.
+    :param writer: Writes the snapshots for a period into its directory. Defaults to cscsynth.csv.create_csv.
+    :param index: A PopulationIndex of all_children, which must then be a sequence.
+    :returns: The snapshots for each period, in the order of periods.
+    """
+    periods = list(periods)
+    if index is None:
+        index = _population_index(all_children)
+
+    if index is not None:
+        snapshots = {period: snapshot_children_for_period(*period, all_children, index) for period in periods}
+    else:
+        snapshots = _snapshot_children_in_one_pass(periods, all_children)
+
+    if output_dir is not None:
+        if writer is None:
+            from .csv import create_csv
+            writer = create_csv
+
+        for period, children in snapshots.items():
+            writer(children, period_dir(output_dir, period))
+
+    return snapshots
+
+def _snapshot_children_in_one_pass(periods: List[Period], all_children: Iterable[Child]) -> Dict[Period, List[Child]]:
+    snapshots = {period: [] for period in periods}
+
+    ordered = sorted(set(periods))
+    starts = [start_date for start_date, _ in ordered]
+    ends = [end_date for _, end_date in ordered]
+    # For non-overlapping periods the ends are sorted too, so the overlapping periods are a contiguous run
+    ends_sorted = all(a <= b for a, b in zip(ends, ends[1:]))
+
+    with stage('snapshot'):
+        for c in all_children:
+            first_start_date, last_end_date = _care_span(c)
+            last = bisect.bisect_left(starts, last_end_date)
+            first = bisect.bisect_right(ends, first_start_date) if ends_sorted else 0
+            for start_date, end_date in ordered[first:last]:
+                if end_date > first_start_date:
+                    snapshots[start_date, end_date].append(_snapshot_child(start_date, end_date, c, first_start_date))
+
+    return snapshots
+
+def write_census_for_periods(periods: Iterable[Period], all_children: Iterable[Child], output_dir: Union[Path, str],
+                             file_format: str = 'csv', chunk_size: int = CHUNK_SIZE,
+                             index: Optional[PopulationIndex] = None):
+    """
+    Writes the census of the children for each period, without holding the population or the snapshots in memory.
+    Each period's census goes in a directory named after the period, as in snapshot_children_for_periods.
+
+    If the population is a sequence, such as a list or a MappedPopulation, a PopulationIndex of it is built once (or
+    the given one used), and each period is written in turn from just the children in its census. Otherwise
+    all_children is only read once, so it can be a lazy ChildrenGenerator.iter_children. With more than one period,
+    each period is then snapshotted and written in its own thread, which is fed the children through a queue of at
+    most chunk_size children.
+
+    :param periods: The (start_date, end_date) of each census period.
+    :param all_children: The population.
+    :param output_dir: The directory to write the period directories into.
+    :param file_format: 'csv', 'xml' or 'parquet'. XML is written to fake_903.xml in each period directory.
+    :param chunk_size: The number of children the writers turn into rows at a time.
+    :param index: A PopulationIndex of all_children, which must then be a sequence.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f'Unknown format {file_format}, expected one of {", ".join(FORMATS)}')
+
+    periods = list(periods)
+    writers = [_census_writer(period, period_dir(output_dir, period), file_format, chunk_size) for period in periods]
+    if index is None:
+        index = _population_index(all_children)
+
+    if index is None:
+        _fan_out(all_children, writers, max_pending=chunk_size)
+        return
+
+    for period, write in zip(periods, writers):
+        write(_children_at(all_children, index.children_in_period(*period)))
+
+def snapshot_arrays_for_period(start_date: datetime.datetime, end_date: datetime.datetime,
+                               arrays: ChildrenArrays) -> ChildrenArrays:
+    """
+    Columnar version of snapshot_children_for_period, which takes the census straight from the tables of a
+    ChildrenArrays. Each rule of the census is applied to every child, episode and missing period at once, as a
+    boolean mask over the rows and an update of the masked columns, so no Child objects are made.
+
+    The result is the census as a ChildrenArrays, which can be written with create_csv_from_arrays. Converting it
+    with to_children gives the same children as snapshot_children_for_period does for arrays.to_children(). Dates
+    are compared by day.
+
+    :param start_date: The start of the census period.
+    :param end_date: The end of the census period.
+    :param arrays: The population.
+    :returns: The snapshot of the children in the census.
+    """
+    start = np.datetime64(start_date, 'D')
+    end = np.datetime64(end_date, 'D')
+    no_date = np.datetime64('NaT')
+    n = len(arrays)
+
+    with stage('snapshot'):
+        episode_counts = np.diff(arrays.episode_offsets)
+        episode_child = np.repeat(np.arange(n), episode_counts)
+        episode_starts, episode_ends = arrays.episodes['start_date'], arrays.episodes['end_date']
+
+        # Keep any children who have their first interaction before the end date, and haven't totally finished with
+        # care
+        has_episodes = episode_counts > 0
+        first_rows = arrays.episode_offsets[:-1][has_episodes]
+        first_start_date = np.full(n, no_date, dtype='datetime64[D]')
+        last_end_date = np.full(n, no_date, dtype='datetime64[D]')
+        if len(first_rows) > 0:
+            first_start_date[has_episodes] = np.minimum.reduceat(episode_starts, first_rows)
+            last_end_date[has_episodes] = np.maximum.reduceat(episode_ends, first_rows)
+        in_census = has_episodes & (first_start_date < end) & (last_end_date > start)
+
+        children = {name: values[in_census] for name, values in arrays.children.items()}
+        first_start_date = first_start_date[in_census]
 
-    for c in children:
         # Future births are set to None
-        if c.mother_child_dob is not None and c.mother_child_dob > end_date:
-            c.mother_child_dob = None
-
-        # Only include leaving data for those over 17.
-        if (end_date - c.dob).days / 365 <= 17:
-            c.leaving_care_data = None
-
-        # Only include in-date adoptions
-        if c.adoption_data is not None:
-            starts_in_year = start_date < c.adoption_data.start_date < end_date
-            ends_in_year = start_date < c.adoption_data.end_date < end_date
-            if starts_in_year and c.adoption_data.end_date > end_date:
-                c.adoption_data.end_date = None
-                c.adoption_data.reason_ceased = None
-            elif not (starts_in_year or ends_in_year):
-                c.adoption_data = None
+        mother_child_dob = children['mother_child_dob']
+        children['mother_child_dob'] = np.where(mother_child_dob > end, no_date, mother_child_dob)
+
+        # Only include leaving data for those over 17
+        too_young = (end - children['dob']).astype(np.int64) / 365 <= 17
+        children['has_leaving_care'] = children['has_leaving_care'] & ~too_young
+        for name in ['in_touch', 'activ', 'accom']:
+            children[name] = np.where(too_young, -1, children[name]).astype(np.int8)
+
+        # Only include in-date adoptions, removing the end of those which end after the period
+        adoption_start, adoption_end = children['adoption_start_date'], children['adoption_end_date']
+        starts_in_year = (start < adoption_start) & (adoption_start < end)
+        ends_in_year = (start < adoption_end) & (adoption_end < end)
+        ends_after = starts_in_year & (adoption_end > end)
+        removed = ~(starts_in_year | ends_in_year)
+        children['adoption_start_date'] = np.where(removed, no_date, adoption_start)
+        children['adoption_end_date'] = np.where(removed | ends_after, no_date, adoption_end)
+        children['adoption_reason_ceased'] = np.where(removed | ends_after, -1, children['adoption_reason_ceased']).astype(np.int8)
+        for name in ['foster_care', 'number_adopters', 'sex_adopter', 'ls_adopter']:
+            children[name] = np.where(removed, -1, children[name]).astype(np.int8)
 
         # Only provide OC3 data for children in care more than 12 months
         # TODO: Account for gaps
-        if min(e.start_date for e in c.episodes) > end_date - datetime.timedelta(days=365):
-            c.outcomes_data = None
+        recent = first_start_date > end - np.timedelta64(365, 'D')
+        children['has_outcomes'] = children['has_outcomes'] & ~recent
+        children['sdq_score'] = np.where(recent, -1, children['sdq_score']).astype(np.int8)
+        children['sdq_reason'] = np.where(recent, -1, children['sdq_reason']).astype(np.int8)
+        for flag in OUTCOME_FLAGS:
+            children[flag] = children[flag] & ~recent
+
+        # Only keep the episodes and missing periods in the period, removing end dates in the future
+        episodes, episode_offsets = _snapshot_events(arrays.episodes, episode_child, in_census, start, end)
+        missing_child = np.repeat(np.arange(n), np.diff(arrays.missing_offsets))
+        missing, missing_offsets = _snapshot_events(arrays.missing, missing_child, in_census, start, end)
+
+        review_child = np.repeat(np.arange(n), np.diff(arrays.review_offsets))
+        review_rows = in_census[review_child]
+        reviews = {name: values[review_rows] for name, values in arrays.reviews.items()}
+        review_offsets = _offsets(np.diff(arrays.review_offsets)[in_census])
+
+    add('snapshot', int(in_census.sum()))
+    return ChildrenArrays(
+        children=children,
+        episodes=episodes,
+        reviews=reviews,
+        missing=missing,
+        episode_offsets=episode_offsets,
+        review_offsets=review_offsets,
+        missing_offsets=missing_offsets,
+    )
+
+def _snapshot_events(table: Dict[str, np.ndarray], child: np.ndarray, in_census: np.ndarray, start: np.datetime64,
+                     end: np.datetime64) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    # Keeps the episodes or missing periods of the children in the census which start or end inside the period, and
+    # removes the end dates after the period
+    starts, ends = table['start_date'], table['end_date']
+    in_period = ((start < starts) & (starts < end)) | ((start < ends) & (ends < end))
+    rows = in_census[child] & in_period
+
+    kept = {name: values[rows] for name, values in table.items()}
+    kept['end_date'] = np.where(kept['end_date'] <= end, kept['end_date'], np.datetime64('NaT'))
+    counts = np.bincount(child[rows], minlength=len(in_census))[in_census]
+    return kept, _offsets(counts)
+
+def write_census_arrays_for_periods(periods: Iterable[Period], arrays: ChildrenArrays, output_dir: Union[Path, str],
+                                    file_format: str = 'csv', chunk_size: int = CHUNK_SIZE):
+    """
+    Columnar version of write_census_for_periods, for a population generated with ChildrenGenerator.generate_arrays.
+    Each period's census is taken with snapshot_arrays_for_period and written straight from its columns. XML is
+    written from Child objects, which are made from the census a chunk at a time.
+
+    :param periods: The (start_date, end_date) of each census period.
+    :param arrays: The population.
+    :param output_dir: The directory to write the period directories into.
+    :param file_format: 'csv', 'xml' or 'parquet'. XML is written to fake_903.xml in each period directory.
+    :param chunk_size: The number of children the writers turn into rows at a time.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f'Unknown format {file_format}, expected one of {", ".join(FORMATS)}')
+
+    for period in periods:
+        snapshot = snapshot_arrays_for_period(*period, arrays)
+        directory = period_dir(output_dir, period)
+        if file_format == 'csv':
+            from .csv import create_csv_from_arrays
+            create_csv_from_arrays(snapshot, directory, chunk_size)
+        elif file_format == 'xml':
+            from .xml import create_xml
+            directory.mkdir(parents=True, exist_ok=True)
+            children = (
+                child
+                for start in range(0, len(snapshot), chunk_size)
+                for child in snapshot.slice(start, start + chunk_size).to_children()
+            )
+            create_xml(children, directory / 'fake_903.xml')
+        else:
+            from .parquet import create_parquet_from_arrays
+            create_parquet_from_arrays(snapshot, directory, chunk_size)
+
+def _population_index(all_children: Iterable[Child]) -> Optional[PopulationIndex]:
+    # An index of the population, if it is a sequence that can be indexed into. A population held as a ChildrenArrays
+    # is indexed straight from its columns, without decoding any children.
+    if isinstance(all_children, ChildrenSequence):
+        return PopulationIndex.from_arrays(all_children.arrays)
+    if isinstance(all_children, Sequence):
+        return PopulationIndex.from_children(all_children)
+    return None
+
+def _children_at(all_children: Sequence[Child], positions: np.ndarray) -> Iterator[Child]:
+    # The children at the positions of the population. A population held as a ChildrenArrays only decodes those
+    # children, a chunk at a time.
+    if isinstance(all_children, ChildrenSequence):
+        for start in range(0, len(positions), CHUNK_SIZE):
+            yield from all_children.arrays.take(positions[start:start + CHUNK_SIZE]).to_children()
+    else:
+        for i in positions.tolist():
+            yield all_children[i]
+
+def period_dir(output_dir: Union[Path, str], period: Period) -> Path:
+    """
+    :returns: The directory the census for the period is written to, e.g. output_dir/2019-04-01_2020-03-31.
+    """
+    start_date, end_date = period
+    return Path(output_dir) / f'{start_date:%Y-%m-%d}_{end_date:%Y-%m-%d}'
+
+def _care_span(c: Child) -> Tuple[datetime.datetime, datetime.datetime]:
+    # The start of the first episode and the end of the last, found in one pass
+    first_start_date, last_end_date = c.episodes[0].start_date, c.episodes[0].end_date
+    for e in c.episodes:
+        first_start_date = min(first_start_date, e.start_date)
+        last_end_date = max(last_end_date, e.end_date)
+    return first_start_date, last_end_date
+
+def _snapshot_child(start_date: datetime.datetime, end_date: datetime.datetime, c: Child,
+                    first_start_date: datetime.datetime) -> Child:
+
+    # The snapshot is a shallow copy, sharing every object it doesn't change with the population. Only the fields
+    # overridden here are new.
+    overrides = {}
+
+    # Future births are set to None
+    if c.mother_child_dob is not None and c.mother_child_dob > end_date:
+        overrides['mother_child_dob'] = None
+
+    # Only include leaving data for those over 17.
+    if (end_date - c.dob).days / 365 <= 17:
+        overrides['leaving_care_data'] = None
+
+    # Only include in-date adoptions
+    if c.adoption_data is not None:
+        starts_in_year = start_date < c.adoption_data.start_date < end_date
+        ends_in_year = start_date < c.adoption_data.end_date < end_date
+        if starts_in_year and c.adoption_data.end_date > end_date:
+            overrides['adoption_data'] = replace(c.adoption_data, end_date=None, reason_ceased=None)
+        elif not (starts_in_year or ends_in_year):
+            overrides['adoption_data'] = None
+
+    # Only provide OC3 data for children in care more than 12 months
+    # TODO: Account for gaps
+    if first_start_date > end_date - datetime.timedelta(days=365):
+        overrides['outcomes_data'] = None
+
+    # Remove end dates for missing in future
+    overrides['missing_periods'] = [
+        m if m.end_date <= end_date else replace(m, end_date=None)
+        for m in c.missing_periods if start_date < m.start_date < end_date or start_date < m.end_date < end_date
+    ]
+
+    # Remove end dates for episodes in future
+    overrides['episodes'] = [
+        e if e.end_date <= end_date else replace(e, end_date=None)
+        for e in c.episodes if start_date < e.start_date < end_date or start_date < e.end_date < end_date
+    ]
+
+    add('snapshot', 1)
+    return replace(c, **overrides)
+
+def _census_writer(period: Period, output_dir: Path, file_format: str,
+                   chunk_size: int) -> Callable[[Iterable[Child]], None]:
+    # A function writing the census for the period of the children passed to it
+    start_date, end_date = period
+
+    def write(children: Iterable[Child]):
+        snapshots = iter_snapshot_children_for_period(start_date, end_date, children)
+        if file_format == 'csv':
+            from .csv import create_csv
+            create_csv(snapshots, output_dir, chunk_size)
+        elif file_format == 'xml':
+            from .xml import create_xml
+            output_dir.mkdir(parents=True, exist_ok=True)
+            create_xml(snapshots, output_dir / 'fake_903.xml')
+        else:
+            from .parquet import create_parquet
+            create_parquet(snapshots, output_dir, chunk_size)
+
+    return write
+
+def _fan_out(items: Iterable, consumers: List[Callable[[Iterable], None]], max_pending: int):
+    """
+    Passes every item to each of the consumers, reading the items only once. Each consumer runs in its own thread,
+    reading from a queue of at most max_pending items, so the items are never all held in memory at once.
+    """
+    if len(consumers) == 1:
+        consumers[0](items)
+        return
+
+    queues = [queue.Queue(maxsize=max_pending) for _ in consumers]
+    errors = []
+
+    def consume(consumer, items_queue):
+        items = _QueueIterator(items_queue)
+        try:
+            consumer(items)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            # Take any items left, so that the other consumers aren't held up waiting on this one's queue
+            for _ in items:
+                pass
+
+    threads = [threading.Thread(target=consume, args=pair, daemon=True) for pair in zip(consumers, queues)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for item in items:
+            if errors:
+                break
+            for items_queue in queues:
+                items_queue.put(item)
+    finally:
+        for items_queue in queues:
+            items_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+# Put on the queues after the last item
+_DONE = object()
 
-        # Remove end dates for missing in future
-        c.missing_periods = [deepcopy(m) for m in c.missing_periods if start_date < m.start_date < end_date or start_date < m.end_date < end_date]
-        for episode in c.missing_periods:
-            if episode.end_date > end_date:
-                episode.end_date = None
+class _QueueIterator:
+    # Iterates over the items put on a queue, up to _DONE. Unlike a generator, this can't be closed early, so it can
+    # always be read to the end.
 
-        # Remove end dates for episodes in future
-        c.episodes = [deepcopy(e) for e in c.episodes if start_date < e.start_date < end_date or start_date < e.end_date < end_date]
-        for episode in c.episodes:
-            if episode.end_date > end_date:
-                episode.end_date = None
+    def __init__(self, items_queue: queue.Queue):
+        self._queue = items_queue
+        self._finished = False
 
+    def __iter__(self) -> Iterator:
+        return self
 
-    return children
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        item = self._queue.get()
+        if item is _DONE:
+            self._finished = True
+            raise StopIteration
+        return item
@@ -1,27 +1,55 @@
 import datetime
-import random
-from typing import List
-from .types import Probabilities, Child
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from .ids import IdService
+from .postcodes import PostcodeProvider
+from .rng import Random, UniformBlocks
+from .stats import add, stage
+from .types import Probabilities, Child, date_of_day, day_of
+from .columnar import ChildrenArrays, generate_children_arrays
 from .generators import (
     generate_adoption_data,
     generate_ethnicity,
     generate_leaving_care,
-    generate_missing_data,
     generate_outcomes_data,
-    generate_upn,
-    generate_child_id,
-    generate_dob,
-    generate_motherhood_date,
-    generate_uasc_ceased_date,
-    generate_episodes,
-    generate_reviews,
+    _dob_day,
+    _episode_rows,
+    _episode_spans,
+    _episodes,
+    _missing_periods,
+    _missing_rows,
+    _motherhood_day,
+    _review_rows,
+    _reviews,
+    _uasc_ceased_day,
 )
 
+# When generating across a process pool, children are handed to the workers in chunks of this many children.
+CHUNK_SIZE = 10_000
+
+# Every random stream of a generator is derived from its entropy with its own spawn key. Without buffered_random,
+# the child at index i has the stream with the key (i,), so the others have keys of two values, which no child's
+# key can equal.
+_IDS_SPAWN_KEY = (0, 0)
+_UNIFORMS_SPAWN_KEY = (0, 1)
+_ARRAYS_SPAWN_KEY = (0, 2)
+
 
 class ChildrenGenerator:
-    def __init__(self, start_date: datetime.datetime, end_date: datetime.datetime, probabilities: Probabilities = None):
+    def __init__(self, start_date: datetime.datetime, end_date: datetime.datetime, probabilities: Probabilities = None,
+                 seed: Optional[int] = None, ids: Optional[IdService] = None,
+                 postcodes: Optional[PostcodeProvider] = None, buffered_random: bool = True):
         self.start_date = start_date
         self.end_date = end_date
+        self.seed = seed
+        # Where the home and placement postcodes come from, e.g. a PostcodePool of real postcodes. By default,
+        # they are made up.
+        self.postcodes = postcodes
+        # Whether each child's random stream is a BufferedRandom, which is faster, or a Random, which gives the
+        # children generated by earlier versions for the same seed.
+        self.buffered_random = buffered_random
 
         if probabilities is None:
             # Use the defaults in the class
@@ -29,44 +57,193 @@ class ChildrenGenerator:
 
         self.probabilities = probabilities
 
-    def generate(self, num_children: int) -> List[Child]:
-        upn_generator = generate_upn()
-        child_id_generator = generate_child_id()
-
-        children = []
-        for _ in range(num_children):
-            child_id = next(child_id_generator)
-            upn = next(upn_generator)
-            dob = generate_dob(self.start_date)
-            sex = random.randint(1, 2)
-
-            mother_child_dob = generate_motherhood_date(self.probabilities.is_mother, sex, dob)
-
-            date_uasc_ceased = generate_uasc_ceased_date(self.probabilities.is_uasc, dob)
-            
-            episodes = generate_episodes(self.start_date, dob, self.probabilities)
-
-            reviews = generate_reviews(episodes, self.probabilities.review_frequency)
-
-            # TODO: Generate a set of missing episodes
-            missing_periods = generate_missing_data(self.start_date, self.end_date, self.probabilities.is_missing)
-            
-            child = Child(
-                upn=upn,
-                child_id=child_id,
-                dob=dob,
-                sex=sex,
-                ethnicity=generate_ethnicity(),
-                episodes=episodes,
-                reviews=reviews,
-                mother_child_dob=mother_child_dob,
-                missing_periods=missing_periods,
-                date_uasc_ceased=date_uasc_ceased,
-                leaving_care_data=generate_leaving_care(),
-                adoption_data=generate_adoption_data(self.start_date, self.probabilities.is_adopted),
-                outcomes_data=generate_outcomes_data(),
-            )
+        # Each child is generated from its own random stream, derived from this entropy and the index of the child.
+        # If no seed is given, the entropy is random but fixed for the life of the generator.
+        self.entropy = np.random.SeedSequence(seed).entropy
+
+        if ids is None:
+            # Use the default id ranges, keyed from the seed
+            ids = IdService(int(self._seed_sequence(_IDS_SPAWN_KEY).generate_state(1, np.uint64)[0]))
+
+        self.ids = ids
+
+        # With buffered_random, stream i of these is the random stream of the child at index i
+        self.uniforms = UniformBlocks(self._seed_sequence(_UNIFORMS_SPAWN_KEY))
+
+    def _seed_sequence(self, spawn_key: Tuple[int, ...]) -> np.random.SeedSequence:
+        return np.random.SeedSequence(self.entropy, spawn_key=spawn_key)
+
+    def generate(self, num_children: int, workers: Optional[int] = None) -> List[Child]:
+        """
+        Generates a list of children. This is the same as children(range(num_children)).
+
+        :param num_children: The number of children to generate.
+        :param workers: If more than 1, the children are generated across a pool of this many processes. The result
+            is the same for any number of workers.
+        :returns: The generated children.
+        """
+        return self.children(range(num_children), workers=workers)
 
-            children.append(child)
+    def children(self, indices: Iterable[int], workers: Optional[int] = None) -> List[Child]:
+        """
+        Generates the children at the given indices of the population, without generating any of the others.
 
+        :param indices: The indices of the children to generate, e.g. a range.
+        :param workers: If more than 1, the children are generated across a pool of this many processes.
+        :returns: The generated children, in the order of indices.
+        """
+        indices = list(indices)
+        if workers is None or workers <= 1 or len(indices) <= CHUNK_SIZE:
+            with stage('generate'):
+                return [self._child(index, rng) for index, rng in zip(indices, self._random_streams(indices))]
+
+        chunks = [indices[i:i + CHUNK_SIZE] for i in range(0, len(indices), CHUNK_SIZE)]
+        all_children = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for children in pool.map(self.children, chunks):
+                add('children', len(children))
+                all_children.extend(children)
+        return all_children
+
+    def iter_children(self, num_children: int, chunk_size: int = CHUNK_SIZE,
+                      workers: Optional[int] = None) -> Iterator[Child]:
+        """
+        Lazily generates the same children as generate, one chunk at a time, so that a population can be passed on
+        to the census and the writers without ever being held in memory all at once.
+
+        :param num_children: The number of children to generate.
+        :param chunk_size: The number of children generated together. With a process pool, this is the amount of
+            work handed to each worker; at most workers + 1 chunks are held in memory at once.
+        :param workers: If more than 1, the chunks are generated across a pool of this many processes.
+        :returns: An iterator over the children.
+        :raises ValueError: If the generator's IdService can't give that many children ids. This is checked before
+            any children are generated.
+        """
+        self._check_num_children(num_children)
+        return self._iter_children(num_children, chunk_size, workers)
+
+    def _iter_children(self, num_children: int, chunk_size: int, workers: Optional[int]) -> Iterator[Child]:
+        chunks = (range(start, min(start + chunk_size, num_children)) for start in range(0, num_children, chunk_size))
+        if workers is None or workers <= 1:
+            for chunk in chunks:
+                yield from self.children(chunk)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a bounded window of chunks in flight, rather than submitting them all up front as pool.map does
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(self.children, chunk))
+                if len(pending) > workers:
+                    yield from self._chunk_result(pending.popleft())
+            while pending:
+                yield from self._chunk_result(pending.popleft())
+
+    def _check_num_children(self, num_children: int):
+        if num_children > self.ids.capacity:
+            raise ValueError(f'Only {self.ids.capacity} children can be given unique ids, but {num_children} were '
+                             f'asked for. Widen the child id range of the IdService.')
+
+    @staticmethod
+    def _chunk_result(future) -> List[Child]:
+        children = future.result()
+        add('children', len(children))
         return children
+
+    def child(self, index: int) -> Child:
+        """
+        Generates the child at the given index of the population. Every attribute of the child is drawn from a
+        random stream seeded by the generator's entropy and the index, and the child id and UPN come from the
+        generator's IdService, so this takes the same time for any index and gives the same child as generate does
+        at that position. The dates are drawn as whole days, and only made into datetimes for the returned child.
+
+        :param index: The index of the child, between 0 and ids.capacity - 1.
+        :returns: The child.
+        """
+        return self._child(index, next(self._random_streams([index])))
+
+    def _random_streams(self, indices: List[int]) -> Iterator[Random]:
+        """
+        :returns: The random stream of each of the children at the given indices. Buffered streams have their first
+            blocks drawn for many children at a time.
+        """
+        for index in indices:
+            if not 0 <= index < self.ids.capacity:
+                raise ValueError(f'Child index must be between 0 and {self.ids.capacity - 1}, not {index}')
+
+        if self.buffered_random:
+            return self.uniforms.streams(indices)
+
+        return (
+            Random(int.from_bytes(self._seed_sequence((index,)).generate_state(4).tobytes(), 'little'))
+            for index in indices
+        )
+
+    def _child(self, index: int, rng: Random) -> Child:
+        start_day = day_of(self.start_date)
+        dob = _dob_day(start_day, rng=rng)
+        sex = rng.randint(1, 2)
+
+        mother_child_dob = _motherhood_day(self.probabilities.is_mother, sex, dob, rng)
+
+        date_uasc_ceased = _uasc_ceased_day(self.probabilities.is_uasc, dob, rng)
+        
+        with stage('episodes'):
+            episode_rows = _episode_rows(start_day, dob, self.probabilities, rng, self.postcodes)
+            episodes = _episodes(episode_rows)
+
+        with stage('reviews'):
+            reviews = _reviews(_review_rows(_episode_spans(episode_rows), self.probabilities.review_frequency, rng))
+
+        # TODO: Generate a set of missing episodes
+        with stage('missing'):
+            missing_periods = _missing_periods(
+                _missing_rows(start_day, day_of(self.end_date), self.probabilities.is_missing, rng))
+
+        add('children', 1)
+        add('episodes', len(episodes))
+        add('reviews', len(reviews))
+        add('missing', len(missing_periods))
+
+        return Child(
+            upn=self.ids.upn(index),
+            child_id=self.ids.child_id(index),
+            dob=date_of_day(dob),
+            sex=sex,
+            ethnicity=generate_ethnicity(rng),
+            episodes=episodes,
+            reviews=reviews,
+            mother_child_dob=date_of_day(mother_child_dob),
+            missing_periods=missing_periods,
+            date_uasc_ceased=date_of_day(date_uasc_ceased),
+            leaving_care_data=generate_leaving_care(rng),
+            adoption_data=generate_adoption_data(self.start_date, self.probabilities.is_adopted, rng),
+            outcomes_data=generate_outcomes_data(rng),
+        )
+
+    def generate_arrays(self, num_children: int) -> ChildrenArrays:
+        """
+        Generates children in the same way as generate, but with every attribute drawn for the whole population at
+        once using vectorised NumPy calls. This is much faster and more compact than generate for large
+        populations. The result can be converted back into Child objects with ChildrenArrays.to_children.
+
+        The two engines draw from separate random streams, derived from the generator's entropy with different spawn
+        keys, so they agree in distribution but not child by child. Child ids and UPNs do match, as both take them
+        from the generator's IdService.
+
+        :param num_children: The number of children to generate.
+        :returns: The population as a ChildrenArrays.
+        :raises ValueError: If the generator's IdService can't give that many children ids.
+        """
+        self._check_num_children(num_children)
+        rng = np.random.default_rng(self._seed_sequence(_ARRAYS_SPAWN_KEY))
+        with stage('generate_arrays'):
+            arrays = generate_children_arrays(
+                num_children, self.start_date, self.end_date, self.probabilities, rng, self.ids, self.postcodes,
+            )
+
+        add('children', len(arrays))
+        add('episodes', int(arrays.episode_offsets[-1]))
+        add('reviews', int(arrays.review_offsets[-1]))
+        add('missing', int(arrays.missing_offsets[-1]))
+        return arrays
@@ -0,0 +1,125 @@
+import argparse
+import datetime
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .census import FORMATS, Period, write_census_arrays_for_periods, write_census_for_periods
+from .childrengenerator import CHUNK_SIZE, ChildrenGenerator
+from .ids import DEFAULT_UPN_NUMBER_RANGE, IdService, child_id_range_for
+from .postcodes import PostcodePool
+from .stats import Stats, collect_stats
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Generates a population of children and writes a census of it for each period, e.g.
+
+        cscsynth -n 1000000 --period 2019-04-01 2020-03-31 --format parquet --workers 8 output
+
+    The children are streamed from the generator through the census into the writers a chunk at a time, so memory
+    use stays the same however many children there are. The population is only generated once, however many
+    periods there are.
+
+    :param argv: The command line arguments, without the program name. Defaults to sys.argv.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    periods = args.period or [_last_collection_year(args.end_date)]
+    gen = _generator(args)
+    # Checked before anything is written, so that a run too big for the ids doesn't leave partial returns behind
+    if args.num_children > gen.ids.capacity:
+        parser.error(f'only {gen.ids.capacity} children can be given unique ids with these id ranges, but '
+                     f'{args.num_children} were asked for')
+
+    progress = _print_progress if args.progress else None
+    start = time.perf_counter()
+    with collect_stats(progress=progress, progress_interval=5) as stats:
+        if args.engine == 'arrays':
+            arrays = gen.generate_arrays(args.num_children)
+            write_census_arrays_for_periods(periods, arrays, args.output_dir, args.format, args.chunk_size)
+        else:
+            children = gen.iter_children(args.num_children, chunk_size=args.chunk_size, workers=args.workers)
+            write_census_for_periods(periods, children, args.output_dir, args.format, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    print(_summary(stats, elapsed, periods, args.output_dir))
+    if args.stats:
+        print()
+        print(stats.summary())
+
+
+def _generator(args: argparse.Namespace) -> ChildrenGenerator:
+    postcodes = PostcodePool(args.postcodes) if args.postcodes else None
+    gen = ChildrenGenerator(start_date=args.start_date, end_date=args.end_date, seed=args.seed, postcodes=postcodes)
+
+    # By default, the child id range grows to fit the population
+    child_id_range = args.child_id_range or child_id_range_for(args.num_children)
+    upn_range = args.upn_range or DEFAULT_UPN_NUMBER_RANGE
+    gen.ids = IdService(gen.ids.key, child_id_range=tuple(child_id_range), upn_number_range=tuple(upn_range))
+    return gen
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='cscsynth',
+        description='Generates synthetic SSDA903 returns for a population of children in care.',
+    )
+    parser.add_argument('output_dir', type=Path, help='Directory to write the returns into')
+    parser.add_argument('-n', '--num-children', type=int, default=1000, help='Number of children in the population')
+    parser.add_argument('--start-date', type=_date, default=datetime.datetime(2015, 1, 1),
+                        help='No episode starts before this date (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=_date, default=datetime.datetime(2021, 1, 1),
+                        help='Missing periods start before this date (YYYY-MM-DD)')
+    parser.add_argument('--seed', type=int, help='Seed for the population. Runs with the same seed are identical')
+    parser.add_argument('--period', type=_date, nargs=2, action='append', metavar=('START', 'END'),
+                        help='A census period (YYYY-MM-DD YYYY-MM-DD). Can be given more than once. Defaults to the '
+                             'last collection year (1 April to 31 March) ending by the end date')
+    parser.add_argument('--format', choices=FORMATS, default='csv', help='Format of the returns')
+    parser.add_argument('--engine', choices=['objects', 'arrays'], default='objects',
+                        help='Generate and take the census of the population as Child objects, streamed a chunk at '
+                             'a time, or all at once as arrays, which is much faster but holds the whole population '
+                             'in memory')
+    parser.add_argument('--workers', type=int,
+                        help='Number of processes to generate the children across (objects engine only)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='Number of children generated and written at a time')
+    parser.add_argument('--child-id-range', type=int, nargs=2, metavar=('LOW', 'HIGH'),
+                        help='The smallest and largest child id, inclusive. Defaults to 0 to 1000000, or wider if '
+                             'there are more children than that')
+    parser.add_argument('--upn-range', type=int, nargs=2, metavar=('LOW', 'HIGH'),
+                        help='The smallest and largest number for the 12 digits of a UPN, inclusive. Defaults to 1 '
+                             'to 100000000000')
+    parser.add_argument('--postcodes', type=Path, help='A postcode pool (.npy) to take postcodes from')
+    parser.add_argument('--progress', action='store_true', help='Print progress while generating')
+    parser.add_argument('--stats', action='store_true', help='Print the time spent in each stage at the end')
+    return parser
+
+
+def _date(value: str) -> datetime.datetime:
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value} is not a date in the form YYYY-MM-DD')
+
+
+def _last_collection_year(end_date: datetime.datetime) -> Period:
+    year = end_date.year if end_date >= datetime.datetime(end_date.year, 3, 31) else end_date.year - 1
+    return datetime.datetime(year - 1, 4, 1), datetime.datetime(year, 3, 31)
+
+
+def _print_progress(stats: Stats):
+    print(f'{stats["children"].items} children generated', file=sys.stderr, flush=True)
+
+
+def _summary(stats: Stats, elapsed: float, periods: List[Period], output_dir: Path) -> str:
+    num_children = stats['children'].items
+    written = sum(stats[name].bytes for name in FORMATS if name in stats.stages)
+    lines = [
+        f'Generated {num_children} children in {elapsed:.1f} s ({num_children / elapsed:,.0f} children/s)',
+        f'Wrote {stats["snapshot"].items} census records for {len(periods)} period(s) to {output_dir} '
+        f'({written / 1e6:,.1f} MB, {written / 1e6 / elapsed:,.1f} MB/s)',
+    ]
+    return '\n'.join(lines)
@@ -0,0 +1,697 @@
+import datetime
+import gc
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .ids import IdService
+from .postcodes import RANDOM_POSTCODES, PostcodeProvider
+from .rng import WeightedSampler
+from .types import AdoptionData, Child, Episode, LeavingCareData, Missing, OutcomesData, Probabilities, Review, intern_date
+from .generators import (
+    ACCOM_CODES,
+    ACTIV_CODES,
+    CIN_CODES,
+    ETHNICITY_CODES,
+    FOSTER_CARE_CODES,
+    IN_TOUCH_CODES,
+    LEGAL_STATUS_CODES,
+    LS_ADOPTER_CODES,
+    MISSING_TYPE_CODES,
+    NUMBER_ADOPTERS_CODES,
+    PLACEMENT_CODES,
+    PLACEMENT_PROVIDER_CODES,
+    PLACEMENT_PROVIDER_SAMPLERS,
+    PLACEMENT_TYPE_SAMPLERS_BY_AGE,
+    PREVIOUS_PERMANENT_CODES,
+    REASON_END_CODES,
+    REASON_NEW_EPISODE_CODES,
+    REASON_PLACE_CHANGE_CODES,
+    REVIEW_CODES,
+    SDQ_REASON_CODES,
+    SEX_ADOPTER_CODES,
+    reason_for_episode_change_sampler,
+)
+
+# Categorical columns are stored as small integer indices into these codesets, with -1 standing for None.
+CODES = {
+    'ethnicity': ETHNICITY_CODES,
+    'previous_permanent': PREVIOUS_PERMANENT_CODES,
+    'in_touch': IN_TOUCH_CODES,
+    'activ': ACTIV_CODES,
+    'accom': ACCOM_CODES,
+    'adoption_reason_ceased': ('XXX',),
+    'foster_care': FOSTER_CARE_CODES,
+    'number_adopters': NUMBER_ADOPTERS_CODES,
+    'sex_adopter': SEX_ADOPTER_CODES,
+    'ls_adopter': LS_ADOPTER_CODES,
+    'sdq_reason': SDQ_REASON_CODES,
+    'reason_for_new_episode': REASON_NEW_EPISODE_CODES,
+    'legal_status': LEGAL_STATUS_CODES,
+    'cin': CIN_CODES,
+    'place': PLACEMENT_CODES,
+    'place_provider': PLACEMENT_PROVIDER_CODES,
+    'reason_end': ('X1',) + REASON_END_CODES,
+    'reason_place_change': REASON_PLACE_CHANGE_CODES,
+    'review_code': REVIEW_CODES,
+    'missing_type': MISSING_TYPE_CODES,
+}
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+OUTCOME_FLAGS = (
+    'convicted', 'health_check', 'immunisations', 'teeth_check', 'health_assessment', 'substance_misuse',
+    'intervention_received', 'intervention_offered',
+)
+
+
+@dataclass
+class ChildrenArrays:
+    """
+    A population of children stored as a struct of NumPy arrays rather than a list of Child objects.
+
+    Each table is a dict of equal length columns, named after the matching attribute of the types in
+    cscsynth.types. Dates are datetime64[D] (NaT for None), postcodes and UPNs are fixed width bytes and
+    categorical columns are int8 indices into the codesets in CODES (-1 for None).
+
+    The episodes, reviews and missing tables are flat, with one row per item across all children. The rows for
+    child i are rows offsets[i]:offsets[i + 1] of the table (as in a CSR sparse matrix).
+
+    :param children: One row per child.
+    :param episodes: One row per episode.
+    :param reviews: One row per review.
+    :param missing: One row per missing period.
+    :param episode_offsets: Start of each child's episodes, with a final entry for the total number of episodes.
+    :param review_offsets: Start of each child's reviews, as for episode_offsets.
+    :param missing_offsets: Start of each child's missing periods, as for episode_offsets.
+    """
+    children: Dict[str, np.ndarray]
+    episodes: Dict[str, np.ndarray]
+    reviews: Dict[str, np.ndarray]
+    missing: Dict[str, np.ndarray]
+    episode_offsets: np.ndarray
+    review_offsets: np.ndarray
+    missing_offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.episode_offsets) - 1
+
+    def to_children(self) -> List[Child]:
+        """
+        Converts the arrays back into Child objects, for use with the rest of the library.
+
+        :returns: A list of Child objects, in the same order as the rows of the children table.
+        """
+        # Creating millions of objects triggers many full garbage collections, none of which can free anything, so
+        # collection is paused while they are built
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            c = {name: _to_python(name, values) for name, values in self.children.items()}
+            e = {name: _to_python(name, values) for name, values in self.episodes.items()}
+            r = {name: _to_python(name, values) for name, values in self.reviews.items()}
+            m = {name: _to_python(name, values) for name, values in self.missing.items()}
+
+            # The records are built with positional arguments, which is much faster than by keyword
+            episodes = list(map(Episode, *(e[f.name] for f in fields(Episode))))
+            reviews = list(map(Review, *(r[f.name] for f in fields(Review))))
+            missing = list(map(Missing, *(m[f.name] for f in fields(Missing))))
+
+            leaving_care_data = [
+                LeavingCareData(accom, in_touch, activ) if has_leaving_care else None
+                for has_leaving_care, accom, in_touch, activ in zip(
+                    c['has_leaving_care'], c['accom'], c['in_touch'], c['activ'],
+                )
+            ]
+            adoption_data = [
+                AdoptionData(*adoption) if adoption[0] is not None else None
+                for adoption in zip(
+                    c['adoption_start_date'], c['adoption_end_date'], c['adoption_reason_ceased'],
+                    c['foster_care'], c['number_adopters'], c['sex_adopter'], c['ls_adopter'],
+                )
+            ]
+            outcomes_data = [
+                OutcomesData(sdq_score if sdq_score >= 0 else None, *outcomes) if has_outcomes else None
+                for has_outcomes, sdq_score, *outcomes in zip(
+                    c['has_outcomes'], c['sdq_score'], c['sdq_reason'], *(c[flag] for flag in OUTCOME_FLAGS),
+                )
+            ]
+
+            return list(map(
+                Child,
+                c['upn'], c['child_id'], c['sex'], c['ethnicity'], c['dob'],
+                _split(episodes, self.episode_offsets),
+                _split(reviews, self.review_offsets),
+                leaving_care_data,
+                c['mother_child_dob'], c['previous_permanent'], c['prev_permanent_date'],
+                _split(missing, self.missing_offsets),
+                c['date_uasc_ceased'],
+                adoption_data,
+                outcomes_data,
+            ))
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def slice(self, start: int, stop: int) -> 'ChildrenArrays':
+        """
+        :returns: The children in rows start:stop, with their episodes, reviews and missing periods. The columns are
+            views of these arrays rather than copies.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        tables = {'children': {name: values[start:stop] for name, values in self.children.items()}}
+        offsets = {}
+        for table, offsets_name in [('episodes', 'episode_offsets'), ('reviews', 'review_offsets'),
+                                    ('missing', 'missing_offsets')]:
+            table_offsets = getattr(self, offsets_name)[start:stop + 1]
+            first, last = table_offsets[0], table_offsets[-1]
+            tables[table] = {name: values[first:last] for name, values in getattr(self, table).items()}
+            offsets[offsets_name] = table_offsets - first
+        return ChildrenArrays(**tables, **offsets)
+
+    def take(self, rows: np.ndarray) -> 'ChildrenArrays':
+        """
+        :param rows: Rows of the children table, e.g. the positions of the children in a census found by a
+            PopulationIndex.
+        :returns: The children in those rows, in that order, with their episodes, reviews and missing periods.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        tables = {'children': {name: values[rows] for name, values in self.children.items()}}
+        offsets = {}
+        for table, offsets_name in [('episodes', 'episode_offsets'), ('reviews', 'review_offsets'),
+                                    ('missing', 'missing_offsets')]:
+            all_offsets = getattr(self, offsets_name)
+            starts = all_offsets[rows]
+            counts = all_offsets[rows + 1] - starts
+            table_offsets = _offsets(counts)
+            # Each child's rows of the table, one after the other
+            table_rows = np.arange(table_offsets[-1]) + np.repeat(starts - table_offsets[:-1], counts)
+            tables[table] = {name: values[table_rows] for name, values in getattr(self, table).items()}
+            offsets[offsets_name] = table_offsets
+        return ChildrenArrays(**tables, **offsets)
+
+    @staticmethod
+    def from_children(children: Sequence[Child]) -> 'ChildrenArrays':
+        """
+        Converts a list of Child objects into arrays, as generated by generate_children_arrays. This is the inverse
+        of to_children: converting the result back gives children equal to the given ones.
+
+        :param children: The children, whose codes must all be in the codesets in CODES.
+        :returns: The children as a ChildrenArrays.
+        """
+        all_episodes = [e for child in children for e in child.episodes]
+        all_reviews = [r for child in children for r in child.reviews]
+        all_missing = [m for child in children for m in child.missing_periods or []]
+        leaving_care = [child.leaving_care_data for child in children]
+        adoption = [child.adoption_data for child in children]
+        outcomes = [child.outcomes_data for child in children]
+
+        child_table = {
+            'child_id': np.array([child.child_id for child in children], dtype=np.int64),
+            'upn': np.array([child.upn for child in children], dtype='S13'),
+            'sex': np.array([child.sex for child in children], dtype=np.int8),
+            'ethnicity': _from_python('ethnicity', [child.ethnicity for child in children]),
+            'dob': _from_python('dob', [child.dob for child in children]),
+            'previous_permanent': _from_python('previous_permanent', [child.previous_permanent for child in children]),
+            'prev_permanent_date': _from_python('prev_permanent_date', [child.prev_permanent_date for child in children]),
+            'mother_child_dob': _from_python('mother_child_dob', [child.mother_child_dob for child in children]),
+            'date_uasc_ceased': _from_python('date_uasc_ceased', [child.date_uasc_ceased for child in children]),
+            'has_leaving_care': np.array([data is not None for data in leaving_care], dtype=bool),
+        }
+        for name in ['in_touch', 'activ', 'accom']:
+            child_table[name] = _from_python(name, [getattr(data, name, None) for data in leaving_care])
+
+        child_table['adoption_start_date'] = _from_python('adoption_start_date', [getattr(data, 'start_date', None) for data in adoption])
+        child_table['adoption_end_date'] = _from_python('adoption_end_date', [getattr(data, 'end_date', None) for data in adoption])
+        child_table['adoption_reason_ceased'] = _from_python('adoption_reason_ceased', [getattr(data, 'reason_ceased', None) for data in adoption])
+        for name in ['foster_care', 'number_adopters', 'sex_adopter', 'ls_adopter']:
+            child_table[name] = _from_python(name, [getattr(data, name, None) for data in adoption])
+
+        child_table['has_outcomes'] = np.array([data is not None for data in outcomes], dtype=bool)
+        sdq_scores = [getattr(data, 'sdq_score', None) for data in outcomes]
+        child_table['sdq_score'] = np.array([-1 if score is None else score for score in sdq_scores], dtype=np.int8)
+        child_table['sdq_reason'] = _from_python('sdq_reason', [getattr(data, 'sdq_reason', None) for data in outcomes])
+        for flag in OUTCOME_FLAGS:
+            child_table[flag] = np.array([bool(getattr(data, flag, False)) for data in outcomes], dtype=bool)
+
+        episodes = {f.name: _from_python(f.name, [getattr(e, f.name) for e in all_episodes]) for f in fields(Episode)}
+        episodes['urn'] = episodes['urn'].astype(np.int32)
+
+        return ChildrenArrays(
+            children=child_table,
+            episodes=episodes,
+            reviews={f.name: _from_python(f.name, [getattr(r, f.name) for r in all_reviews]) for f in fields(Review)},
+            missing={f.name: _from_python(f.name, [getattr(m, f.name) for m in all_missing]) for f in fields(Missing)},
+            episode_offsets=_offsets([len(child.episodes) for child in children]),
+            review_offsets=_offsets([len(child.reviews) for child in children]),
+            missing_offsets=_offsets([len(child.missing_periods or []) for child in children]),
+        )
+
+    def save(self, path: Union[Path, str]):
+        """
+        Saves the arrays to an uncompressed .npz file, which can be read back with ChildrenArrays.load.
+
+        :param path: The file to write to.
+        """
+        arrays = {'episode_offsets': self.episode_offsets, 'review_offsets': self.review_offsets,
+                  'missing_offsets': self.missing_offsets}
+        for table in _TABLES:
+            for name, values in getattr(self, table).items():
+                arrays[f'{table}/{name}'] = values
+
+        # Saving to an open file stops numpy adding a .npz suffix to the path
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def load(path: Union[Path, str]) -> 'ChildrenArrays':
+        """
+        :param path: A file written by ChildrenArrays.save.
+        :returns: The arrays saved in the file.
+        """
+        tables = {table: {} for table in _TABLES}
+        offsets = {}
+        with np.load(path) as data:
+            for key in data.files:
+                table, _, name = key.rpartition('/')
+                if table:
+                    tables[table][name] = data[key]
+                else:
+                    offsets[name] = data[key]
+        return ChildrenArrays(**tables, **offsets)
+
+
+_TABLES = ('children', 'episodes', 'reviews', 'missing')
+
+_DATE_COLUMNS = {
+    'dob', 'prev_permanent_date', 'mother_child_dob', 'date_uasc_ceased', 'adoption_start_date', 'adoption_end_date',
+    'start_date', 'end_date', 'review_date',
+}
+
+
+def _split(items: list, offsets: np.ndarray) -> List[list]:
+    """
+    :returns: The items split into a list for each child, by the child's offsets.
+    """
+    offsets = offsets.tolist()
+    return [items[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _to_python(name: str, values: np.ndarray) -> list:
+    """
+    Converts a column to a list of the Python values used on the Child types.
+    """
+    if name in CODES:
+        lookup = np.array(CODES[name] + (None,), dtype=object)
+        return lookup[values].tolist()
+    if values.dtype.kind == 'M':
+        # Each day is converted once, and every row on that day shares the resulting datetime
+        days, inverse = np.unique(values, return_inverse=True)
+        lookup = np.array([intern_date(d) for d in days.astype('datetime64[us]').tolist()], dtype=object)
+        return lookup[inverse.ravel()].tolist()
+    if values.dtype.kind == 'S':
+        # The bytes are all ASCII, and casting them is several times faster than np.char.decode
+        return values.astype('U').tolist()
+    return values.tolist()
+
+
+def _from_python(name: str, values: list) -> np.ndarray:
+    """
+    Converts a list of the Python values used on the Child types to a column, as stored by ChildrenArrays.
+    """
+    if name in CODES:
+        lookup = {code: index for index, code in enumerate(CODES[name])}
+        lookup[None] = -1
+        return np.fromiter(map(lookup.__getitem__, values), dtype=np.int8, count=len(values))
+    if name in _DATE_COLUMNS:
+        dates = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+        present = [i for i, value in enumerate(values) if value is not None]
+        dates[present] = _dates_to_datetime64([values[i] for i in present])
+        return dates
+    if name.endswith('postcode'):
+        return np.array(values, dtype='S')
+    return np.array(values)
+
+
+def generate_children_arrays(
+    num_children: int,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    probabilities: Probabilities,
+    rng: np.random.Generator,
+    ids: Optional[IdService] = None,
+    postcodes: Optional[PostcodeProvider] = None,
+) -> ChildrenArrays:
+    """
+    Generates a population of children with the same distributions as ChildrenGenerator.generate, but drawing
+    every attribute for the whole population at once with vectorised NumPy calls.
+
+    :param num_children: The number of children to generate.
+    :param start_date: No episode will have a start date before this date.
+    :param end_date: Missing periods start before this date.
+    :param probabilities: The probabilities used for generation.
+    :param rng: The NumPy random generator to draw from.
+    :param ids: Assigns the child ids and UPNs, by the index of each child. If not given, one is keyed from rng.
+    :param postcodes: Where the home and placement postcodes come from. By default, they are made up.
+    :returns: The generated population.
+    """
+    if ids is None:
+        ids = IdService(int(rng.integers(2 ** 63)))
+    if postcodes is None:
+        postcodes = RANDOM_POSTCODES
+
+    start = np.datetime64(start_date, 'D')
+    end = np.datetime64(end_date, 'D')
+    n = num_children
+
+    children = {
+        'child_id': ids.child_ids(np.arange(n)),
+        'upn': ids.upns(np.arange(n)),
+        'sex': rng.integers(1, 2, size=n, endpoint=True).astype(np.int8),
+        'ethnicity': _uniform_codes(rng, 'ethnicity', n),
+        'dob': start - _days(rng.integers(0, 18 * 365, size=n, endpoint=True)),
+        'previous_permanent': np.full(n, CODES['previous_permanent'].index('Z1'), dtype=np.int8),
+        'prev_permanent_date': _no_dates(n),
+    }
+    dob = children['dob']
+
+    # A child is born somewhere between the 12th and 18th birthday
+    is_mother = (children['sex'] == 2) & (rng.random(n) < probabilities.is_mother)
+    days_to_birth = 12 * 365 + rng.integers(0, 6 * 365, size=n, endpoint=True)
+    children['mother_child_dob'] = np.where(is_mother, dob + _days(days_to_birth), np.datetime64('NaT'))
+
+    is_uasc = rng.random(n) < probabilities.is_uasc
+    children['date_uasc_ceased'] = np.where(is_uasc, dob + np.timedelta64(18 * 365, 'D'), np.datetime64('NaT'))
+
+    children['has_leaving_care'] = np.ones(n, dtype=bool)
+    for name in ['in_touch', 'activ', 'accom']:
+        children[name] = _uniform_codes(rng, name, n)
+
+    is_adopted = rng.random(n) <= probabilities.is_adopted
+    adoption_start = start + _days(rng.integers(0, 365, size=n, endpoint=True))
+    adoption_end = adoption_start + _days(rng.integers(365, 365 * 5, size=n, endpoint=True))
+    children['adoption_start_date'] = np.where(is_adopted, adoption_start, np.datetime64('NaT'))
+    children['adoption_end_date'] = np.where(is_adopted, adoption_end, np.datetime64('NaT'))
+    children['adoption_reason_ceased'] = np.where(is_adopted, 0, -1).astype(np.int8)
+    for name in ['foster_care', 'number_adopters', 'sex_adopter', 'ls_adopter']:
+        children[name] = np.where(is_adopted, _uniform_codes(rng, name, n), -1).astype(np.int8)
+
+    has_sdq = rng.random(n) < 0.5
+    children['has_outcomes'] = np.ones(n, dtype=bool)
+    children['sdq_score'] = np.where(has_sdq, rng.integers(1, 40, size=n, endpoint=True), -1).astype(np.int8)
+    children['sdq_reason'] = np.where(has_sdq, -1, _uniform_codes(rng, 'sdq_reason', n)).astype(np.int8)
+    for flag in OUTCOME_FLAGS:
+        children[flag] = rng.random(n) < 0.5
+
+    episodes, episode_offsets = _generate_episodes(rng, start, dob, probabilities, postcodes)
+    reviews, review_offsets = _generate_reviews(rng, episodes, episode_offsets, probabilities.review_frequency)
+    missing, missing_offsets = _generate_missing(rng, n, start, end, probabilities.is_missing)
+
+    return ChildrenArrays(
+        children=children,
+        episodes=episodes,
+        reviews=reviews,
+        missing=missing,
+        episode_offsets=episode_offsets,
+        review_offsets=review_offsets,
+        missing_offsets=missing_offsets,
+    )
+
+
+def _generate_episodes(
+    rng: np.random.Generator,
+    start: np.datetime64,
+    dob: np.ndarray,
+    probabilities: Probabilities,
+    postcodes: PostcodeProvider,
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Vectorised version of generators.generate_episodes and generators.generate_care_episode, for all children at
+    once. See those functions for the assumptions made.
+
+    :returns: The episodes table and the offsets of each child's episodes.
+    """
+    n = len(dob)
+
+    # Periods of care, with the waits before them scaled down to fit before the 18th birthday
+    num_periods = 1 + rng.poisson(probabilities.average_extra_episode_rate, size=n)
+    period_child = np.repeat(np.arange(n), num_periods)
+    period_offsets = _offsets(num_periods)
+
+    lengths = rng.negative_binomial(1, probabilities.daily_episode_ending, size=len(period_child))
+    days_before = rng.integers(0, 3012, size=len(period_child), endpoint=True)
+
+    days_in_which_can_be_lac = (dob + np.timedelta64(18 * 365, 'D') - start).astype(np.int64)
+    total_period = np.bincount(period_child, weights=days_before + lengths, minlength=n)
+    ratio = np.minimum(1, days_in_which_can_be_lac / np.maximum(total_period, 1))[period_child]
+    days_before = (days_before * ratio).astype(np.int64)
+    lengths = (lengths * ratio).astype(np.int64)
+
+    # Each period starts after its wait plus the lengths of the child's earlier periods
+    lengths_before = np.cumsum(lengths) - lengths
+    lengths_before -= np.repeat(lengths_before[period_offsets[:-1]], num_periods)
+    period_start = start + _days(days_before + lengths_before)
+
+    # Each period is split into episodes on the days it changes
+    change_period, change_day = _sample_event_days(rng, lengths, probabilities.daily_episode_changing)
+    row_period = np.concatenate([np.arange(len(lengths)), change_period])
+    row_day = np.concatenate([np.zeros(len(lengths), dtype=np.int64), change_day])
+    is_change = np.concatenate([np.zeros(len(lengths), dtype=bool), np.ones(len(change_period), dtype=bool)])
+    order = np.lexsort((is_change, row_day, row_period))
+    row_period, row_day, is_change = row_period[order], row_day[order], is_change[order]
+    num_rows = len(row_period)
+
+    is_last = np.ones(num_rows, dtype=bool)
+    is_last[:-1] = row_period[1:] != row_period[:-1]
+    end_day = np.where(is_last, lengths[row_period], np.roll(row_day, -1))
+
+    row_child = period_child[row_period]
+    start_date = period_start[row_period] + _days(row_day)
+
+    reason_codes, reason_sampler = _reason_for_episode_change_codes(probabilities)
+    reason = np.zeros(num_rows, dtype=np.int8)
+    reason[is_change] = reason_codes[reason_sampler.sample_indices(rng, is_change.sum())]
+    reason_names = np.array(REASON_NEW_EPISODE_CODES)[reason]
+
+    # Legal status and placement are sampled at the start of each period and on the relevant changes, and
+    # carried forward otherwise. As the first row of each period is always sampled, indexing the samples with
+    # the running count of sampled rows never carries a value into the next period.
+    new_legal_status = ~is_change | np.isin(reason_names, ['L', 'B', 'U'])
+    new_placement = ~is_change | np.isin(reason_names, ['P', 'B'])
+
+    legal_status = _uniform_codes(rng, 'legal_status', new_legal_status.sum())[np.cumsum(new_legal_status) - 1]
+
+    placement_rows = np.flatnonzero(new_placement)
+    age_in_years = (start_date[placement_rows] - dob[row_child[placement_rows]]).astype(np.int64) / 365
+    age_band = np.searchsorted([max_age for max_age, _ in PLACEMENT_TYPE_SAMPLERS_BY_AGE], age_in_years, side='right')
+    place = np.empty(len(placement_rows), dtype=np.int8)
+    for band, (_, sampler) in enumerate(PLACEMENT_TYPE_SAMPLERS_BY_AGE):
+        in_band = age_band == band
+        place[in_band] = sampler.sample_indices(rng, in_band.sum())
+    place_provider = np.empty(len(placement_rows), dtype=np.int8)
+    for code_index, code in enumerate(PLACEMENT_CODES):
+        is_place = place == code_index
+        place_provider[is_place] = PLACEMENT_PROVIDER_SAMPLERS[code].sample_indices(rng, is_place.sum())
+
+    placement_index = np.cumsum(new_placement) - 1
+    reason_place_change = np.full(num_rows, -1, dtype=np.int8)
+    next_is_placement_change = ~is_last & np.roll(new_placement, -1)
+    reason_place_change[next_is_placement_change] = _uniform_codes(rng, 'reason_place_change', next_is_placement_change.sum())
+
+    reason_end = np.zeros(num_rows, dtype=np.int8)
+    reason_end[is_last] = 1 + rng.integers(0, len(REASON_END_CODES), size=is_last.sum())
+
+    episodes = {
+        'start_date': start_date,
+        'end_date': period_start[row_period] + _days(end_day),
+        'reason_for_new_episode': reason,
+        'legal_status': legal_status,
+        'cin': _uniform_codes(rng, 'cin', len(lengths))[row_period],
+        'place': place[placement_index],
+        'place_provider': place_provider[placement_index],
+        'home_postcode': postcodes.postcodes(rng, len(placement_rows))[placement_index],
+        'place_postcode': postcodes.postcodes(rng, len(placement_rows))[placement_index],
+        'reason_end': reason_end,
+        'reason_place_change': reason_place_change,
+        'urn': rng.integers(1000000, 9999999, size=len(placement_rows), endpoint=True).astype(np.int32)[placement_index],
+    }
+
+    return episodes, _offsets(np.bincount(row_child, minlength=n))
+
+
+def _sample_event_days(rng: np.random.Generator, lengths: np.ndarray, daily_probability: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For a set of periods with the given lengths, samples the days on which an event with a fixed daily probability
+    happens. The gaps between events are geometric, and are drawn in blocks sized so that almost every period is
+    finished after the first block.
+
+    :returns: The period index and the day within the period of each event, sorted by period and day.
+    """
+    if daily_probability <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    event_periods, event_days = [], []
+    pending = np.arange(len(lengths))
+    last_day = np.full(len(lengths), -1, dtype=np.int64)
+    while len(pending) > 0:
+        expected = (lengths[pending] - 1 - last_day[pending]) * daily_probability
+        num_draws = np.ceil(expected + 4 * np.sqrt(expected) + 2).astype(np.int64)
+        draw_period = np.repeat(pending, num_draws)
+
+        gaps = rng.geometric(daily_probability, size=len(draw_period))
+        totals = np.cumsum(gaps)
+        draw_offsets = _offsets(num_draws)[:-1]
+        days = last_day[draw_period] + totals - np.repeat(totals[draw_offsets] - gaps[draw_offsets], num_draws)
+
+        in_period = days < lengths[draw_period]
+        event_periods.append(draw_period[in_period])
+        event_days.append(days[in_period])
+
+        # Periods where even the last draw was inside the period need more draws
+        last_day[pending] = days[draw_offsets + num_draws - 1]
+        pending = pending[last_day[pending] < lengths[pending]]
+
+    event_periods = np.concatenate(event_periods)
+    event_days = np.concatenate(event_days)
+    order = np.lexsort((event_days, event_periods))
+    return event_periods[order], event_days[order]
+
+
+def _generate_reviews(
+    rng: np.random.Generator,
+    episodes: Dict[str, np.ndarray],
+    episode_offsets: np.ndarray,
+    review_frequency: float,
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Vectorised version of generators.generate_reviews. Review days are sampled over each child's total days in
+    care, then mapped back onto the episodes through the cumulative episode lengths.
+
+    :returns: The reviews table and the offsets of each child's reviews.
+    """
+    n = len(episode_offsets) - 1
+    episode_lengths = (episodes['end_date'] - episodes['start_date']).astype(np.int64)
+    episode_child = np.repeat(np.arange(n), np.diff(episode_offsets))
+    total_days_in_care = np.bincount(episode_child, weights=episode_lengths, minlength=n).astype(np.int64)
+
+    # Must be at least one review if in care for 20 days or longer
+    num_reviews = np.maximum(total_days_in_care > 20, rng.poisson(review_frequency * total_days_in_care))
+    review_child = np.repeat(np.arange(n), num_reviews)
+    review_day = rng.integers(0, np.maximum(total_days_in_care[review_child], 1))
+    order = np.lexsort((review_day, review_child))
+    review_child, review_day = review_child[order], review_day[order]
+
+    days_before_child = np.cumsum(total_days_in_care) - total_days_in_care
+    days_before_episode = np.cumsum(episode_lengths) - episode_lengths
+    review_day += days_before_child[review_child]
+    review_episode = np.searchsorted(days_before_episode, review_day, side='right') - 1
+
+    reviews = {
+        'review_code': _uniform_codes(rng, 'review_code', len(review_day)),
+        'review_date': episodes['start_date'][review_episode] + _days(review_day - days_before_episode[review_episode]),
+    }
+    return reviews, _offsets(num_reviews)
+
+
+def generate_reviews_batch(
+    episodes_by_child: Sequence[List[Episode]],
+    review_frequency: float,
+    rng: np.random.Generator,
+) -> List[List[Review]]:
+    """
+    Batched version of generators.generate_reviews, generating the reviews for many children at once. The review
+    days of all children are sorted together and mapped onto the episodes with a single searchsorted over the
+    cumulative episode lengths.
+
+    :param episodes_by_child: The episodes of each child, which must all have an end date.
+    :param review_frequency: The daily frequency of reviews.
+    :param rng: The NumPy random generator to draw from.
+    :returns: The reviews of each child.
+    """
+    all_episodes = [e for episodes in episodes_by_child for e in episodes]
+    episodes = {
+        'start_date': _dates_to_datetime64([e.start_date for e in all_episodes]),
+        'end_date': _dates_to_datetime64([e.end_date for e in all_episodes]),
+    }
+    episode_offsets = _offsets([len(episodes) for episodes in episodes_by_child])
+
+    reviews, review_offsets = _generate_reviews(rng, episodes, episode_offsets, review_frequency)
+    all_reviews = [
+        Review(review_code=review_code, review_date=review_date)
+        for review_code, review_date in zip(
+            _to_python('review_code', reviews['review_code']),
+            _to_python('review_date', reviews['review_date']),
+        )
+    ]
+
+    review_offsets = review_offsets.tolist()
+    return [all_reviews[review_offsets[i]:review_offsets[i + 1]] for i in range(len(episodes_by_child))]
+
+
+def _generate_missing(
+    rng: np.random.Generator,
+    n: int,
+    start: np.datetime64,
+    end: np.datetime64,
+    is_missing: float,
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Vectorised version of generators.generate_missing_data.
+
+    :returns: The missing table and the offsets of each child's missing periods.
+    """
+    num_missing = np.where(rng.random(n) < is_missing, rng.integers(1, 2, size=n, endpoint=True), 0)
+    total = num_missing.sum()
+
+    days_til_end = (end - start).astype(np.int64)
+    start_date = start + _days(rng.integers(0, days_til_end, size=total, endpoint=True))
+
+    # Missing for 3-50 days
+    missing = {
+        'missing_type': _uniform_codes(rng, 'missing_type', total),
+        'start_date': start_date,
+        'end_date': start_date + _days(rng.integers(3, 50, size=total, endpoint=True)),
+    }
+    return missing, _offsets(num_missing)
+
+
+def _reason_for_episode_change_codes(probabilities: Probabilities) -> Tuple[np.ndarray, WeightedSampler]:
+    """
+    :returns: The code indices of the values of the reason for episode change sampler, and the sampler.
+    """
+    sampler = reason_for_episode_change_sampler(probabilities)
+    unknown = set(sampler.values) - set(REASON_NEW_EPISODE_CODES)
+    if unknown:
+        raise ValueError(f'Unknown reasons for episode change: {sorted(unknown)}')
+
+    return np.array([REASON_NEW_EPISODE_CODES.index(code) for code in sampler.values]), sampler
+
+
+def _uniform_codes(rng: np.random.Generator, name: str, size: int) -> np.ndarray:
+    return rng.integers(0, len(CODES[name]), size=size).astype(np.int8)
+
+
+def _offsets(counts: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def _days(days: np.ndarray) -> np.ndarray:
+    return np.asarray(days, dtype=np.int64).astype('timedelta64[D]')
+
+
+def _dates_to_datetime64(dates: List[datetime.datetime]) -> np.ndarray:
+    """
+    Converts a list of dates (none of which may be None) to datetime64[D]. Going through the ordinals is much
+    faster than letting NumPy parse the datetime objects.
+    """
+    ordinals = np.fromiter(map(datetime.date.toordinal, dates), dtype=np.int64, count=len(dates))
+    return (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+
+
+def _no_dates(n: int) -> np.ndarray:
+    return np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
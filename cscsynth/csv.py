@@ -1,177 +1,540 @@
+import datetime
+import io
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from typing import List, Union
-from .types import Child
-
-def create_csv(children: List[Child], output_dir: Union[Path,str]):
-    header_df = create_header(children)
-    episodes_df = create_episodes(children)
-    uasc_df = create_uasc(children)
-    reviews_df = create_reviews(children)
-    oc2_df = create_oc2(children)
-    oc3_df = create_oc3(children)
-    ad1_df = create_ad1(children)
-    sbpfa_df = create_should_be_placed_for_adoption(children)
-    prev_perm_df = create_previous_permanence(children)
-    missing_df = create_missing(children)
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from .columnar import CODES, OUTCOME_FLAGS, ChildrenArrays
+from .stats import add, stage
+from .types import _MAX_CACHED_DATES, Child
 
+# create_csv writes the children in chunks of this many children at a time
+CHUNK_SIZE = 10_000
+
+def create_csv(children: Iterable[Child], output_dir: Union[Path,str], chunk_size: int = CHUNK_SIZE):
+    """
+    Writes the CSV tables for the children into output_dir. The children are read and written a chunk at a time, so
+    children can be any iterable, e.g. a lazy ChildrenGenerator.iter_children, and only one chunk of children and
+    rows is held in memory at once.
+
+    :param children: The children to write.
+    :param output_dir: The directory to write the tables into. It is created if it doesn't exist.
+    :param chunk_size: The number of children to turn into rows at a time.
+    """
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
-    header_df.to_csv(output_dir / 'header.csv', index=False)
-    episodes_df.to_csv(output_dir / 'episodes.csv', index=False)
-    uasc_df.to_csv(output_dir / 'uasc.csv', index=False)
-    reviews_df.to_csv(output_dir / 'reviews.csv', index=False)
-    oc2_df.to_csv(output_dir / 'oc2.csv', index=False)
-    oc3_df.to_csv(output_dir / 'oc3.csv', index=False)
-    ad1_df.to_csv(output_dir / 'ad1.csv', index=False)
-    sbpfa_df.to_csv(output_dir / 'placed_for_adoption.csv', index=False)
-    prev_perm_df.to_csv(output_dir / 'previous_permanence.csv', index=False)
-    missing_df.to_csv(output_dir / 'missing.csv', index=False)
-
-def create_header(children: List[Child]) -> pd.DataFrame:
-    return pd.DataFrame({
-        'CHILD': [c.child_id for c in children],
-        'SEX': [c.sex for c in children],
-        'DOB': [c.dob.strftime('%d/%m/%Y') for c in children],
-        'ETHNIC': [c.ethnicity for c in children],
-        'UPN': [c.upn for c in children],
-        'MOTHER': [1 if c.mother_child_dob is not None else None for c in children],
-        'MC_DOB': [c.mother_child_dob.strftime('%d/%m/%Y') if c.mother_child_dob is not None else None for c in children],
-    })
-
-def create_episodes(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-
-    for child in children:
-        for episode in child.episodes:
-            data['CHILD'].append(child.child_id)
-            data['DECOM'].append(episode.start_date.strftime('%d/%m/%Y'))
-            data['RNE'].append(episode.reason_for_new_episode)
-            data['LS'].append(episode.legal_status)
-            data['CIN'].append(episode.cin)
-            data['PLACE'].append(episode.place)
-            data['PLACE_PROVIDER'].append(episode.place_provider)
-            data['DEC'].append(episode.end_date.strftime('%d/%m/%y') if episode.end_date is not None else None)
-            data['REC'].append(episode.reason_end)
-            data['REASON_PLACE_CHANGE'].append(episode.reason_place_change)
-            data['HOME_POST'].append(episode.home_postcode)
-            data['PL_POST'].append(episode.place_postcode)
-            data['URN'].append(episode.urn)
-
-    return pd.DataFrame(data)
-
-def create_uasc(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-
-    for child in children:
-        if child.date_uasc_ceased is not None:
-            data['CHILD'].append(child.child_id)
-            data['SEX'].append(child.sex)
-            data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-            data['DUC'].append(child.date_uasc_ceased.strftime('%d/%m/%Y'))
-
-    return pd.DataFrame(data)
-
-def create_reviews(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-
-    for child in children:
-        for review in child.reviews:
-            data['CHILD'].append(child.child_id)
-            data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-            data['REVIEW'].append(review.review_date.strftime('%d/%m/%Y'))
-            data['REVIEW_CODE'].append(review.review_code)
-
-    return pd.DataFrame(data)
-
-def create_oc3(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-
-    for child in children:
-        if child.leaving_care_data is not None:
-            data['CHILD'].append(child.child_id)
-            data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-            data['IN_TOUCH'].append(child.leaving_care_data.in_touch)
-            data['ACTIV'].append(child.leaving_care_data.activ)
-            data['ACCOM'].append(child.leaving_care_data.accom)
-
-    return pd.DataFrame(data)
-
-def create_ad1(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-    for child in children:
-        if child.adoption_data is not None:
-            ad = child.adoption_data
-            data['CHILD'].append(child.child_id)
-            data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-            data['DATE_INT'].append(ad.start_date.strftime('%d/%m/%Y'))
-            data['DATE_MATCH'].append(ad.start_date.strftime('%d/%m/%Y'))
-            data['FOSTER_CARE'].append(ad.foster_care)
-            data['NB_ADOPTR'].append(ad.number_adopters)
-            data['SEX_ADOPTR'].append(ad.sex_adopter)
-            data['LS_ADOPTR'].append(ad.ls_adopter)
-
-    return pd.DataFrame(data)
-
-def create_should_be_placed_for_adoption(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-    for child in children:
-        if child.adoption_data is not None:
-            ad = child.adoption_data
-            data['CHILD'].append(child.child_id)
-            data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-            data['DATE_PLACED'].append(ad.start_date.strftime('%d/%m/%Y'))
-            data['DATE_PLACED_CEASED'].append(ad.end_date.strftime('%d/%m/%Y') if ad.end_date is not None else None)
-            data['REASON_PLACED_CEASED'].append(ad.reason_ceased if ad.reason_ceased is not None else None)
-
-    return pd.DataFrame(data)
-
-def create_oc2(children: List[Child]) -> pd.DataFrame:
-    bool_to_str = lambda x: 1 if x else 0
-    data = defaultdict(list)
-    for child in children:
-        if child.outcomes_data is not None:
-            oc = child.outcomes_data
-            data['CHILD'].append(child.child_id)
-            data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-            data['SDQ_SCORE'].append(oc.sdq_score)
-            data['SDQ_REASON'].append(oc.sdq_reason)
-            data['CONVICTED'].append(bool_to_str(oc.convicted))
-            data['HEALTH_CHECK'].append(bool_to_str(oc.health_check))
-            data['IMMUNISATIONS'].append(bool_to_str(oc.immunisations))
-            data['TEETH_CHECK'].append(bool_to_str(oc.teeth_check))
-            data['HEALTH_ASSESSMENT'].append(bool_to_str(oc.health_assessment))
-            data['SUBSTANCE_MISUSE'].append(bool_to_str(oc.substance_misuse))
-            data['INTERVENTION_RECEIVED'].append(bool_to_str(oc.intervention_received))
-            data['INTERVENTION_OFFERED'].append(bool_to_str(oc.intervention_offered))
-
-    df =  pd.DataFrame(data)
-    # Pandas converts ints with null to float by default, so need to convert back
-    # to nullable integer.
-    df['SDQ_SCORE'] = df['SDQ_SCORE'].astype('Int64') 
-    return df
-
-def create_previous_permanence(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-    for child in children:
-        data['CHILD'].append(child.child_id)
-        data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-        data['PREV_PERM'].append(child.previous_permanent)
-        data['LA_PERM'].append(None) # this needs to be inferred
-        data['DATE_PERM'].append(child.prev_permanent_date.strftime('%d/%m/%Y') if child.prev_permanent_date is not None else None)
-
-    return pd.DataFrame(data)
-
-def create_missing(children: List[Child]) -> pd.DataFrame:
-    data = defaultdict(list)
-    for child in children:
-        for mp in child.missing_periods:
-            data['CHILD'].append(child.child_id)
-            data['DOB'].append(child.dob.strftime('%d/%m/%Y'))
-            data['MISSING'].append(mp.missing_type)
-            data['MIS_START'].append(mp.start_date.strftime('%d/%m/%Y'))
-            data['MIS_END'].append(mp.end_date.strftime('%d/%m/%Y') if mp.end_date is not None else None)
-
-    return pd.DataFrame(data)
\ No newline at end of file
+
+    with ExitStack() as stack:
+        files = []
+        for table in TABLES:
+            f = stack.enter_context(open(output_dir / table.file_name, 'w'))
+            header = table.header()
+            f.write(header)
+            add('csv', bytes=len(header))
+            files.append(f)
+
+        children = iter(children)
+        while True:
+            fields = _ChildFields.from_children(islice(children, chunk_size))
+            if not fields.children:
+                break
+
+            with stage('csv'):
+                for f, table in zip(files, TABLES):
+                    text = table.text(fields)
+                    f.write(text)
+                    # The tables are all ASCII, so there is a byte per character
+                    add('csv', bytes=len(text))
+            add('csv', items=len(fields.children))
+
+def create_csv_from_arrays(arrays: ChildrenArrays, output_dir: Union[Path, str], chunk_size: int = CHUNK_SIZE):
+    """
+    Writes the same CSV tables as create_csv, straight from the columns of a ChildrenArrays such as the census
+    taken by snapshot_arrays_for_period, without making any Child objects. Each column is formatted as a whole, and
+    the columns of a table are then interleaved into its rows with a single scatter of their bytes.
+
+    :param arrays: The children to write.
+    :param output_dir: The directory to write the tables into. It is created if it doesn't exist.
+    :param chunk_size: The number of children to turn into rows at a time.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with ExitStack() as stack:
+        files = []
+        for table in TABLES:
+            f = stack.enter_context(open(output_dir / table.file_name, 'wb'))
+            header = table.header()
+            f.write(header.encode())
+            add('csv', bytes=len(header))
+            files.append(f)
+
+        for start in range(0, len(arrays), chunk_size):
+            with stage('csv'):
+                fields = _ArrayFields.from_arrays(arrays.slice(start, start + chunk_size))
+                for f, table in zip(files, TABLES):
+                    text = _join_rows(table.array_columns(fields))
+                    f.write(text)
+                    add('csv', bytes=len(text))
+            add('csv', items=len(fields.arrays))
+
+def create_header(children: Iterable[Child]) -> pd.DataFrame:
+    return HEADER.dataframe(children)
+
+def create_episodes(children: Iterable[Child]) -> pd.DataFrame:
+    return EPISODES.dataframe(children)
+
+def create_uasc(children: Iterable[Child]) -> pd.DataFrame:
+    return UASC.dataframe(children)
+
+def create_reviews(children: Iterable[Child]) -> pd.DataFrame:
+    return REVIEWS.dataframe(children)
+
+def create_oc3(children: Iterable[Child]) -> pd.DataFrame:
+    return OC3.dataframe(children)
+
+def create_ad1(children: Iterable[Child]) -> pd.DataFrame:
+    return AD1.dataframe(children)
+
+def create_should_be_placed_for_adoption(children: Iterable[Child]) -> pd.DataFrame:
+    return PLACED_FOR_ADOPTION.dataframe(children)
+
+def create_oc2(children: Iterable[Child]) -> pd.DataFrame:
+    return OC2.dataframe(children)
+
+def create_previous_permanence(children: Iterable[Child]) -> pd.DataFrame:
+    return PREVIOUS_PERMANENCE.dataframe(children)
+
+def create_missing(children: Iterable[Child]) -> pd.DataFrame:
+    return MISSING.dataframe(children)
+
+class _DateStrings(dict):
+    """
+    Memoised date formatting, as a dict from date to its text in the CSV ('' for None). Only a few thousand distinct
+    dates turn up across any number of children, so each is only passed to strftime once. Like the date caches in
+    cscsynth.types, it is emptied if it reaches _MAX_CACHED_DATES dates.
+    """
+    def __init__(self, date_format: str):
+        super().__init__()
+        self.date_format = date_format
+
+    def __missing__(self, date: Optional[datetime.datetime]) -> str:
+        text = date.strftime(self.date_format) if date is not None else ''
+        if len(self) >= _MAX_CACHED_DATES:
+            self.clear()
+        self[date] = text
+        return text
+
+_DATES = _DateStrings('%d/%m/%Y')
+_SHORT_DATES = _DateStrings('%d/%m/%y')
+
+class _DayText:
+    """
+    Vectorised date formatting for datetime64[D] columns, as bytes ('' for NaT). The text of each day is kept in an
+    array indexed by the day, covering every day seen so far, so formatting a column is a single lookup. If that
+    would cover more than _MAX_CACHED_DATES days, it covers just the days of the column being formatted instead.
+    """
+    def __init__(self, dates: _DateStrings):
+        self.dates = dates
+        # The first day covered, and the text of each day from then on. Replaced together, so that threads
+        # formatting at the same time always see a matching pair.
+        self._days = (0, np.zeros(0, dtype='S10'))
+
+    def __call__(self, values: np.ndarray) -> np.ndarray:
+        present = ~np.isnat(values)
+        days = values[present].astype(np.int64)
+        first, text = self._days
+        if len(days) > 0 and (days.min() < first or days.max() >= first + len(text)):
+            start, end = days.min(), days.max() + 1
+            if len(text) > 0 and max(end, first + len(text)) - min(start, first) <= _MAX_CACHED_DATES:
+                start, end = min(start, first), max(end, first + len(text))
+            first, text = self._cover(start, end)
+
+        column = np.zeros(len(values), dtype='S10')
+        column[present] = text[days - first]
+        return column
+
+    def _cover(self, first: int, end: int):
+        days = np.arange(first, end).astype('datetime64[D]').astype('datetime64[us]').tolist()
+        self._days = (int(first), np.array([self.dates[d] for d in days], dtype='S10'))
+        return self._days
+
+_DAY_TEXT = _DayText(_DATES)
+_SHORT_DAY_TEXT = _DayText(_SHORT_DATES)
+
+def _text(value: Any) -> Any:
+    # Optional values are written as empty fields
+    return '' if value is None else value
+
+@dataclass
+class _ChildFields:
+    """
+    The child level fields shared by the tables, formatted once per child rather than once per table.
+
+    :param children: The children.
+    :param dob: The formatted date of birth of each child.
+    :param prefix: The CHILD and DOB fields that start most of the tables, for each child.
+    """
+    children: List[Child]
+    dob: List[str]
+    prefix: List[str]
+
+    @staticmethod
+    def from_children(children: Iterable[Child]) -> '_ChildFields':
+        children = list(children)
+        dob = [_DATES[c.dob] for c in children]
+        return _ChildFields(
+            children=children,
+            dob=dob,
+            prefix=[f'{c.child_id},{d}' for c, d in zip(children, dob)],
+        )
+
+@dataclass
+class _ArrayFields:
+    """
+    The columnar version of _ChildFields, for create_csv_from_arrays and create_parquet_from_arrays.
+
+    :param arrays: The children.
+    :param columns: Formats the columns of the tables, as bytes for the CSVs (_TEXT_COLUMNS) or as Arrow arrays.
+    :param child_id: The formatted child id of each child.
+    :param dob: The formatted date of birth of each child.
+    """
+    arrays: ChildrenArrays
+    columns: Any
+    child_id: Any
+    dob: Any
+
+    @staticmethod
+    def from_arrays(arrays: ChildrenArrays, columns: Any = None) -> '_ArrayFields':
+        columns = columns or _TEXT_COLUMNS
+        return _ArrayFields(
+            arrays=arrays,
+            columns=columns,
+            child_id=columns.integers(arrays.children['child_id']),
+            dob=columns.dates(arrays.children['dob']),
+        )
+
+    def prefix(self, rows: Any = slice(None)) -> List[Any]:
+        """
+        :param rows: Rows of the children table, e.g. a mask or the owner of each row of another table.
+        :returns: The CHILD and DOB columns that start most of the tables, for the rows.
+        """
+        return [self.columns.take(self.child_id, rows), self.columns.take(self.dob, rows)]
+
+@dataclass
+class _Table:
+    """
+    One of the CSV tables. Each row is rendered straight to its line of text in a single pass over the children, with
+    dates looked up in the memoised _DateStrings, so no intermediate columns or DataFrame are needed to write it.
+
+    :param file_name: The file name used by create_csv.
+    :param columns: The column names.
+    :param lines: Renders the lines of the table (each ending in a newline) for a batch of children.
+    :param array_columns: Renders the columns of the table for a batch of children in a ChildrenArrays, formatted by
+        the columns of the _ArrayFields: as arrays of bytes for create_csv_from_arrays, or as Arrow arrays for
+        create_parquet.
+    :param dtypes: The pandas dtypes of the non-string columns in the DataFrame returned by dataframe.
+    :param dates: The date columns, and the format they are written in.
+    :param codes: The columns holding codes from a fixed codeset.
+    """
+    file_name: str
+    columns: List[str]
+    lines: Callable[[_ChildFields], List[str]]
+    array_columns: Callable[[_ArrayFields], List[Any]]
+    dtypes: Dict[str, str] = field(default_factory=dict)
+    dates: Dict[str, str] = field(default_factory=dict)
+    codes: List[str] = field(default_factory=list)
+
+    def header(self) -> str:
+        return ','.join(self.columns) + '\n'
+
+    def text(self, fields: _ChildFields) -> str:
+        """
+        :returns: The rows of the table for the children, as CSV text.
+        """
+        lines = self.lines(fields)
+        text = ''.join(lines)
+        # Fields are written unquoted, which is only safe if none of them contain a separator, quote or line break
+        if text.count(',') != len(lines) * (len(self.columns) - 1) or text.count('\n') != len(lines) or '"' in text:
+            raise ValueError(f'Values in {self.file_name} must not contain commas, quotes or line breaks')
+        return text
+
+    def dataframe(self, children: Iterable[Child]) -> pd.DataFrame:
+        """
+        :returns: The table for the children as a DataFrame, read back from its CSV text so that the two always match.
+        """
+        text = self.header() + self.text(_ChildFields.from_children(children))
+        dtypes = {name: self.dtypes.get(name, str) for name in self.columns}
+        return pd.read_csv(io.StringIO(text), dtype=dtypes, na_values=[''], keep_default_na=False)
+
+def _header_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{c.child_id},{c.sex},{dob},{c.ethnicity},{c.upn},'
+        f'{"" if c.mother_child_dob is None else 1},{_DATES[c.mother_child_dob]}\n'
+        for c, dob in zip(fields.children, fields.dob)
+    ]
+
+def _episodes_lines(fields: _ChildFields) -> List[str]:
+    # This is by far the largest table, so the date lookups are bound locally
+    dates, short_dates = _DATES, _SHORT_DATES
+    return [
+        f'{c.child_id},{dates[e.start_date]},{e.reason_for_new_episode},{e.legal_status},{e.cin},{e.place},'
+        f'{e.place_provider},{short_dates[e.end_date]},{e.reason_end},{e.reason_place_change or ""},'
+        f'{e.home_postcode},{e.place_postcode},{e.urn or ""}\n'
+        for c in fields.children for e in c.episodes
+    ]
+
+def _uasc_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{c.child_id},{c.sex},{dob},{_DATES[c.date_uasc_ceased]}\n'
+        for c, dob in zip(fields.children, fields.dob) if c.date_uasc_ceased is not None
+    ]
+
+def _reviews_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{prefix},{_DATES[r.review_date]},{r.review_code}\n'
+        for c, prefix in zip(fields.children, fields.prefix) for r in c.reviews
+    ]
+
+def _oc3_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{prefix},{lc.in_touch},{lc.activ},{lc.accom}\n'
+        for prefix, lc in zip(fields.prefix, (c.leaving_care_data for c in fields.children)) if lc is not None
+    ]
+
+def _ad1_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{prefix},{_DATES[ad.start_date]},{_DATES[ad.start_date]},{ad.foster_care},{ad.number_adopters},'
+        f'{ad.sex_adopter},{ad.ls_adopter}\n'
+        for prefix, ad in zip(fields.prefix, (c.adoption_data for c in fields.children)) if ad is not None
+    ]
+
+def _placed_for_adoption_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{prefix},{_DATES[ad.start_date]},{_DATES[ad.end_date]},{_text(ad.reason_ceased)}\n'
+        for prefix, ad in zip(fields.prefix, (c.adoption_data for c in fields.children)) if ad is not None
+    ]
+
+def _oc2_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{prefix},{_text(oc.sdq_score)},{_text(oc.sdq_reason)},{1 if oc.convicted else 0},'
+        f'{1 if oc.health_check else 0},{1 if oc.immunisations else 0},{1 if oc.teeth_check else 0},'
+        f'{1 if oc.health_assessment else 0},{1 if oc.substance_misuse else 0},'
+        f'{1 if oc.intervention_received else 0},{1 if oc.intervention_offered else 0}\n'
+        for prefix, oc in zip(fields.prefix, (c.outcomes_data for c in fields.children)) if oc is not None
+    ]
+
+def _previous_permanence_lines(fields: _ChildFields) -> List[str]:
+    # LA_PERM is left empty, as this needs to be inferred
+    return [
+        f'{prefix},{c.previous_permanent},,{_DATES[c.prev_permanent_date]}\n'
+        for c, prefix in zip(fields.children, fields.prefix)
+    ]
+
+def _missing_lines(fields: _ChildFields) -> List[str]:
+    return [
+        f'{prefix},{m.missing_type},{_DATES[m.start_date]},{_DATES[m.end_date]}\n'
+        for c, prefix in zip(fields.children, fields.prefix) for m in c.missing_periods
+    ]
+
+def _join_rows(columns: List[np.ndarray]) -> bytes:
+    """
+    Joins columns of bytes into CSV rows. The columns are laid side by side, with a separator between each, in a
+    matrix with a row of bytes per CSV row. Fixed width bytes are padded with nulls, and none of the values contain
+    a null, so dropping every null from the matrix leaves the text of the rows.
+    """
+    n = len(columns[0])
+    if n == 0:
+        return b''
+
+    comma = np.full((n, 1), ord(','), dtype=np.uint8)
+    newline = np.full((n, 1), ord('\n'), dtype=np.uint8)
+    parts = []
+    for column in columns:
+        parts.append(np.ascontiguousarray(column).view(np.uint8).reshape(n, -1))
+        parts.append(comma)
+    parts[-1] = newline
+
+    text = np.concatenate(parts, axis=1).ravel()
+    return text[text != 0].tobytes()
+
+def _int_text(values: np.ndarray, missing: Optional[int] = None) -> np.ndarray:
+    text = values.astype('S')
+    if missing is not None:
+        text[values == missing] = b''
+    return text
+
+def _code_text(name: str, values: np.ndarray) -> np.ndarray:
+    # Index -1 stands for None, which is written as an empty field
+    return np.array(CODES[name] + ('',), dtype='S')[values]
+
+def _flag_text(values: np.ndarray) -> np.ndarray:
+    return np.where(values, b'1', b'0')
+
+def _owners(offsets: np.ndarray) -> np.ndarray:
+    # The row in the children table of each row of a table with these offsets
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+class _TextColumns:
+    """
+    Formats the columns of a ChildrenArrays as the bytes written to the CSVs. Each kind of column has its own method,
+    so the same array_columns can build other formats of column, such as the Arrow arrays written by create_parquet.
+    """
+    @staticmethod
+    def take(column: np.ndarray, rows: Any) -> np.ndarray:
+        return column[rows]
+
+    @staticmethod
+    def integers(values: np.ndarray, missing: Optional[int] = None) -> np.ndarray:
+        return _int_text(values, missing)
+
+    @staticmethod
+    def dates(values: np.ndarray) -> np.ndarray:
+        return _DAY_TEXT(values)
+
+    @staticmethod
+    def short_dates(values: np.ndarray) -> np.ndarray:
+        return _SHORT_DAY_TEXT(values)
+
+    @staticmethod
+    def codes(name: str, values: np.ndarray) -> np.ndarray:
+        return _code_text(name, values)
+
+    @staticmethod
+    def flags(values: np.ndarray) -> np.ndarray:
+        return _flag_text(values)
+
+    @staticmethod
+    def strings(values: np.ndarray) -> np.ndarray:
+        return values
+
+    @staticmethod
+    def empty(n: int) -> np.ndarray:
+        return np.zeros(n, dtype='S1')
+
+_TEXT_COLUMNS = _TextColumns()
+
+def _header_array_columns(fields: _ArrayFields) -> List[Any]:
+    c, f = fields.arrays.children, fields.columns
+    return [
+        fields.child_id, f.integers(c['sex']), fields.dob, f.codes('ethnicity', c['ethnicity']), f.strings(c['upn']),
+        f.integers((~np.isnat(c['mother_child_dob'])).astype(np.int8), missing=0), f.dates(c['mother_child_dob']),
+    ]
+
+def _episodes_array_columns(fields: _ArrayFields) -> List[Any]:
+    e, f = fields.arrays.episodes, fields.columns
+    return [
+        f.take(fields.child_id, _owners(fields.arrays.episode_offsets)),
+        f.dates(e['start_date']),
+        f.codes('reason_for_new_episode', e['reason_for_new_episode']),
+        f.codes('legal_status', e['legal_status']),
+        f.codes('cin', e['cin']),
+        f.codes('place', e['place']),
+        f.codes('place_provider', e['place_provider']),
+        f.short_dates(e['end_date']),
+        f.codes('reason_end', e['reason_end']),
+        f.codes('reason_place_change', e['reason_place_change']),
+        f.strings(e['home_postcode']),
+        f.strings(e['place_postcode']),
+        f.integers(e['urn'], missing=0),
+    ]
+
+def _uasc_array_columns(fields: _ArrayFields) -> List[Any]:
+    c, f = fields.arrays.children, fields.columns
+    rows = ~np.isnat(c['date_uasc_ceased'])
+    return [
+        f.take(fields.child_id, rows), f.integers(c['sex'][rows]), f.take(fields.dob, rows),
+        f.dates(c['date_uasc_ceased'][rows]),
+    ]
+
+def _reviews_array_columns(fields: _ArrayFields) -> List[Any]:
+    r, f = fields.arrays.reviews, fields.columns
+    return fields.prefix(_owners(fields.arrays.review_offsets)) + [
+        f.dates(r['review_date']), f.codes('review_code', r['review_code']),
+    ]
+
+def _oc3_array_columns(fields: _ArrayFields) -> List[Any]:
+    c, f = fields.arrays.children, fields.columns
+    rows = c['has_leaving_care']
+    return fields.prefix(rows) + [f.codes(name, c[name][rows]) for name in ['in_touch', 'activ', 'accom']]
+
+def _ad1_array_columns(fields: _ArrayFields) -> List[Any]:
+    c, f = fields.arrays.children, fields.columns
+    rows = ~np.isnat(c['adoption_start_date'])
+    start_date = f.dates(c['adoption_start_date'][rows])
+    return fields.prefix(rows) + [start_date, start_date] + [
+        f.codes(name, c[name][rows]) for name in ['foster_care', 'number_adopters', 'sex_adopter', 'ls_adopter']
+    ]
+
+def _placed_for_adoption_array_columns(fields: _ArrayFields) -> List[Any]:
+    c, f = fields.arrays.children, fields.columns
+    rows = ~np.isnat(c['adoption_start_date'])
+    return fields.prefix(rows) + [
+        f.dates(c['adoption_start_date'][rows]), f.dates(c['adoption_end_date'][rows]),
+        f.codes('adoption_reason_ceased', c['adoption_reason_ceased'][rows]),
+    ]
+
+def _oc2_array_columns(fields: _ArrayFields) -> List[Any]:
+    c, f = fields.arrays.children, fields.columns
+    rows = c['has_outcomes']
+    return fields.prefix(rows) + [
+        f.integers(c['sdq_score'][rows], missing=-1), f.codes('sdq_reason', c['sdq_reason'][rows]),
+    ] + [f.flags(c[flag][rows]) for flag in OUTCOME_FLAGS]
+
+def _previous_permanence_array_columns(fields: _ArrayFields) -> List[Any]:
+    # LA_PERM is left empty, as this needs to be inferred
+    c, f = fields.arrays.children, fields.columns
+    return fields.prefix() + [
+        f.codes('previous_permanent', c['previous_permanent']), f.empty(len(c['dob'])),
+        f.dates(c['prev_permanent_date']),
+    ]
+
+def _missing_array_columns(fields: _ArrayFields) -> List[Any]:
+    m, f = fields.arrays.missing, fields.columns
+    return fields.prefix(_owners(fields.arrays.missing_offsets)) + [
+        f.codes('missing_type', m['missing_type']), f.dates(m['start_date']), f.dates(m['end_date']),
+    ]
+
+def _dates(*columns: str) -> Dict[str, str]:
+    return {name: _DATES.date_format for name in columns}
+
+HEADER = _Table('header.csv', ['CHILD', 'SEX', 'DOB', 'ETHNIC', 'UPN', 'MOTHER', 'MC_DOB'], _header_lines, _header_array_columns,
+                dtypes={'CHILD': 'int64', 'SEX': 'int64', 'MOTHER': 'Int64'},
+                dates=_dates('DOB', 'MC_DOB'), codes=['ETHNIC'])
+EPISODES = _Table('episodes.csv', ['CHILD', 'DECOM', 'RNE', 'LS', 'CIN', 'PLACE', 'PLACE_PROVIDER', 'DEC', 'REC',
+                                   'REASON_PLACE_CHANGE', 'HOME_POST', 'PL_POST', 'URN'], _episodes_lines, _episodes_array_columns,
+                  dtypes={'CHILD': 'int64', 'URN': 'Int64'},
+                  dates=dict(_dates('DECOM'), DEC=_SHORT_DATES.date_format),
+                  codes=['RNE', 'LS', 'CIN', 'PLACE', 'PLACE_PROVIDER', 'REC', 'REASON_PLACE_CHANGE'])
+UASC = _Table('uasc.csv', ['CHILD', 'SEX', 'DOB', 'DUC'], _uasc_lines, _uasc_array_columns,
+              dtypes={'CHILD': 'int64', 'SEX': 'int64'}, dates=_dates('DOB', 'DUC'))
+REVIEWS = _Table('reviews.csv', ['CHILD', 'DOB', 'REVIEW', 'REVIEW_CODE'], _reviews_lines, _reviews_array_columns,
+                 dtypes={'CHILD': 'int64'}, dates=_dates('DOB', 'REVIEW'), codes=['REVIEW_CODE'])
+OC2_FLAGS = ['CONVICTED', 'HEALTH_CHECK', 'IMMUNISATIONS', 'TEETH_CHECK', 'HEALTH_ASSESSMENT', 'SUBSTANCE_MISUSE',
+             'INTERVENTION_RECEIVED', 'INTERVENTION_OFFERED']
+OC2 = _Table('oc2.csv', ['CHILD', 'DOB', 'SDQ_SCORE', 'SDQ_REASON'] + OC2_FLAGS, _oc2_lines, _oc2_array_columns,
+             # SDQ_SCORE is a nullable integer, so that it isn't converted to float
+             dtypes=dict({'CHILD': 'int64', 'SDQ_SCORE': 'Int64'}, **{name: 'int64' for name in OC2_FLAGS}),
+             dates=_dates('DOB'), codes=['SDQ_REASON'])
+OC3 = _Table('oc3.csv', ['CHILD', 'DOB', 'IN_TOUCH', 'ACTIV', 'ACCOM'], _oc3_lines, _oc3_array_columns,
+             dtypes={'CHILD': 'int64'}, dates=_dates('DOB'), codes=['IN_TOUCH', 'ACTIV', 'ACCOM'])
+AD1 = _Table('ad1.csv', ['CHILD', 'DOB', 'DATE_INT', 'DATE_MATCH', 'FOSTER_CARE', 'NB_ADOPTR', 'SEX_ADOPTR',
+                         'LS_ADOPTR'], _ad1_lines, _ad1_array_columns,
+             dtypes={'CHILD': 'int64'}, dates=_dates('DOB', 'DATE_INT', 'DATE_MATCH'),
+             codes=['FOSTER_CARE', 'NB_ADOPTR', 'SEX_ADOPTR', 'LS_ADOPTR'])
+PLACED_FOR_ADOPTION = _Table('placed_for_adoption.csv', ['CHILD', 'DOB', 'DATE_PLACED', 'DATE_PLACED_CEASED',
+                                                         'REASON_PLACED_CEASED'], _placed_for_adoption_lines, _placed_for_adoption_array_columns,
+                             dtypes={'CHILD': 'int64'}, dates=_dates('DOB', 'DATE_PLACED', 'DATE_PLACED_CEASED'),
+                             codes=['REASON_PLACED_CEASED'])
+PREVIOUS_PERMANENCE = _Table('previous_permanence.csv', ['CHILD', 'DOB', 'PREV_PERM', 'LA_PERM', 'DATE_PERM'],
+                             _previous_permanence_lines, _previous_permanence_array_columns,
+                             dtypes={'CHILD': 'int64'}, dates=_dates('DOB', 'DATE_PERM'), codes=['PREV_PERM'])
+MISSING = _Table('missing.csv', ['CHILD', 'DOB', 'MISSING', 'MIS_START', 'MIS_END'], _missing_lines, _missing_array_columns,
+                 dtypes={'CHILD': 'int64'}, dates=_dates('DOB', 'MIS_START', 'MIS_END'), codes=['MISSING'])
+
+# The tables written by create_csv
+TABLES = [HEADER, EPISODES, UASC, REVIEWS, OC2, OC3, AD1, PLACED_FOR_ADOPTION, PREVIOUS_PERMANENCE, MISSING]
@@ -1,48 +1,147 @@
-import random
-import numpy as np
+import bisect
+import functools
+import math
 import string
 import itertools
 import datetime
 from typing import Optional, List, Dict, Tuple
 
 from dateutil.relativedelta import relativedelta
-from scipy.stats import nbinom
-from copy import deepcopy
-from .types import AdoptionData, LeavingCareData, Missing, OutcomesData, Probabilities, Episode, Review
+from .ids import IdService
+from .postcodes import RANDOM_POSTCODES, PostcodeProvider
+from .rng import Random, WeightedSampler
+from .stats import add
+from .types import AdoptionData, LeavingCareData, Missing, OutcomesData, Probabilities, Episode, Review, date_of_day, day_of
+
+# Codesets that the generators sample from. These are shared with the columnar engine, which stores codes as
+# indices into these tuples.
+ETHNICITY_CODES = (
+    'WBRI', 'WIRI', 'WOTH', 'WIRT', 'WROM', 'MWBC', 'MWBA', 'MWAS', 'MOTH', 'AIND', 'APKN',
+    'ABAN', 'AOTH', 'BCRB', 'BAFR', 'BOTH', 'CHNE', 'OOTH', 'REFU', 'NOBT'
+)
+LEGAL_STATUS_CODES = ('C1', 'C2', 'D1', 'E1', 'V2', 'V3', 'V4', 'L1', 'L2', 'L3', 'J1', 'J2', 'J3')
+CIN_CODES = tuple(f'N{i}' for i in range(1, 9))
+REASON_END_CODES = (
+    'E11', 'E12', 'E2', 'E3', 'E4A', 'E4B', 'E13', 'E41', 'E45', 'E46', 'E47', 'E48', 'E5',
+    'E6', 'E7', 'E9', 'E14', 'E15', 'E16', 'E17', 'E8'
+)
+REASON_PLACE_CHANGE_CODES = (
+    'CARPL', 'CLOSE', 'ALLEG', 'STAND', 'APPRR', 'CREQB', 'CREQO', 'CHILD', 'LAREQ', 'PLACE', 'CUSTOD', 'OTHER'
+)
+REASON_NEW_EPISODE_CODES = ('S', 'L', 'P', 'T', 'U', 'B')
+REVIEW_CODES = tuple(f'PN{i}' for i in range(8))
+IN_TOUCH_CODES = ('YES', 'NO', 'DIED', 'REFU', 'NREQ', 'RHOM')
+ACTIV_CODES = ('F1', 'P1', 'F2', 'P2', 'F3', 'P3', 'G4', 'G5', 'G6', '0')
+ACCOM_CODES = tuple(code + suitability for code in 'BCDEGHKRSTUVWYZ0' for suitability in '12')
+FOSTER_CARE_CODES = ('0', '1')
+NUMBER_ADOPTERS_CODES = ('1', '2')
+SEX_ADOPTER_CODES = ('F1', 'FF', 'M1', 'MF', 'MM')
+LS_ADOPTER_CODES = ('L0', 'L11', 'L12', 'L2', 'L3', 'L4')
+SDQ_REASON_CODES = tuple(f'SDQ{i}' for i in range(1, 6))
+MISSING_TYPE_CODES = ('M', 'A')
+PREVIOUS_PERMANENT_CODES = ('P1', 'P2', 'P3', 'P4', 'Z1')
+
+# Placement types are sampled with weights that depend on the age of the child. Each entry is the age (in years)
+# the child must be under, and the placement types with their weights.
+PLACEMENT_TYPE_WEIGHTS_BY_AGE = (
+    (5, {
+        'A3': 0.01, 'A4': 0.01, 'A5': 0.01, 'A6': 0.01, 'P1': 0.01, 'R2': 0.01, 'R3': 0.01, 'U1': 0.01,
+        'U2': 0.01, 'U3': 0.01, 'U4': 0.445, 'U5': 0.445, 'U6': 0.01,
+    }),
+    (16, {
+        'A3': 0.01, 'A4': 0.01, 'A5': 0.01, 'A6': 0.01, 'P1': 0.05, 'R2': 0.01, 'R3': 0, 'U1': 0.03,
+        'U2': 0.03, 'U3': 0.03, 'U4': 0.325, 'U5': 0.325, 'U6': 0.01, 'K1': 0.005, 'K2': 0.125, 'R1': 0.01,
+        'S1': 0.01,
+    }),
+    (math.inf, {
+        'A3': 0.01, 'A4': 0.01, 'A5': 0.01, 'A6': 0.01, 'P1': 0.05, 'R2': 0.01, 'R3': 0, 'U1': 0.01,
+        'U2': 0.01, 'U3': 0.01, 'U4': 0.08, 'U5': 0.08, 'U6': 0.01, 'K1': 0.005, 'K2': 0.05, 'R1': 0.01,
+        'S1': 0.01, 'P2': 0.35, 'H5': 0.35, 'R5': 0.05, 'P3': 0.01,
+    }),
+)
+PLACEMENT_CODES = tuple(PLACEMENT_TYPE_WEIGHTS_BY_AGE[-1][1])
+
+# The placement provider is sampled with weights (over PR0-PR5) that depend on the placement type.
+PLACEMENT_PROVIDER_CODES = tuple(f'PR{i}' for i in range(6))
+PLACEMENT_PROVIDER_WEIGHTS = {
+    **dict.fromkeys(['A3', 'A4', 'A5', 'A6'], (0, 0.5, 0, 0, 0.5, 0)),
+    **dict.fromkeys(['P1'], (1, 0, 0, 0, 0, 0)),
+    **dict.fromkeys(['R2', 'R3', 'R5', 'P3'], (0, 0, 0, 1, 0, 0)),
+    **dict.fromkeys(['U1', 'U2', 'U3'], (0, 1, 0, 0, 0, 0)),
+    **dict.fromkeys(['U4', 'U5', 'U6'], (0, 0.5, 0, 0, 0.5, 0)),
+    **dict.fromkeys(['R1', 'K2', 'S1', 'P2', 'H5'], (0, 0.25, 0, 0, 0.75, 0)),
+    **dict.fromkeys(['K1'], (0, 0, 0, 0, 1, 0)),
+}
+
+# The weighted codesets, compiled once into samplers. Placement types are weighted over every placement code, with
+# no weight for the codes missing from an age band, so the bands share one codeset.
+PLACEMENT_TYPE_SAMPLERS_BY_AGE = tuple(
+    (max_age, WeightedSampler(PLACEMENT_CODES, [weights.get(code, 0) for code in PLACEMENT_CODES]))
+    for max_age, weights in PLACEMENT_TYPE_WEIGHTS_BY_AGE
+)
+PLACEMENT_PROVIDER_SAMPLERS = {
+    place: WeightedSampler(PLACEMENT_PROVIDER_CODES, weights) for place, weights in PLACEMENT_PROVIDER_WEIGHTS.items()
+}
+
+_BOOLEANS = (False, True)
+
+# Used by the generators when no random number generator is passed in
+_default_random = Random()
+
+# Internally, dates are whole days counted from 1970-01-01 (see cscsynth.types.day_of), and episodes are built as
+# lists of their fields, in the order of Episode's fields, with the dates as days. The public generators take and
+# return datetimes, and ChildrenGenerator.child makes the datetimes and records of a child once it has been drawn.
+_START, _END, _REASON_FOR_NEW_EPISODE, _LEGAL_STATUS, _CIN, _PLACE, _PLACE_PROVIDER, _HOME_POSTCODE, \
+    _PLACE_POSTCODE, _REASON_END, _REASON_PLACE_CHANGE, _URN = range(12)
+
+def reason_for_episode_change_sampler(probabilities: Probabilities) -> WeightedSampler:
+    """
+    Samplers are cached by the weights they are built from, so a new one is only built when
+    probabilities.reason_for_episode_change changes.
 
-def generate_child_id() -> int:
+    :param probabilities: The probabilities to take the weights of the reasons for episode change from.
+    :returns: A sampler for the reason for a new episode.
     """
-    Generator for child IDs (an integer between 0 and 1 million).
-    Uniqueness is guaranteed for the life of the generator.
+    return _reason_for_episode_change_sampler(tuple(probabilities.reason_for_episode_change.items()))
+
+@functools.lru_cache(maxsize=16)
+def _reason_for_episode_change_sampler(weights: Tuple[Tuple[str, float], ...]) -> WeightedSampler:
+    return WeightedSampler([code for code, _ in weights], [weight for _, weight in weights])
 
+def generate_child_id(rng: Random = None, low: int = 0, high: int = 1_000_000) -> int:
+    """
+    Generator for child IDs (an integer between 0 and 1 million by default).
+    The ids are a keyed permutation of a counter (see cscsynth.ids), so uniqueness is guaranteed for the life of
+    the generator without keeping the ids seen so far. The generator stops once every id in the range is used.
+
+    :param rng: Random number generator to draw the key of the permutation from.
+    :param low: Smallest child id that can be generated.
+    :param high: Largest child id that can be generated.
     :returns: A new child id
     """
-    seen_child_ids = set()
-    while True:
-        child_id = random.randint(0, 1_000_000)
-        if child_id not in seen_child_ids:
-            seen_child_ids.add(child_id)
-            yield child_id
+    rng = rng or _default_random
+    ids = IdService(rng.getrandbits(64), child_id_range=(low, high))
+    for index in range(high - low + 1):
+        yield ids.child_id(index)
 
-def generate_upn() -> str:
+def generate_upn(rng: Random = None, low: int = 1, high: int = int(1e11)) -> str:
     """
     Generator for UPNs. Generates a 13 character UPN with the first character being A-Z, and the
     remaining 12 being digits.
-    Uniqueness is guaranteed for the life of the generator.
+    The UPNs are a keyed permutation of a counter (see cscsynth.ids), so uniqueness is guaranteed for the life of
+    the generator without keeping the UPNs seen so far.
 
+    :param rng: Random number generator to draw the key of the permutation from.
+    :param low: Smallest number for the digits of the UPN.
+    :param high: Largest number for the digits of the UPN.
     :returns: A new unique UPN.
     """
-    seen_upns = set()
-    while True:
-        first_letter = random.choice(string.ascii_uppercase)
-        rest_of_upn = str(random.randint(1, int(1e11))).zfill(12)
-        upn = first_letter + rest_of_upn
-
-        if upn not in seen_upns:
-            seen_upns.add(upn)
-            yield upn
+    rng = rng or _default_random
+    ids = IdService(rng.getrandbits(64), upn_number_range=(low, high))
+    for index in range(len(string.ascii_uppercase) * (high - low + 1)):
+        yield ids.upn(index)
 
-def generate_dob(reference_date: datetime.datetime, age_start: float = 0, age_end: float = 18) -> datetime.datetime:
+def generate_dob(reference_date: datetime.datetime, age_start: float = 0, age_end: float = 18, rng: Random = None) -> datetime.datetime:
     """
     Given a reference date, this will generate a date of birth such that the age is between age_start and age_end.
     The age is sampled uniformly from the range.
@@ -50,23 +149,25 @@ def generate_dob(reference_date: datetime.datetime, age_start: float = 0, age_en
     :param reference_date: Date at which age_start, age_end applies.
     :param age_start: Minimal age at reference_date
     :param age_end: Maximal age at reference_date
+    :param rng: Random number generator to draw from.
     :returns: Generated date of birth.
     """
-    age_at_start_in_days = random.randint(365 * age_start, 365 * age_end)
-    return reference_date - datetime.timedelta(days=age_at_start_in_days)
+    return date_of_day(_dob_day(day_of(reference_date), age_start, age_end, rng))
 
-def generate_ethnicity() -> str:
+def _dob_day(reference_day: int, age_start: float = 0, age_end: float = 18, rng: Random = None) -> int:
+    rng = rng or _default_random
+    return reference_day - rng.randint(365 * age_start, 365 * age_end)
+
+def generate_ethnicity(rng: Random = None) -> str:
     """
     Randomly samples ethnicity from the list of all available ethnicity codes.
 
     :returns: Ethnicity string.
     """
-    return random.choice([
-        'WBRI', 'WIRI', 'WOTH', 'WIRT', 'WROM', 'MWBC', 'MWBA', 'MWAS', 'MOTH', 'AIND', 'APKN', 
-        'ABAN', 'AOTH', 'BCRB', 'BAFR', 'BOTH', 'CHNE', 'OOTH', 'REFU', 'NOBT'
-    ])
+    rng = rng or _default_random
+    return rng.choice(ETHNICITY_CODES)
 
-def generate_motherhood_date(prob_is_mother: float, sex: int, dob: datetime.datetime) -> Optional[datetime.datetime]:
+def generate_motherhood_date(prob_is_mother: float, sex: int, dob: datetime.datetime, rng: Random = None) -> Optional[datetime.datetime]:
     """
     This generates a possible motherhood date for a child with given sex and date of birth. 
     The child can be born between age 12 and age 18, and only to female (code = 2) children.
@@ -76,22 +177,27 @@ def generate_motherhood_date(prob_is_mother: float, sex: int, dob: datetime.date
     :param prob_is_mother: Probability that a female child will become a mother at any point.
     :param sex: Sex code for child (1 = Male, 2 = Female)
     :param dob: Date of birth for child
+    :param rng: Random number generator to draw from.
     :returns: None if no birth, or the date of birth of the new child if this child is a mother.
     """
+    return date_of_day(_motherhood_day(prob_is_mother, sex, day_of(dob), rng))
+
+def _motherhood_day(prob_is_mother: float, sex: int, dob_day: int, rng: Random = None) -> Optional[int]:
+    rng = rng or _default_random
     mother_child_dob = None
     if sex == 2:
-        is_mother = random.random() < prob_is_mother
+        is_mother = rng.random() < prob_is_mother
         if is_mother:
             # A child is born somewhere between the 12th and 18th birthday
-            earliest_birth_date = dob + datetime.timedelta(days=12 * 365)
-            latest_birth_date = dob + datetime.timedelta(days=18 * 365)
+            earliest_birth_day = dob_day + 12 * 365
+            latest_birth_day = dob_day + 18 * 365
 
-            days_after_start_born = random.randint(0, (latest_birth_date - earliest_birth_date).days)
-            mother_child_dob = earliest_birth_date + datetime.timedelta(days=days_after_start_born)
+            days_after_start_born = rng.randint(0, latest_birth_day - earliest_birth_day)
+            mother_child_dob = earliest_birth_day + days_after_start_born
 
     return mother_child_dob
 
-def generate_uasc_ceased_date(prob_is_uasc: float, dob: datetime.datetime) -> Optional[datetime.datetime]:
+def generate_uasc_ceased_date(prob_is_uasc: float, dob: datetime.datetime, rng: Random = None) -> Optional[datetime.datetime]:
     """
     Generates a UASC ceased date. All children who are UASC will have a date, so this function performs two tasks
     - Randomly checks if the child is UASC (using prob_is_uasc)
@@ -99,17 +205,23 @@ def generate_uasc_ceased_date(prob_is_uasc: float, dob: datetime.datetime) -> Op
 
     :param prob_is_uasc: The probability that any child is UASC.
     :param dob: The date of birth of the child (used for determining the ceased date).
+    :param rng: Random number generator to draw from.
     :returns: None if not UASC, or the date ceased if they are.
     """
-    is_uasc = random.random() < prob_is_uasc
+    return date_of_day(_uasc_ceased_day(prob_is_uasc, day_of(dob), rng))
+
+def _uasc_ceased_day(prob_is_uasc: float, dob_day: int, rng: Random = None) -> Optional[int]:
+    rng = rng or _default_random
+    is_uasc = rng.random() < prob_is_uasc
     date_uasc_ceased = None
     if is_uasc:
-        date_uasc_ceased = dob + datetime.timedelta(days=18 * 365)
+        date_uasc_ceased = dob_day + 18 * 365
         # TODO: Find cases where this should be less than 18 - when checked all values are set to 18th birthday
 
     return date_uasc_ceased
 
-def generate_episodes(start_date, dob, probabilities: Probabilities) -> List[Episode]:
+def generate_episodes(start_date, dob, probabilities: Probabilities, rng: Random = None,
+                      postcodes: PostcodeProvider = None) -> List[Episode]:
     """
     Generates a list of all episodes for a given start date, date of birth and set of probabilities for generation.
     These episodes are generated based on the probabilities. The following assumptions are made.
@@ -125,15 +237,22 @@ def generate_episodes(start_date, dob, probabilities: Probabilities) -> List[Epi
         - average_extra_episode_rate (for determining the number of LAC periods)
         - daily_episode_ending (for determining the length of LAC periods)
         - Passed to generate_care_episode.
+    :param rng: Random number generator to draw from.
+    :param postcodes: Where the home and placement postcodes come from. By default, they are made up.
     """
-    total_num_care_episodes = 1 + np.random.poisson(probabilities.average_extra_episode_rate)
+    return _episodes(_episode_rows(day_of(start_date), day_of(dob), probabilities, rng, postcodes))
+
+def _episode_rows(start_day: int, dob_day: int, probabilities: Probabilities, rng: Random = None,
+                  postcodes: PostcodeProvider = None) -> List[list]:
+    rng = rng or _default_random
+    total_num_care_episodes = 1 + rng.poisson(probabilities.average_extra_episode_rate)
 
-    adult_day = dob + datetime.timedelta(days=18 * 365)
-    days_in_which_can_be_lac = (adult_day - start_date).days
-    episode_lengths = nbinom.rvs(n=1, p=probabilities.daily_episode_ending, size=total_num_care_episodes)
+    adult_day = dob_day + 18 * 365
+    days_in_which_can_be_lac = adult_day - start_day
+    episode_lengths = [rng.negative_binomial(1, probabilities.daily_episode_ending) for _ in range(total_num_care_episodes)]
 
     # Allow up to 200 days between episodes
-    days_before = [random.randint(0, 3012) for _ in range(total_num_care_episodes)]
+    days_before = [rng.randint(0, 3012) for _ in range(total_num_care_episodes)]
 
     # We may generate a longer period than there is days before the 18th birthday
     # If this happens, we can ratio down the sizes of each event
@@ -143,20 +262,22 @@ def generate_episodes(start_date, dob, probabilities: Probabilities) -> List[Epi
     episode_lengths = [int(d * ratio) for d in episode_lengths]
 
     # We can then figure out the start date for each and generate the episodes
-    episode_starts = [start_date + datetime.timedelta(days=d + sum(episode_lengths[:i])) for i, d in enumerate(days_before)]
+    episode_starts = [start_day + d + sum(episode_lengths[:i]) for i, d in enumerate(days_before)]
 
-    all_episodes = []
+    rows = []
     for episode_start, episode_length in zip(episode_starts, episode_lengths):
-        episodes = generate_care_episode(episode_start, episode_length, probabilities, dob)
-        all_episodes.append(episodes)
+        rows.extend(_care_episode_rows(episode_start, episode_length, probabilities, dob_day, rng, postcodes))
 
-    return list(itertools.chain.from_iterable(all_episodes))
+    return rows
 
-def generate_care_episode(start_date: datetime.datetime, length_of_episode: int, probabilities: Probabilities, dob):
+def generate_care_episode(start_date: datetime.datetime, length_of_episode: int, probabilities: Probabilities, dob, rng: Random = None,
+                          postcodes: PostcodeProvider = None):
     """
     Generates a specific set of care episodes that directly relate to the same period of care (but with different
     legal status or placements).
     These start at the start_date, run for the length_of_episode, and change randomly based on probabilities.daily_episode_changing.
+    The days on which a change happens are sampled directly from the (geometric) gaps between changes, so the cost
+    scales with the number of episodes rather than the number of days in care.
 
     The first episode will always have reason for new episode as 'S' (Started). Then for each subsequent episode we
     - Copy details from the old episode.
@@ -169,251 +290,260 @@ def generate_care_episode(start_date: datetime.datetime, length_of_episode: int,
     :param length_of_episode: The overall length of the entire episode set
     :param probabilities: A Probabilities object, used for
         - reason_for_episode_change - A weighted dictionary of reasons for an episode changing, with probabilities.
+    :param rng: Random number generator to draw from.
+    :param postcodes: Where the home and placement postcodes come from. By default, they are made up.
     :returns: A list of episodes for this period of care.
     """
+    return _episodes(_care_episode_rows(day_of(start_date), length_of_episode, probabilities, day_of(dob), rng,
+                                        postcodes))
 
-    place, place_provider, home_postcode, place_postcode, urn = _generate_new_placement(start_date, dob)
-    start_episode = Episode(
-        start_date=start_date,
-        end_date=None,
-        reason_end=None,
-        reason_for_new_episode='S',
-        legal_status=_generate_legal_status(),
-        cin=random.choice([f'N{i}' for i in range(1, 9)]),
-        place=place,
-        place_provider=place_provider,
-        home_postcode=home_postcode,
-        place_postcode=place_postcode,
-        urn=urn,
-    )
+def _care_episode_rows(start_day: int, length_of_episode: int, probabilities: Probabilities, dob_day: int,
+                       rng: Random = None, postcodes: PostcodeProvider = None) -> List[list]:
+    rng = rng or _default_random
+
+    place, place_provider, home_postcode, place_postcode, urn = _generate_new_placement(start_day, dob_day, rng, postcodes)
+    legal_status = _generate_legal_status(rng)
+    cin = rng.choice(CIN_CODES)
+    rows = [[
+        start_day, None, 'S', legal_status, cin, place, place_provider, home_postcode, place_postcode, None, None, urn,
+    ]]
+
+    reason_sampler = reason_for_episode_change_sampler(probabilities)
 
-    episodes = [start_episode]
-    for i in range(length_of_episode):
-        if random.random() < probabilities.daily_episode_changing:
-            current_date = start_date + datetime.timedelta(days=i)
-            last_episode = episodes[-1]
-            last_episode.end_date = current_date
-            last_episode.reason_end = 'X1'  # The change of episode code
+    # Rather than rolling for a change on every day of the period, jump straight to the next day on which
+    # the episode changes. The gaps between changes are geometrically distributed.
+    change_day = _days_until_event(probabilities.daily_episode_changing, rng)
+    while change_day < length_of_episode:
+        current_day = start_day + change_day
+        last_row = rows[-1]
+        last_row[_END] = current_day
+        last_row[_REASON_END] = 'X1'  # The change of episode code
 
-            new_reason = random.choices(
-                list(probabilities.reason_for_episode_change.keys()), 
-                weights=list(probabilities.reason_for_episode_change.values())
-            )[0]
-            
-            next_episode = deepcopy(last_episode)
-            next_episode.start_date = current_date
-            next_episode.end_date = None
-            next_episode.reason_for_new_episode = new_reason
+        new_reason = reason_sampler(rng)
 
-            # Change of legal status
-            if new_reason in ['L', 'B', 'U']:
-                next_episode.legal_status = _generate_legal_status()
+        next_row = last_row[:]
+        next_row[_START] = current_day
+        next_row[_END] = None
+        next_row[_REASON_FOR_NEW_EPISODE] = new_reason
 
-            # Change of placement
-            if new_reason in ['P', 'B']:
-                next_episode.place, next_episode.place_provider, next_episode.home_postcode, next_episode.place_postcode, next_episode.urn = _generate_new_placement(current_date, dob)
-                last_episode.reason_place_change = generate_reason_place_change()
+        # Change of legal status
+        if new_reason in ['L', 'B', 'U']:
+            next_row[_LEGAL_STATUS] = _generate_legal_status(rng)
 
-            episodes.append(next_episode)
+        # Change of placement
+        if new_reason in ['P', 'B']:
+            (next_row[_PLACE], next_row[_PLACE_PROVIDER], next_row[_HOME_POSTCODE], next_row[_PLACE_POSTCODE],
+             next_row[_URN]) = _generate_new_placement(current_day, dob_day, rng, postcodes)
+            last_row[_REASON_PLACE_CHANGE] = generate_reason_place_change(rng)
 
+        rows.append(next_row)
 
-    episodes[-1].end_date = start_date + datetime.timedelta(days=length_of_episode)
-    episodes[-1].reason_end = _generate_reason_end()
+        change_day += 1 + _days_until_event(probabilities.daily_episode_changing, rng)
 
-    return episodes
+    rows[-1][_END] = start_day + length_of_episode
+    rows[-1][_REASON_END] = _generate_reason_end(rng)
+    add('episode_changes', len(rows) - 1)
 
-def _generate_legal_status() -> str:
+    return rows
+
+def _episodes(rows: List[list]) -> List[Episode]:
+    """
+    Makes the episodes from the rows built by _episode_rows and _care_episode_rows.
+    """
+    return [Episode(date_of_day(row[_START]), date_of_day(row[_END]), *row[_REASON_FOR_NEW_EPISODE:]) for row in rows]
+
+def _episode_spans(rows: List[list]) -> List[Tuple[int, int]]:
+    """
+    :returns: The start and end day of each of the episode rows, for _review_rows.
+    """
+    return [(row[_START], row[_END]) for row in rows]
+
+def _days_until_event(daily_probability: float, rng: Random = None) -> float:
+    """
+    Samples the number of days that pass before an event with a fixed daily probability happens. This is the number
+    of failed daily trials before the first success, i.e. a geometric distribution starting at 0.
+
+    :param daily_probability: The probability of the event happening on any given day.
+    :param rng: Random number generator to draw from.
+    :returns: The number of days before the event (0 if it happens on the first day), or infinity if it never happens.
+    """
+    rng = rng or _default_random
+    return rng.geometric(daily_probability)
+
+def _generate_legal_status(rng: Random = None) -> str:
     """
     Generates a random legal status from the codeset.
 
     :returns: Legal status string
     """
-    return random.choice(['C1', 'C2', 'D1', 'E1', 'V2', 'V3', 'V4', 'L1', 'L2', 'L3', 'J1', 'J2', 'J3'])
+    rng = rng or _default_random
+    return rng.choice(LEGAL_STATUS_CODES)
 
-def _generate_reason_end() -> str:
+def _generate_reason_end(rng: Random = None) -> str:
     """
     Picks a reason for an episode to end - this can be any from the codeset except X1
 
     :returns: Reason for ending string
     """
-    return random.choice([
-        'E11', 'E12', 'E2', 'E3', 'E4A', 'E4B', 'E13', 'E41', 'E45', 'E46', 'E47', 'E48', 'E5',
-        'E6', 'E7', 'E9', 'E14', 'E15', 'E16', 'E17', 'E8'
-    ])
+    rng = rng or _default_random
+    return rng.choice(REASON_END_CODES)
 
-def generate_reason_place_change() -> str:
+def generate_reason_place_change(rng: Random = None) -> str:
     """
     Generates a random reason for placement change from the codeset.
 
     :returns: Placement change string
     """
-    return random.choice([
-        'CARPL', 'CLOSE', 'ALLEG', 'STAND', 'APPRR', 'CREQB', 'CREQO', 'CHILD', 'LAREQ', 'PLACE', 'CUSTOD', 'OTHER'
-    ])
+    rng = rng or _default_random
+    return rng.choice(REASON_PLACE_CHANGE_CODES)
 
-def _generate_new_placement(current_date, dob) -> Tuple[str, str, str, str, str]:
+def _generate_new_placement(current_day: int, dob_day: int, rng: Random = None, postcodes: PostcodeProvider = None) -> Tuple[str, str, str, str, str]:
     """
     Generates all the information for a new placement. Currently
-    - Placement type is uniformly sampled from the codeset
-    - Placement code is uniformly sampled from the codeset
-    - Home and placement postcodes are randomly generated.
+    - Placement type is sampled with the weights in PLACEMENT_TYPE_WEIGHTS_BY_AGE for the age of the child
+    - Placement code is sampled with the weights in PLACEMENT_PROVIDER_WEIGHTS for the placement type
+    Both use the samplers compiled from those weights when the module is loaded.
+    - Home and placement postcodes come from postcodes (made up by default).
     - URN is a random 7-digit number.
 
-    :param current_date: Date of placement allocation
-    :param dob: The date of birth of the child (used for placement selection)
+    :param current_day: Day of placement allocation
+    :param dob_day: The day of birth of the child (used for placement selection)
+    :param rng: Random number generator to draw from.
+    :param postcodes: Where the postcodes come from.
     :returns: placement_type, placement_code, home_postcode, place_postcode, urn
     """
-    age_in_years = (current_date - dob) / datetime.timedelta(days=365)
-    if age_in_years < 5:
-        placement_type = random.choices([
-        'A3', 'A4', 'A5', 'A6', 'P1', 'R2', 'R3', 'U1', 'U2', 'U3', 'U4', 'U5', 'U6'
-        ],
-        weights=[0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.01, 0.445, 0.445, 0.01])[0]
-    elif age_in_years < 16:
-        placement_type = random.choices([
-        'A3', 'A4', 'A5', 'A6', 'P1', 'R2', 'R3', 'U1', 'U2', 'U3', 'U4', 'U5', 'U6', 'K1', 'K2', 'R1', 'S1'
-        ],
-        weights=[0.01, 0.01, 0.01, 0.01, 0.05, 0.01, 0, 0.03, 0.03, 0.03, 0.325, 0.325, 0.01, 0.005, 0.125, 0.01,
-                 0.01])[0]
-    else:
-        placement_type = random.choices([
-        'A3', 'A4', 'A5', 'A6', 'P1', 'R2', 'R3', 'U1', 'U2', 'U3', 'U4', 'U5', 'U6', 'K1', 'K2', 'R1', 'S1',
-        'P2', 'H5', 'R5', 'P3'
-        ],
-        weights=[0.01, 0.01, 0.01, 0.01, 0.05, 0.01, 0, 0.01, 0.01, 0.01, 0.08, 0.08, 0.01, 0.005, 0.05, 0.01, 0.01,
-                 0.35, 0.35, 0.05, 0.01])[0]
-
-    if placement_type in ['A3', 'A4', 'A5', 'A6']:
-        placement_code = random.choices([f'PR{i}' for i in range(6)], weights=[0, 0.5, 0, 0, 0.5, 0])[0]
-    elif placement_type in ['P1']:
-        placement_code = 'PR0'
-    elif placement_type in ['R2', 'R3', 'R5', 'P3']:
-        placement_code = 'PR3'
-    elif placement_type in ['U1', 'U2', 'U3']:
-        placement_code = 'PR1'
-    elif placement_type in ['U4', 'U5', 'U6']:
-        placement_code = random.choices([f'PR{i}' for i in range(6)], weights=[0, 0.5, 0, 0, 0.5, 0])[0]
-    elif placement_type in ['R1', 'K2', 'S1', 'P2', 'H5']:
-        placement_code = random.choices([f'PR{i}' for i in range(6)], weights=[0, 0.25, 0, 0, 0.75, 0])[0]
-    else:
-        placement_code = 'PR4'
-
-    home_postcode = _generate_postcode()
-    place_postcode = _generate_postcode()
-    urn = random.randint(1000000, 9999999)
+    rng = rng or _default_random
+    if postcodes is None:
+        postcodes = RANDOM_POSTCODES
+    age_in_years = (current_day - dob_day) / 365
+    placement_sampler = next(sampler for max_age, sampler in PLACEMENT_TYPE_SAMPLERS_BY_AGE if age_in_years < max_age)
+    placement_type = placement_sampler(rng)
+
+    placement_code = PLACEMENT_PROVIDER_SAMPLERS[placement_type](rng)
+
+    home_postcode = postcodes.postcode(rng)
+    place_postcode = postcodes.postcode(rng)
+    urn = rng.randint(1000000, 9999999)
     
     return placement_type, placement_code, home_postcode, place_postcode, urn
 
-def _generate_postcode() -> str:
-    """
-    Generates a postcode string. This is not guaranteed to be valid currently, but will
-    have the properties of
-    - One letter
-    - 1 or 2 numbers
-    - A space
-    - A number and 2 letters.
-    
-    :returns: Postcode string
+def generate_reviews(episodes: List[Episode], review_frequency: float, rng: Random = None) -> List[Review]:
     """
+    Generates the reviews for a child's episodes. The number of reviews is Poisson distributed with a rate
+    proportional to the total days in care (with at least one review for 20 days or longer), and the review days
+    are sampled uniformly from the days in care.
 
-    first_letter = random.choice(string.ascii_uppercase)
-    numbers = random.randint(1, 30)
-
-    last_number = random.randint(1, 9)
-    last_letters = ''.join(random.choice(string.ascii_uppercase) for _ in range(2))
-
-    return first_letter + str(numbers) + ' ' + str(last_number) + last_letters
+    The sorted review days are mapped onto episodes by bisecting the cumulative episode lengths, so the cost is
+    O(reviews * log(episodes)) rather than depending on the number of days in care.
 
+    :param episodes: The child's episodes, which must all have an end date.
+    :param review_frequency: The daily frequency of reviews.
+    :param rng: Random number generator to draw from.
+    :returns: The reviews, in date order within each episode.
+    """
+    spans = [(day_of(e.start_date), day_of(e.end_date)) for e in episodes]
+    return _reviews(_review_rows(spans, review_frequency, rng))
 
-def generate_reviews(episodes: List[Episode], review_frequency: float) -> List[Review]:
-    total_days_in_care = sum((e.end_date - e.start_date).days for e in episodes)
+def _review_rows(spans: List[Tuple[int, int]], review_frequency: float, rng: Random = None) -> List[Tuple[int, str]]:
+    """
+    :param spans: The start and end day of each episode.
+    :returns: The day and code of each review.
+    """
+    rng = rng or _default_random
+    episode_lengths = [end - start for start, end in spans]
+    episode_ends = list(itertools.accumulate(episode_lengths))
+    total_days_in_care = episode_ends[-1] if episode_ends else 0
 
     # Must be at least one review if in care for 20 days or longer
     num_reviews = max([
         total_days_in_care > 20, 
-        int(np.random.poisson(review_frequency * total_days_in_care)),
+        int(rng.poisson(review_frequency * total_days_in_care)),
     ])
 
-    review_days = [random.randint(0, total_days_in_care - 1) for _ in range(num_reviews)]
+    review_days = sorted(rng.randint(0, total_days_in_care - 1) for _ in range(num_reviews))
 
-    # We then do a bit of work to get from the days view to the right dates that are inside episodes
+    # Zero length episodes share their end with the episode before, so bisecting to the right skips over them
     reviews = []
-    current_days = 0
-    for e in episodes:
-        episode_length = (e.end_date - e.start_date).days
-        for episode_day in range(episode_length):
-            # Check if this is the day selected for review
-            for review_day in review_days:
-                if review_day == current_days:
-                    reviews.append(Review(
-                        review_date=e.start_date + datetime.timedelta(days=episode_day),
-                        review_code=_generate_review_code(),
-                    ))
-
-            current_days += 1
+    for review_day in review_days:
+        i = bisect.bisect_right(episode_ends, review_day)
+        days_into_episode = review_day - (episode_ends[i] - episode_lengths[i])
+        reviews.append((spans[i][0] + days_into_episode, _generate_review_code(rng)))
 
     return reviews
 
-def _generate_review_code() -> str:
-    review_code = random.choice([f'PN{i}' for i in range(8)])
+def _reviews(rows: List[Tuple[int, str]]) -> List[Review]:
+    return [Review(review_code=code, review_date=date_of_day(day)) for day, code in rows]
+
+def _generate_review_code(rng: Random = None) -> str:
+    rng = rng or _default_random
+    review_code = rng.choice(REVIEW_CODES)
 
     return review_code
 
         
-def generate_leaving_care() -> LeavingCareData:
+def generate_leaving_care(rng: Random = None) -> LeavingCareData:
+    rng = rng or _default_random
     return LeavingCareData(
-        in_touch=random.choice(['YES', 'NO', 'DIED', 'REFU', 'NREQ', 'RHOM']),
-        activ=random.choice(['F1', 'P1', 'F2', 'P2', 'F3', 'P3', 'G4', 'G5', 'G6', '0']),
-        accom=random.choice([code + suitability for code in 'BCDEGHKRSTUVWZYZ0' for suitability in '12'])
+        in_touch=rng.choice(IN_TOUCH_CODES),
+        activ=rng.choice(ACTIV_CODES),
+        accom=rng.choice(ACCOM_CODES)
     )
 
-def generate_adoption_data(child_start_date, is_adopted) -> AdoptionData:
-    if random.random() > is_adopted:
+def generate_adoption_data(child_start_date, is_adopted, rng: Random = None) -> AdoptionData:
+    rng = rng or _default_random
+    if rng.random() > is_adopted:
         return None
 
-    adoption_start_date = child_start_date + datetime.timedelta(days=random.randint(0, 365))    
-    adoption_end_date = adoption_start_date + datetime.timedelta(days=random.randint(365, 365 * 5))    
+    adoption_start_day = day_of(child_start_date) + rng.randint(0, 365)
+    adoption_end_day = adoption_start_day + rng.randint(365, 365 * 5)
 
     return AdoptionData(
-        start_date=adoption_start_date,
-        end_date=adoption_end_date,
+        start_date=date_of_day(adoption_start_day),
+        end_date=date_of_day(adoption_end_day),
         reason_ceased='XXX', # no info on what this should be
-        foster_care=random.choice('01'),
-        number_adopters=random.choice('12'),
-        sex_adopter=random.choice(['F1', 'FF', 'M1', 'MF', 'MM']),
-        ls_adopter=random.choice(['L0', 'L11',  'L12', 'L2', 'L3', 'L4'])
+        foster_care=rng.choice(FOSTER_CARE_CODES),
+        number_adopters=rng.choice(NUMBER_ADOPTERS_CODES),
+        sex_adopter=rng.choice(SEX_ADOPTER_CODES),
+        ls_adopter=rng.choice(LS_ADOPTER_CODES)
     )
 
-def generate_outcomes_data() -> OutcomesData:
-    has_sdq = random.choice([False, True])
+def generate_outcomes_data(rng: Random = None) -> OutcomesData:
+    rng = rng or _default_random
+    has_sdq = rng.choice(_BOOLEANS)
     return OutcomesData(
-        sdq_score=random.randint(1, 40) if has_sdq else None,
-        sdq_reason=None if has_sdq else 'SDQ' + random.choice('12345'),
-        convicted=random.choice([False, True]),
-        health_check=random.choice([False, True]),
-        immunisations=random.choice([False, True]),
-        teeth_check=random.choice([False, True]),
-        health_assessment=random.choice([False, True]),
-        substance_misuse=random.choice([False, True]),
-        intervention_received=random.choice([False, True]),
-        intervention_offered=random.choice([False, True]),
+        sdq_score=rng.randint(1, 40) if has_sdq else None,
+        sdq_reason=None if has_sdq else rng.choice(SDQ_REASON_CODES),
+        convicted=rng.choice(_BOOLEANS),
+        health_check=rng.choice(_BOOLEANS),
+        immunisations=rng.choice(_BOOLEANS),
+        teeth_check=rng.choice(_BOOLEANS),
+        health_assessment=rng.choice(_BOOLEANS),
+        substance_misuse=rng.choice(_BOOLEANS),
+        intervention_received=rng.choice(_BOOLEANS),
+        intervention_offered=rng.choice(_BOOLEANS),
     )
 
-def generate_missing_data(child_start_date, child_end_date, is_missing):
+def generate_missing_data(child_start_date, child_end_date, is_missing, rng: Random = None):
+    return _missing_periods(_missing_rows(day_of(child_start_date), day_of(child_end_date), is_missing, rng))
+
+def _missing_rows(child_start_day: int, child_end_day: int, is_missing: float, rng: Random = None) -> List[Tuple[str, int, int]]:
+    rng = rng or _default_random
     missing = []
 
-    if random.random() < is_missing:
+    if rng.random() < is_missing:
         # TODO: Allow for more than 2
-        num_missing = random.randint(1, 2)
+        num_missing = rng.randint(1, 2)
         for i in range(num_missing):
-            days_til_end = (child_end_date - child_start_date).days
-            start_date = child_start_date + datetime.timedelta(days=random.randint(0, days_til_end))
+            days_til_end = child_end_day - child_start_day
+            start_day = child_start_day + rng.randint(0, days_til_end)
             # Missing for 3-50 days
-            end_date = start_date + datetime.timedelta(days=random.randint(3, 50))
-            missing.append(Missing(
-                missing_type=random.choice(['M', 'A']),
-                start_date=start_date,
-                end_date=end_date,
-            ))
-
-    return missing
\ No newline at end of file
+            end_day = start_day + rng.randint(3, 50)
+            missing.append((rng.choice(MISSING_TYPE_CODES), start_day, end_day))
+
+    return missing
+
+def _missing_periods(rows: List[Tuple[str, int, int]]) -> List[Missing]:
+    return [
+        Missing(missing_type=missing_type, start_date=date_of_day(start_day), end_date=date_of_day(end_day))
+        for missing_type, start_day, end_day in rows
+    ]
@@ -0,0 +1,199 @@
+import string
+from typing import List, Tuple, Union
+
+import numpy as np
+
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
+_NUM_ROUNDS = 4
+
+# The id ranges of an IdService, unless others are given
+DEFAULT_CHILD_ID_RANGE = (0, 1_000_000)
+DEFAULT_UPN_NUMBER_RANGE = (1, int(1e11))
+
+
+def child_id_range_for(num_children: int) -> Tuple[int, int]:
+    """
+    :param num_children: The number of children that need child ids.
+    :returns: DEFAULT_CHILD_ID_RANGE, widened if need be so that there is a child id for every child.
+    """
+    first, last = DEFAULT_CHILD_ID_RANGE
+    return first, max(last, first + num_children - 1)
+
+
+class FeistelPermutation:
+    """
+    A keyed pseudo-random permutation of range(size).
+
+    The index is split into two halves of equal bit width and passed through a few rounds of a Feistel network,
+    which is a bijection on the smallest even-bit-width domain covering size. Values that land outside range(size)
+    are passed through the network again ("cycle walking") until they land inside it, which keeps the map a
+    bijection on range(size). As that domain is less than 4 times the size, this takes fewer than 4 passes on
+    average.
+
+    Nothing is stored per index, so mapping an index costs O(1) time and memory however many have been mapped.
+    This is not meant to be cryptographically strong, only to scatter indices without collisions.
+
+    :param size: The size of the domain being permuted.
+    :param key: Key for the permutation. Each key gives a different permutation.
+    """
+
+    def __init__(self, size: int, key: int):
+        if size < 1:
+            raise ValueError('The permutation must have a size of at least 1')
+
+        self.size = size
+        self._half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self._half_mask = (1 << self._half_bits) - 1
+
+        self._round_keys = []
+        state = key & _MASK_64
+        for _ in range(_NUM_ROUNDS):
+            state = (state + 0x9E3779B97F4A7C15) & _MASK_64
+            self._round_keys.append(_mix(state))
+
+    def __call__(self, index: int) -> int:
+        """
+        :param index: Index between 0 and size - 1.
+        :returns: The permuted index.
+        """
+        if not 0 <= index < self.size:
+            raise ValueError(f'Index {index} is outside of the range 0 to {self.size - 1}')
+
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._half_mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (_mix(right ^ round_key) & self._half_mask)
+        return (left << self._half_bits) | right
+
+    def permute_array(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Vectorised version of calling the permutation on each index.
+
+        :param indices: Array of indices between 0 and size - 1.
+        :returns: The permuted indices, as uint64.
+        """
+        values = np.asarray(indices, dtype=np.uint64)
+        if values.size and values.max() >= self.size:
+            raise ValueError(f'Indices must be between 0 and {self.size - 1}')
+
+        values = self._encrypt_array(values)
+        outside = np.flatnonzero(values >= self.size)
+        while len(outside) > 0:
+            values[outside] = self._encrypt_array(values[outside])
+            outside = outside[values[outside] >= self.size]
+        return values
+
+    def _encrypt_array(self, values: np.ndarray) -> np.ndarray:
+        half_bits, half_mask = np.uint64(self._half_bits), np.uint64(self._half_mask)
+        left, right = values >> half_bits, values & half_mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (_mix_array(right ^ np.uint64(round_key)) & half_mask)
+        return (left << half_bits) | right
+
+
+def _mix(x: int) -> int:
+    # The splitmix64 finaliser
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return x ^ (x >> 31)
+
+
+def _mix_array(x: np.ndarray) -> np.ndarray:
+    # uint64 arithmetic wraps, which matches the masking in _mix
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class IdService:
+    """
+    Assigns a unique child id and UPN to each index of a population, by passing the index through a keyed
+    FeistelPermutation of the id space. No record of the ids already handed out is kept, so this uses constant
+    memory, never has to retry, and can be shared by any number of shards or processes: as long as every child
+    has a different index, every child has a different id and UPN.
+
+    UPNs have a letter A-Z followed by 12 digits, with the digits forming a number in upn_number_range.
+
+    Several populations can be given ids that are unique across all of them by giving each an IdService with the
+    same key and a different offset, such that their ranges of indices don't overlap.
+
+    :param key: Key for the permutations. Each key gives a different assignment of ids.
+    :param child_id_range: The smallest and largest child id, inclusive.
+    :param upn_number_range: The smallest and largest number for the digits of a UPN, inclusive.
+    :param offset: Added to every index before it is permuted, so index i gets the ids of index offset + i of an
+        IdService with no offset.
+    """
+
+    def __init__(self, key: int, child_id_range: Tuple[int, int] = DEFAULT_CHILD_ID_RANGE,
+                 upn_number_range: Tuple[int, int] = DEFAULT_UPN_NUMBER_RANGE, offset: int = 0):
+        self.key = key
+        self.child_id_range = child_id_range
+        self.upn_number_range = upn_number_range
+        self.offset = offset
+
+        min_child_id, max_child_id = child_id_range
+        min_upn_number, max_upn_number = upn_number_range
+        self._num_upn_numbers = max_upn_number - min_upn_number + 1
+
+        self._child_id_permutation = FeistelPermutation(max_child_id - min_child_id + 1, key)
+        self._upn_permutation = FeistelPermutation(
+            len(string.ascii_uppercase) * self._num_upn_numbers,
+            _mix((key + 1) & _MASK_64),
+        )
+
+    @property
+    def capacity(self) -> int:
+        """
+        The number of indices that can be given ids, limited by the smaller of the two id spaces and reduced by the
+        offset.
+        """
+        return min(self._child_id_permutation.size, self._upn_permutation.size) - self.offset
+
+    def child_id(self, index: int) -> int:
+        """
+        :param index: The index of the child, between 0 and capacity - 1.
+        :returns: The child id for that index.
+        """
+        return self.child_id_range[0] + self._child_id_permutation(self.offset + index)
+
+    def upn(self, index: int) -> str:
+        """
+        :param index: The index of the child, between 0 and capacity - 1.
+        :returns: The UPN for that index.
+        """
+        value = self._upn_permutation(self.offset + index)
+        letter, number = divmod(value, self._num_upn_numbers)
+        return string.ascii_uppercase[letter] + str(self.upn_number_range[0] + number).zfill(12)
+
+    def child_ids(self, indices: Union[np.ndarray, List[int]]) -> np.ndarray:
+        """
+        Vectorised version of child_id.
+
+        :returns: The child ids, as int64.
+        """
+        indices = self.offset + np.asarray(indices, dtype=np.int64)
+        return self.child_id_range[0] + self._child_id_permutation.permute_array(indices).astype(np.int64)
+
+    def upns(self, indices: Union[np.ndarray, List[int]]) -> np.ndarray:
+        """
+        Vectorised version of upn.
+
+        :returns: The UPNs, as 13 byte strings.
+        """
+        values = self._upn_permutation.permute_array(self.offset + np.asarray(indices, dtype=np.int64)).astype(np.int64)
+        letters, numbers = np.divmod(values, self._num_upn_numbers)
+        numbers += self.upn_number_range[0]
+
+        upns = np.empty((len(values), 13), dtype=np.uint8)
+        upns[:, 0] = letters + ord('A')
+        for position in range(12, 0, -1):
+            upns[:, position] = numbers % 10 + ord('0')
+            numbers = numbers // 10
+
+        return upns.view('S13').ravel()
@@ -0,0 +1,225 @@
+import datetime
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+from .columnar import ChildrenArrays, _EPOCH_ORDINAL, _offsets
+from .types import Child
+
+Date = Union[datetime.date, np.datetime64]
+
+# Open ended intervals (an end date of None or NaT) are treated as ending on this day
+_OPEN_END = np.datetime64('9999-12-31', 'D')
+
+
+class IntervalIndex:
+    """
+    An index over a set of intervals of days, each covering [start, end), for answering point and range queries
+    without scanning every interval. The intervals are kept in two sorted arrays, one of starts and one of ends, so
+    that counts take O(log n) time and lookups take a binary search plus a vectorised filter of the candidates.
+
+    Dates are compared by day, so any time of day in a query is ignored.
+
+    :param starts: The start of each interval.
+    :param ends: The end of each interval (exclusive). NaT means the interval has no end.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        self.starts = np.asarray(starts, dtype='datetime64[D]')
+        self.ends = np.asarray(ends, dtype='datetime64[D]').copy()
+        self.ends[np.isnat(self.ends)] = _OPEN_END
+
+        self._by_start = np.argsort(self.starts, kind='stable')
+        self._sorted_starts = self.starts[self._by_start]
+        self._sorted_ends = np.sort(self.ends)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlapping(self, start: Date, end: Date) -> np.ndarray:
+        """
+        :returns: The positions of the intervals that start before end and end after start, in increasing order.
+        """
+        start, end = _day(start), _day(end)
+        candidates = self._by_start[:np.searchsorted(self._sorted_starts, end, side='left')]
+        return np.sort(candidates[self.ends[candidates] > start])
+
+    def containing(self, date: Date) -> np.ndarray:
+        """
+        :returns: The positions of the intervals that cover the date, in increasing order.
+        """
+        date = _day(date)
+        candidates = self._by_start[:np.searchsorted(self._sorted_starts, date, side='right')]
+        return np.sort(candidates[self.ends[candidates] > date])
+
+    def count_overlapping(self, start: Date, end: Date) -> int:
+        """
+        :returns: The number of intervals that start before end and end after start.
+        """
+        # Every interval ending on or before start also starts before end, so is counted in the first term
+        start, end = _day(start), _day(end)
+        return int(np.searchsorted(self._sorted_starts, end, side='left')
+                   - np.searchsorted(self._sorted_ends, start, side='right'))
+
+    def count_per_day(self, first_day: Date, last_day: Date) -> np.ndarray:
+        """
+        :returns: The number of intervals covering each day from first_day to last_day inclusive.
+        """
+        days = np.arange(_day(first_day), _day(last_day) + 1)
+        return (np.searchsorted(self._sorted_starts, days, side='right')
+                - np.searchsorted(self._sorted_ends, days, side='right'))
+
+
+@dataclass
+class PopulationIndex:
+    """
+    Interval indexes over the episodes and missing periods of a population, built once and then queried many times.
+    Children are identified by their position in the population.
+
+    :param care: One interval per child, from the start of their first episode to the end of their last.
+    :param looked_after: The days each child is looked after, as disjoint intervals, with any of their episodes that
+        overlap or run on from each other merged.
+    :param episodes: One interval per episode.
+    :param episode_child: The position of the child for each episode.
+    :param episode_number: The position of each episode in its child's list of episodes.
+    :param missing: One interval per missing period.
+    :param missing_child: The position of the child for each missing period.
+    """
+    care: IntervalIndex
+    looked_after: IntervalIndex
+    episodes: IntervalIndex
+    episode_child: np.ndarray
+    episode_number: np.ndarray
+    missing: IntervalIndex
+    missing_child: np.ndarray
+
+    @staticmethod
+    def from_children(children: Sequence[Child]) -> 'PopulationIndex':
+        """
+        Builds the index with a single pass over the children.
+        """
+        episode_starts, episode_ends, episode_counts = [], [], []
+        missing_starts, missing_ends, missing_counts = [], [], []
+        for c in children:
+            episode_starts.extend(e.start_date for e in c.episodes)
+            episode_ends.extend(e.end_date for e in c.episodes)
+            episode_counts.append(len(c.episodes))
+            missing_starts.extend(m.start_date for m in c.missing_periods)
+            missing_ends.extend(m.end_date for m in c.missing_periods)
+            missing_counts.append(len(c.missing_periods))
+
+        return PopulationIndex._from_flat(
+            _to_days(episode_starts), _to_days(episode_ends), _offsets(np.array(episode_counts, dtype=np.int64)),
+            _to_days(missing_starts), _to_days(missing_ends), _offsets(np.array(missing_counts, dtype=np.int64)),
+        )
+
+    @staticmethod
+    def from_arrays(arrays: ChildrenArrays) -> 'PopulationIndex':
+        """
+        Builds the index straight from the columns of a ChildrenArrays, without touching any Python objects.
+        """
+        return PopulationIndex._from_flat(
+            arrays.episodes['start_date'], arrays.episodes['end_date'], arrays.episode_offsets,
+            arrays.missing['start_date'], arrays.missing['end_date'], arrays.missing_offsets,
+        )
+
+    @staticmethod
+    def _from_flat(episode_starts: np.ndarray, episode_ends: np.ndarray, episode_offsets: np.ndarray,
+                   missing_starts: np.ndarray, missing_ends: np.ndarray, missing_offsets: np.ndarray) -> 'PopulationIndex':
+        episode_child = _owners(episode_offsets)
+        episode_ends = np.where(np.isnat(episode_ends), _OPEN_END, episode_ends)
+
+        # The care span of each child is a reduction over its rows. Any child without episodes gets an empty span
+        # at the far end of time, which overlaps nothing.
+        has_episodes = np.diff(episode_offsets) > 0
+        care_starts = np.full(len(episode_offsets) - 1, _OPEN_END)
+        care_ends = np.full(len(episode_offsets) - 1, _OPEN_END)
+        if len(episode_starts) > 0:
+            first_rows = episode_offsets[:-1][has_episodes]
+            care_starts[has_episodes] = np.minimum.reduceat(episode_starts, first_rows)
+            care_ends[has_episodes] = np.maximum.reduceat(episode_ends, first_rows)
+
+        return PopulationIndex(
+            care=IntervalIndex(care_starts, care_ends),
+            looked_after=IntervalIndex(*_merge(episode_child, episode_starts, episode_ends)),
+            episodes=IntervalIndex(episode_starts, episode_ends),
+            episode_child=episode_child,
+            episode_number=np.arange(len(episode_child)) - episode_offsets[episode_child],
+            missing=IntervalIndex(missing_starts, missing_ends),
+            missing_child=_owners(missing_offsets),
+        )
+
+    def children_in_period(self, start: Date, end: Date) -> np.ndarray:
+        """
+        :returns: The positions of the children whose care (from their first episode to the end of their last)
+            overlaps the period, in increasing order. These are the children kept by a census of the period.
+        """
+        return self.care.overlapping(start, end)
+
+    def children_in_care_on(self, date: Date) -> np.ndarray:
+        """
+        :returns: The positions of the children with an episode covering the date, in increasing order.
+        """
+        return np.unique(self.episode_child[self.episodes.containing(date)])
+
+    def episodes_overlapping(self, start: Date, end: Date) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :returns: The child positions and episode numbers of the episodes overlapping the period.
+        """
+        rows = self.episodes.overlapping(start, end)
+        return self.episode_child[rows], self.episode_number[rows]
+
+    def missing_overlapping(self, start: Date, end: Date) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :returns: The child positions and missing period rows of the missing periods overlapping the period.
+        """
+        rows = self.missing.overlapping(start, end)
+        return self.missing_child[rows], rows
+
+    def looked_after_per_day(self, first_day: Date, last_day: Date) -> np.ndarray:
+        """
+        :returns: The number of children looked after on each day from first_day to last_day inclusive.
+        """
+        return self.looked_after.count_per_day(first_day, last_day)
+
+
+def _day(date: Date) -> np.datetime64:
+    if isinstance(date, np.datetime64):
+        return date.astype('datetime64[D]')
+    return np.datetime64(date.toordinal() - _EPOCH_ORDINAL, 'D')
+
+
+def _to_days(dates: List[datetime.datetime]) -> np.ndarray:
+    ordinals = np.fromiter(
+        (_OPEN_END.astype(np.int64) + _EPOCH_ORDINAL if d is None else d.toordinal() for d in dates),
+        dtype=np.int64, count=len(dates),
+    )
+    return (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+
+
+def _merge(owners: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merges the intervals of each owner that overlap or touch, so that every day is covered at most once per owner.
+    """
+    if len(starts) == 0:
+        return starts, ends
+
+    order = np.lexsort((starts, owners))
+    owners, starts, ends = owners[order], starts[order].astype(np.int64), ends[order].astype(np.int64)
+
+    # A running maximum of the ends within each owner, found by offsetting each owner's ends above all of the
+    # previous owners'. A new interval begins wherever an owner begins or a start is after every earlier end.
+    low = min(starts.min(), ends.min())
+    span = max(starts.max(), ends.max()) - low + 1
+    reach = np.maximum.accumulate((ends - low) + owners * span) - owners * span + low
+    begins = np.ones(len(starts), dtype=bool)
+    begins[1:] = (owners[1:] != owners[:-1]) | (starts[1:] > reach[:-1])
+
+    first_rows = np.flatnonzero(begins)
+    last_rows = np.append(first_rows[1:], len(starts)) - 1
+    return starts[first_rows].astype('datetime64[D]'), reach[last_rows].astype('datetime64[D]')
+
+
+def _owners(offsets: np.ndarray) -> np.ndarray:
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
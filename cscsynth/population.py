@@ -0,0 +1,234 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Union
+
+import numpy as np
+
+from .childrengenerator import CHUNK_SIZE
+from .columnar import CODES, ChildrenArrays
+from .types import Child
+
+# The first bytes of every population file, followed by the version of the layout
+MAGIC = b'CSCSYNTH-POPULATION'
+FORMAT_VERSION = 1
+
+# Every array starts at a multiple of this many bytes from the start of the file
+_ALIGNMENT = 64
+
+_TABLES = ('children', 'episodes', 'reviews', 'missing')
+
+
+def write_population(population: Union[ChildrenArrays, Sequence[Child]], path: Union[Path, str]) -> 'MappedPopulation':
+    """
+    Writes a population to a single file which can be opened with MappedPopulation.
+
+    The file starts with a JSON header describing its arrays, followed by the arrays themselves:
+    - A structured array for each of the children, episodes, reviews and missing tables, with the columns of
+      ChildrenArrays as its fields, so categorical columns are stored as int8 indices into the codesets.
+    - The offsets linking each child to its rows of the other tables.
+    - An index of the children sorted by child id, and another sorted by UPN.
+
+    :param population: The population, as a ChildrenArrays or a list of children.
+    :param path: The file to write.
+    :returns: The written population, opened.
+    """
+    if not isinstance(population, ChildrenArrays):
+        population = ChildrenArrays.from_children(population)
+
+    arrays = {table: _structured(getattr(population, table)) for table in _TABLES}
+    arrays['offsets'] = _structured({
+        'episodes': population.episode_offsets,
+        'reviews': population.review_offsets,
+        'missing': population.missing_offsets,
+    })
+
+    child_ids = population.children['child_id']
+    upns = population.children['upn']
+    by_child_id = np.argsort(child_ids, kind='stable')
+    by_upn = np.argsort(upns, kind='stable')
+    arrays['child_id_keys'] = child_ids[by_child_id]
+    arrays['child_id_rows'] = by_child_id.astype(np.int64)
+    arrays['upn_keys'] = upns[by_upn]
+    arrays['upn_rows'] = by_upn.astype(np.int64)
+
+    layout = {name: {'descr': np.lib.format.dtype_to_descr(values.dtype), 'shape': list(values.shape)}
+              for name, values in arrays.items()}
+    header = {'version': FORMAT_VERSION, 'num_children': len(population), 'codes': CODES, 'arrays': layout}
+
+    # The positions of the arrays are in the header, so depend on its length. The space for the header is grown
+    # until it fits.
+    header_size = 0
+    while True:
+        position = header_size
+        for name, values in arrays.items():
+            layout[name]['offset'] = position
+            position = _aligned(position + values.nbytes)
+        header_bytes = json.dumps(header).encode()
+        if len(MAGIC) + 8 + len(header_bytes) <= header_size:
+            break
+        header_size = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for name, values in arrays.items():
+            f.write(b'\0' * (layout[name]['offset'] - f.tell()))
+            values.tofile(f)
+
+    return MappedPopulation(path)
+
+
+def _structured(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    # Packs equal length columns into the fields of one structured array
+    length = len(next(iter(columns.values()))) if columns else 0
+    table = np.empty(length, dtype=[(name, values.dtype) for name, values in columns.items()])
+    for name, values in columns.items():
+        table[name] = values
+    return table
+
+
+def _aligned(position: int) -> int:
+    return -(-position // _ALIGNMENT) * _ALIGNMENT
+
+
+class ChildrenSequence(Sequence[Child]):
+    """
+    A population held as a ChildrenArrays, as a sequence of Child objects. The children are decoded from the arrays
+    as they are used: CHUNK_SIZE at a time as the sequence is iterated over, and only the children asked for when it
+    is indexed or sliced. Changes made to the decoded children aren't kept. The sequence equals any other sequence
+    of the same children, such as a list.
+
+    :param arrays: The population.
+    """
+
+    def __init__(self, arrays: ChildrenArrays):
+        self.arrays = arrays
+
+    def __len__(self) -> int:
+        return len(self.arrays)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self.arrays.slice(start, stop).to_children()
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Child index {index} is out of range for a population of {len(self)}')
+        return self.arrays.slice(index, index + 1).to_children()[0]
+
+    def __iter__(self) -> Iterator[Child]:
+        for start in range(0, len(self), CHUNK_SIZE):
+            yield from self.arrays.slice(start, start + CHUNK_SIZE).to_children()
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+
+class MappedPopulation(ChildrenSequence):
+    """
+    A population stored in a file written by write_population, and memory-mapped rather than read in. Opening the
+    file only reads its header, and pages of the file are read as they are used. Processes mapping the same file
+    share its pages, and populations passed to other processes map the file again rather than copying it.
+
+    The population is a sequence of Child objects, which are decoded from the file CHUNK_SIZE children at a time as
+    it is iterated over, so it can be passed to the census and writer functions in place of a list of children:
+
+        population = MappedPopulation('population.bin')
+        create_csv(iter_snapshot_children_for_period(start_date, end_date, population), output_dir)
+
+    The tables themselves are available, without copying, as the ChildrenArrays in arrays.
+
+    :param path: The file holding the population.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{self.path} is not a population file')
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length))
+
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f'{self.path} has version {header["version"]} of the population format, but only '
+                             f'version {FORMAT_VERSION} can be read')
+        if header['codes'] != {name: list(codes) for name, codes in CODES.items()}:
+            raise ValueError(f'{self.path} was written with different codesets to this version of cscsynth')
+
+        self._arrays = {}
+        for name, layout in header['arrays'].items():
+            dtype = np.lib.format.descr_to_dtype(layout['descr'])
+            shape = tuple(layout['shape'])
+            if shape[0] == 0:
+                # Empty arrays can't be memory-mapped
+                self._arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                self._arrays[name] = np.memmap(self.path, dtype=dtype, mode='r', offset=layout['offset'], shape=shape)
+
+        offsets = self._arrays['offsets']
+        tables = {
+            table: {name: self._arrays[table][name] for name in self._arrays[table].dtype.names}
+            for table in _TABLES
+        }
+        super().__init__(ChildrenArrays(
+            **tables,
+            episode_offsets=offsets['episodes'],
+            review_offsets=offsets['reviews'],
+            missing_offsets=offsets['missing'],
+        ))
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def index_of_child_id(self, child_id: int) -> int:
+        """
+        Finds a child by their child id, with a binary search of the population's index.
+
+        :param child_id: The child id.
+        :returns: The index of the child in the population.
+        :raises KeyError: If no child has the child id.
+        """
+        return self._lookup('child_id', child_id)
+
+    def index_of_upn(self, upn: str) -> int:
+        """
+        Finds a child by their UPN, with a binary search of the population's index.
+
+        :param upn: The UPN.
+        :returns: The index of the child in the population.
+        :raises KeyError: If no child has the UPN.
+        """
+        return self._lookup('upn', upn.encode('ascii'))
+
+    def child_by_id(self, child_id: int) -> Child:
+        """
+        :returns: The child with the child id.
+        :raises KeyError: If no child has the child id.
+        """
+        return self[self.index_of_child_id(child_id)]
+
+    def child_by_upn(self, upn: str) -> Child:
+        """
+        :returns: The child with the UPN.
+        :raises KeyError: If no child has the UPN.
+        """
+        return self[self.index_of_upn(upn)]
+
+    def _lookup(self, name: str, key) -> int:
+        keys = self._arrays[f'{name}_keys']
+        position = int(np.searchsorted(keys, key))
+        if position == len(keys) or keys[position] != key:
+            raise KeyError(key)
+        return int(self._arrays[f'{name}_rows'][position])
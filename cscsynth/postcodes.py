@@ -0,0 +1,156 @@
+import string
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from .rng import Random
+
+# The longest postcodes, such as 'SW1A 1AA', have 8 characters including the space
+POSTCODE_WIDTH = 8
+
+_LETTERS = string.ascii_uppercase
+
+
+class RandomPostcodes:
+    """
+    Makes up postcodes, which have the shape of a real postcode but are not guaranteed to exist:
+    - One letter
+    - 1 or 2 numbers
+    - A space
+    - A number and 2 letters.
+    """
+
+    def postcode(self, rng: Random) -> str:
+        """
+        :param rng: Random number generator to draw from.
+        :returns: A postcode.
+        """
+        return f'{rng.choice(_LETTERS)}{rng.randint(1, 30)} {rng.randint(1, 9)}{rng.choice(_LETTERS)}{rng.choice(_LETTERS)}'
+
+    def postcodes(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """
+        Vectorised version of postcode, which builds the postcodes straight into an array of bytes.
+
+        :param rng: Random number generator to draw from.
+        :param n: The number of postcodes.
+        :returns: An array of postcodes, as bytes of up to 7 characters.
+        """
+        numbers = rng.integers(1, 30, size=n, endpoint=True)
+        two_digits = numbers >= 10
+        rows = np.arange(n)
+
+        postcodes = np.zeros((n, 7), dtype=np.uint8)
+        postcodes[:, 0] = rng.integers(0, 26, size=n) + ord('A')
+        postcodes[two_digits, 1] = numbers[two_digits] // 10 + ord('0')
+        column = 1 + two_digits
+        postcodes[rows, column] = numbers % 10 + ord('0')
+        postcodes[rows, column + 1] = ord(' ')
+        postcodes[rows, column + 2] = rng.integers(1, 9, size=n, endpoint=True) + ord('0')
+        postcodes[rows, column + 3] = rng.integers(0, 26, size=n) + ord('A')
+        postcodes[rows, column + 4] = rng.integers(0, 26, size=n) + ord('A')
+
+        return postcodes.view('S7').ravel()
+
+
+class PostcodePool:
+    """
+    Samples postcodes uniformly from a list of real postcodes, such as those in the ONS Postcode Directory.
+
+    The list is kept in a .npy file of fixed width byte strings (see PostcodePool.build), which is memory-mapped
+    rather than read in. Sampling a postcode is a single lookup at a random position, so it takes the same time
+    however long the list is, and only the pages of the file holding sampled postcodes are ever read. Pools can be
+    passed to other processes, which map the file again rather than copying the postcodes.
+
+    :param path: The .npy file holding the postcodes.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        self.path = Path(path)
+        self._postcodes = np.load(self.path, mmap_mode='r')
+        if self._postcodes.ndim != 1 or self._postcodes.dtype.kind != 'S' or len(self._postcodes) == 0:
+            raise ValueError(f'{self.path} does not hold a list of postcodes')
+
+    def __len__(self) -> int:
+        return len(self._postcodes)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def postcode(self, rng: Random) -> str:
+        """
+        :param rng: Random number generator to draw from.
+        :returns: A postcode from the pool.
+        """
+        return self._postcodes[rng.randrange(len(self._postcodes))].decode('ascii')
+
+    def postcodes(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """
+        :param rng: Random number generator to draw from.
+        :param n: The number of postcodes.
+        :returns: An array of postcodes from the pool, as bytes.
+        """
+        return self._postcodes[rng.integers(0, len(self._postcodes), size=n)]
+
+    @staticmethod
+    def build(source: Union[Path, str], path: Union[Path, str], column: str = 'pcds',
+              chunk_size: int = 100_000) -> 'PostcodePool':
+        """
+        Builds a pool from a CSV file of postcodes, such as the ONS Postcode Directory. The file is read a chunk
+        at a time, and only the postcode column is kept. If the file has a doterm column, as the ONS files do,
+        postcodes that have been terminated are left out.
+
+        Postcodes are stored as ASCII in at most POSTCODE_WIDTH bytes, so a file holding any longer postcodes, or
+        postcodes with other characters, is rejected rather than having them cut short.
+
+        :param source: The CSV file to read, with a header row.
+        :param path: The .npy file to write the pool to.
+        :param column: The column holding the postcodes.
+        :param chunk_size: The number of rows to read at a time.
+        :returns: The new pool.
+        :raises ValueError: If the file has no postcode column or postcodes, or any postcodes that don't fit.
+        """
+        import pandas as pd
+
+        header = pd.read_csv(source, nrows=0).columns
+        if column not in header:
+            raise ValueError(f'{source} has no {column} column')
+        columns = [column, 'doterm'] if 'doterm' in header else [column]
+
+        chunks = []
+        bad_lines = []
+        for chunk in pd.read_csv(source, usecols=columns, dtype=str, chunksize=chunk_size):
+            if 'doterm' in chunk:
+                chunk = chunk[chunk['doterm'].isna()]
+            postcodes = chunk[column].dropna().str.strip()
+            bad = (postcodes.str.len() > POSTCODE_WIDTH) | ~postcodes.map(str.isascii).astype(bool)
+            if bad.any():
+                # The rows are numbered from 0 after the header, which is line 1 of the file
+                bad_lines.extend((postcodes.index[bad] + 2).tolist())
+            elif not bad_lines:
+                chunks.append(postcodes.to_numpy().astype(f'S{POSTCODE_WIDTH}'))
+
+        if bad_lines:
+            shown = ', '.join(str(line) for line in bad_lines[:10])
+            more = f' and {len(bad_lines) - 10} more' if len(bad_lines) > 10 else ''
+            raise ValueError(f'{source} has postcodes that are not ASCII of at most {POSTCODE_WIDTH} characters, '
+                             f'on lines {shown}{more}')
+
+        postcodes = np.concatenate(chunks) if chunks else np.array([], dtype=f'S{POSTCODE_WIDTH}')
+        if len(postcodes) == 0:
+            raise ValueError(f'{source} has no postcodes')
+
+        # Saving to an open file stops numpy adding a .npy suffix to the path
+        with open(path, 'wb') as f:
+            np.save(f, postcodes)
+        return PostcodePool(path)
+
+
+# Anything with the postcode and postcodes methods can be used to give the children postcodes
+PostcodeProvider = Union[RandomPostcodes, PostcodePool]
+
+# Used when no postcode provider is given
+RANDOM_POSTCODES = RandomPostcodes()
@@ -0,0 +1,266 @@
+import bisect
+import itertools
+import math
+import random
+from typing import Any, Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+
+
+class Random(random.Random):
+    """
+    The random number generator used by the functions in cscsynth.generators.
+
+    This is the standard library random.Random with the few extra distributions the generators need, so that a
+    single seeded instance determines every draw made for a child. Unlike the module level functions in random
+    and numpy.random, separate instances share no state, so independent streams can be used side by side (for
+    example, one per shard of a parallel run).
+    """
+
+    def geometric(self, p: float) -> float:
+        """
+        Samples the number of failed trials before the first success, where each trial succeeds with probability p.
+        This is a geometric distribution starting at 0, sampled by inverting its CDF with a single uniform draw.
+
+        :param p: The probability of success of each trial.
+        :returns: The number of failures (0 if the first trial succeeds), or infinity if p is 0.
+        """
+        if p >= 1:
+            return 0
+        if p <= 0:
+            return math.inf
+
+        return int(math.log(1.0 - self.random()) / math.log1p(-p))
+
+    def negative_binomial(self, n: int, p: float) -> int:
+        """
+        Samples the number of failed trials before the n-th success, as scipy.stats.nbinom.
+
+        :param n: The number of successes.
+        :param p: The probability of success of each trial.
+        :returns: The number of failures.
+        """
+        return sum(self.geometric(p) for _ in range(n))
+
+    def poisson(self, lam: float) -> int:
+        """
+        Samples from a Poisson distribution. Small rates (all of those used by the default probabilities) are
+        sampled by inversion; large rates fall back to NumPy, seeded from this generator.
+
+        :param lam: The rate of the distribution.
+        :returns: The sampled count.
+        """
+        if lam <= 0:
+            return 0
+        if lam > 100:
+            return int(np.random.default_rng(self.getrandbits(64)).poisson(lam))
+
+        u = self.random()
+        k = 0
+        probability = math.exp(-lam)
+        cumulative = probability
+        while u > cumulative:
+            k += 1
+            probability *= lam / k
+            cumulative += probability
+            if probability == 0:
+                # Rounding has left the CDF a hair under 1
+                break
+
+        return k
+
+
+class BufferedRandom(Random):
+    """
+    A Random which takes its uniforms from blocks drawn in bulk with NumPy, rather than from one call into the
+    Mersenne Twister per draw, and samples integers and choices directly from those uniforms rather than through
+    random.Random's rejection sampling. Every distribution of Random (geometric, negative_binomial, poisson and the
+    weighted samplers) is sampled by inverting uniforms, so they all draw from the same blocks.
+
+    The blocks come from a PCG64 generator with the given seed. Two instances with the same seed, first block and
+    position give the same draws, whatever their block sizes, but a different stream to Random with the same seed.
+
+    The Mersenne Twister is never used, so there is no state for getstate and setstate to save and restore, and
+    they raise a TypeError. For the same reason, instances can't be pickled.
+
+    :param seed: An int, a numpy SeedSequence, or None to seed from fresh entropy.
+    :param block_size: The number of uniforms drawn from the generator at a time.
+    :param first_block: Uniforms, already drawn, to hand out before any are drawn from the generator, e.g. one of
+        the blocks of a UniformBlocks. The generator is only made once they run out.
+    :param position: The number of uniforms to skip at the start of the generator's stream.
+    """
+
+    # Integers are drawn as floor(u * n), which is unbiased to within n / 2 ** 53. Wider ranges are drawn from
+    # getrandbits.
+    _MAX_RANGE = 2 ** 32
+
+    def __init__(self, seed: Union[int, np.random.SeedSequence, None] = None, block_size: int = 256,
+                 first_block: Sequence[float] = (), position: int = 0):
+        self.block_size = block_size
+        self._position = position
+        super().__init__(seed)
+        if first_block:
+            self._next_uniform = itertools.chain(first_block, self._uniforms).__next__
+
+    def seed(self, a: Union[int, np.random.SeedSequence, None] = None, version: int = 2):
+        """
+        Reseeds the generator, starting a new stream of blocks.
+
+        :param a: An int, a numpy SeedSequence, or None to seed from fresh entropy.
+        """
+        self._uniforms = itertools.chain.from_iterable(self._blocks(a, self._position))
+        # Looking up the next uniform is a single call into C, and only a finished block calls back into Python
+        self._next_uniform = self._uniforms.__next__
+
+    def _blocks(self, seed, position: int) -> Iterator[List[float]]:
+        bit_generator = np.random.PCG64(seed)
+        if position:
+            bit_generator.advance(position)
+        generator = np.random.Generator(bit_generator)
+        while True:
+            yield generator.random(self.block_size).tolist()
+
+    def random(self) -> float:
+        """
+        :returns: The next uniform, in [0, 1).
+        """
+        return self._next_uniform()
+
+    def getrandbits(self, k: int) -> int:
+        """
+        :returns: An integer with k random bits, made 32 bits at a time from uniforms.
+        """
+        bits = 0
+        for _ in range(-(-k // 32)):
+            bits = (bits << 32) | int(self._next_uniform() * 4294967296.0)
+        return bits >> (-k % 32)
+
+    def randint(self, a: int, b: int) -> int:
+        """
+        :returns: A uniformly sampled integer from a to b, including both.
+        """
+        n = b - a + 1
+        if 0 < n <= self._MAX_RANGE:
+            return a + int(self._next_uniform() * n)
+        return super().randint(a, b)
+
+    def choice(self, seq):
+        """
+        :returns: A uniformly sampled element of seq.
+        """
+        return seq[int(self._next_uniform() * len(seq))]
+
+    def _randbelow(self, n: int) -> int:
+        # Used by the rest of random.Random's integer methods, such as randrange and shuffle
+        if n <= self._MAX_RANGE:
+            return int(self._next_uniform() * n)
+        return self._randbelow_with_getrandbits(n)
+
+    def getstate(self):
+        raise TypeError('BufferedRandom has no Mersenne Twister state, so getstate is not supported')
+
+    def setstate(self, state):
+        raise TypeError('BufferedRandom has no Mersenne Twister state, so setstate is not supported')
+
+
+class UniformBlocks:
+    """
+    A numbered family of BufferedRandom streams (one per child, in ChildrenGenerator), whose first blocks are drawn
+    for many streams in a single call. The first block of stream i is the block_size uniforms from position
+    i * block_size of one PCG64 stream, so it is the same whether it is drawn on its own or with its neighbours, and
+    a stream which uses up its first block carries on from position (i + 1) * 2 ** 64.
+
+    :param seed: An int, a numpy SeedSequence, or None to seed from fresh entropy.
+    :param block_size: The number of uniforms in the first block of each stream. Enough to cover almost every
+        stream means the rest of the PCG64 stream is rarely needed.
+    """
+
+    def __init__(self, seed: Union[int, np.random.SeedSequence, None] = None, block_size: int = 256):
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.block_size = block_size
+
+    def stream(self, index: int) -> BufferedRandom:
+        """
+        :param index: The number of the stream.
+        :returns: The stream.
+        """
+        return next(self.streams([index]))
+
+    def streams(self, indices: Iterable[int], batch_size: int = 256) -> Iterator[BufferedRandom]:
+        """
+        Makes the streams with the given numbers, drawing the first blocks of up to batch_size consecutive streams at
+        a time.
+
+        :param indices: The numbers of the streams.
+        :param batch_size: The most streams to draw the first blocks of at once.
+        :returns: An iterator over the streams, in the order of indices.
+        """
+        indices = list(indices)
+        position = 0
+        while position < len(indices):
+            start = indices[position]
+            run = 1
+            while run < batch_size and position + run < len(indices) and indices[position + run] == start + run:
+                run += 1
+
+            # The uniforms are only made into floats as they are used, by iterating over a memoryview of the array
+            uniforms = memoryview(self._draw(start * self.block_size, run * self.block_size))
+            for i in range(run):
+                first_block = uniforms[i * self.block_size:(i + 1) * self.block_size]
+                yield BufferedRandom(self.seed_sequence, first_block=first_block, position=(start + i + 1) << 64)
+            position += run
+
+    def _draw(self, position: int, size: int) -> np.ndarray:
+        bit_generator = np.random.PCG64(self.seed_sequence)
+        bit_generator.advance(position)
+        return np.random.Generator(bit_generator).random(size)
+
+
+class WeightedSampler:
+    """
+    Samples from a fixed list of values with fixed weights. The cumulative weights are worked out once when the
+    sampler is made, so each draw is a single uniform draw and a binary search.
+
+    Scalar draws use a Random and match Random.choices(values, weights)[0] draw for draw, so a sampler can replace
+    a call to choices without changing the output for a given seed. Bulk draws use a numpy Generator.
+
+    :param values: The values to sample from.
+    :param weights: The weight of each value, which need not sum to 1. Values with no weight are never sampled.
+    """
+
+    def __init__(self, values: Iterable[Any], weights: Iterable[float]):
+        self.values = tuple(values)
+        self.cum_weights = list(itertools.accumulate(weights))
+        if len(self.cum_weights) != len(self.values):
+            raise ValueError('The number of weights does not match the number of values')
+        if not self.cum_weights or self.cum_weights[-1] <= 0:
+            raise ValueError('The total of the weights must be greater than zero')
+
+        self._total = self.cum_weights[-1] + 0.0
+        self._cumulative = np.array(self.cum_weights, dtype=np.float64)
+        self._value_array = np.empty(len(self.values), dtype=object)
+        self._value_array[:] = self.values
+
+    def __call__(self, rng: Random) -> Any:
+        """
+        :param rng: Random number generator to draw from.
+        :returns: A sampled value.
+        """
+        return self.values[bisect.bisect(self.cum_weights, rng.random() * self._total, 0, len(self.values) - 1)]
+
+    def sample_indices(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        :param rng: Random number generator to draw from.
+        :param size: The number of samples.
+        :returns: The positions in values of the sampled values.
+        """
+        # Sampling from (0, total] means zero weight values can never be picked
+        return np.searchsorted(self._cumulative, (1 - rng.random(size)) * self._total)
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        :param rng: Random number generator to draw from.
+        :param size: The number of samples.
+        :returns: The sampled values, as an object array.
+        """
+        return self._value_array[self.sample_indices(rng, size)]
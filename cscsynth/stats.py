@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Callable, ContextManager, Dict, Iterator, Optional
+
+
+@dataclass
+class StageStats:
+    """
+    What was recorded for one stage of a run.
+
+    :param seconds: The wall time spent in the stage. Stages can run inside other stages (e.g. episodes inside
+        generate), in which case the time counts towards both.
+    :param calls: The number of times the stage was timed.
+    :param items: The number of items the stage produced, e.g. children or episodes.
+    :param bytes: The number of bytes the stage wrote. For CSV and XML this is the text written, before any
+        compression, and for Parquet the size of the files.
+    """
+    seconds: float = 0.0
+    calls: int = 0
+    items: int = 0
+    bytes: int = 0
+
+
+class Stats:
+    """
+    Timings and counts for the stages of a run, collected with collect_stats.
+
+    :param progress: Called with these stats as items are recorded, at most once every progress_interval seconds,
+        and once more at the end of the run.
+    :param progress_interval: The least number of seconds between calls to progress.
+    """
+
+    def __init__(self, progress: Optional[Callable[['Stats'], None]] = None, progress_interval: float = 1.0):
+        self.stages: Dict[str, StageStats] = {}
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self._last_progress = time.perf_counter()
+        # Stages can be recorded from several threads at once, e.g. the writers run by the command line tool
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> StageStats:
+        with self._lock:
+            return self._stage(name)
+
+    def _stage(self, name: str) -> StageStats:
+        # The stats of the stage, created the first time it is recorded. Called with the lock held, so that threads
+        # recording a new stage at the same time share one StageStats.
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats()
+        return stage
+
+    def stage(self, name: str) -> ContextManager[StageStats]:
+        """
+        :returns: A context manager which adds the time spent inside it to the stage.
+        """
+        return _Timer(self[name], self._lock)
+
+    def add(self, name: str, items: int = 0, bytes: int = 0):
+        """
+        Adds items and bytes to a stage.
+        """
+        report = False
+        with self._lock:
+            stage = self._stage(name)
+            stage.items += items
+            stage.bytes += bytes
+
+            # Checked under the lock, so only one thread reports each interval, but reported outside it, as progress
+            # will usually read the stats
+            if self.progress is not None:
+                now = time.perf_counter()
+                if now - self._last_progress >= self.progress_interval:
+                    self._last_progress = now
+                    report = True
+
+        if report:
+            self.progress(self)
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        :returns: The stats of each stage, as a dict of dicts.
+        """
+        with self._lock:
+            return {name: asdict(stage) for name, stage in self.stages.items()}
+
+    def to_json(self, **kwargs) -> str:
+        """
+        :param kwargs: Passed on to json.dumps.
+        :returns: The stats of each stage, as JSON.
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def summary(self) -> str:
+        """
+        :returns: A table of the stats of each stage, for printing.
+        """
+        with self._lock:
+            stages = [(name, StageStats(**asdict(stage))) for name, stage in self.stages.items()]
+
+        lines = [f'{"stage":<20} {"seconds":>9} {"calls":>9} {"items":>10} {"MB":>9}']
+        for name, stage in stages:
+            lines.append(f'{name:<20} {stage.seconds:9.3f} {stage.calls:9} {stage.items:10} {stage.bytes / 1e6:9.2f}')
+        return '\n'.join(lines)
+
+
+class _Timer:
+    __slots__ = ('_stage', '_lock', '_start')
+
+    def __init__(self, stage: StageStats, lock: threading.Lock):
+        self._stage = stage
+        self._lock = lock
+
+    def __enter__(self) -> StageStats:
+        self._start = time.perf_counter()
+        return self._stage
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        with self._lock:
+            self._stage.seconds += seconds
+            self._stage.calls += 1
+
+
+# The stats being collected, if any. The instrumented functions check this and do nothing else when it is None, so
+# they cost no more than a global lookup when stats aren't being collected.
+_current: Optional[Stats] = None
+_NOT_TIMED = nullcontext()
+
+
+@contextmanager
+def collect_stats(progress: Optional[Callable[[Stats], None]] = None, progress_interval: float = 1.0) -> Iterator[Stats]:
+    """
+    Records timings and counts for the generators, census functions and writers run inside the with block:
+
+        with collect_stats(progress=lambda stats: print(stats['children'].items)) as stats:
+            create_csv(gen.iter_children(100_000), output_dir)
+        print(stats.summary())
+
+    Only work done in this process is recorded. When children are generated across a process pool, the children
+    are counted as they come back from the workers, but the stages run in the workers aren't timed.
+
+    :param progress: Called with the stats as items are recorded, at most once every progress_interval seconds,
+        and once more at the end.
+    :param progress_interval: The least number of seconds between calls to progress.
+    :returns: The Stats being recorded.
+    """
+    global _current
+    previous = _current
+    stats = Stats(progress, progress_interval)
+    _current = stats
+    try:
+        yield stats
+    finally:
+        _current = previous
+        if progress is not None:
+            progress(stats)
+
+
+def stage(name: str) -> ContextManager[Optional[StageStats]]:
+    """
+    :returns: A context manager timing the stage, if stats are being collected.
+    """
+    if _current is None:
+        return _NOT_TIMED
+    return _current.stage(name)
+
+
+def add(name: str, items: int = 0, bytes: int = 0):
+    """
+    Adds items and bytes to a stage, if stats are being collected.
+    """
+    if _current is not None:
+        _current.add(name, items, bytes)
+
@@ -1,7 +1,81 @@
 import datetime
+import dataclasses
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 
+# Generated dates fall on a few thousand different days, so the records share one datetime object per day rather
+# than each holding their own copy
+_interned_dates: Dict[datetime.datetime, datetime.datetime] = {}
+
+# The most dates held by each of the process-wide date caches, here and in the CSV writer. This covers well over a
+# century of days, and a cache that fills up (e.g. from dates with a time of day) is emptied and starts again, so
+# the caches stay bounded however many children are made.
+_MAX_CACHED_DATES = 1 << 16
+
+
+def intern_date(date: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """
+    :param date: A date, or None.
+    :returns: A datetime equal to the given one, which is the same object for every call with an equal date while
+        it stays in the cache.
+    """
+    if date is None:
+        return None
+    if len(_interned_dates) >= _MAX_CACHED_DATES and date not in _interned_dates:
+        _interned_dates.clear()
+    return _interned_dates.setdefault(date, date)
+
+
+# The generators work on dates as day numbers, counted from 1970-01-01 as numpy's datetime64[D] is, and only make
+# datetimes for the records they return
+EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_ORDINAL = EPOCH.toordinal()
+_dates_by_day: Dict[int, datetime.datetime] = {}
+
+
+def day_of(date: datetime.datetime) -> int:
+    """
+    :param date: A date. Any time of day is ignored.
+    :returns: The number of days from 1970-01-01 to the date.
+    """
+    return date.toordinal() - _EPOCH_ORDINAL
+
+
+def date_of_day(day: Optional[int]) -> Optional[datetime.datetime]:
+    """
+    The inverse of day_of.
+
+    :param day: A number of days from 1970-01-01, or None.
+    :returns: The date (at midnight) that many days from 1970-01-01, which is the same interned object for every
+        call with the same day while it stays in the cache, or None.
+    """
+    if day is None:
+        return None
+    date = _dates_by_day.get(day)
+    if date is None:
+        if len(_dates_by_day) >= _MAX_CACHED_DATES:
+            _dates_by_day.clear()
+        date = _dates_by_day[day] = intern_date(EPOCH + datetime.timedelta(days=day))
+    return date
+
+
+def _slots(cls):
+    """
+    Rebuilds a dataclass with __slots__, so that instances are stored without a __dict__. This is what
+    dataclass(slots=True) does on Python 3.10 and above.
+    """
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in dataclasses.fields(cls))
+    cls_dict['__slots__'] = field_names
+    # The defaults are already bound into __init__, and as class attributes they would clash with the slots
+    for name in field_names + ('__dict__', '__weakref__'):
+        cls_dict.pop(name, None)
+    new_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
+
+
+@_slots
 @dataclass
 class Episode:
     start_date: datetime.datetime
@@ -18,6 +92,7 @@ class Episode:
     urn: Optional[str] = None
 
 
+@_slots
 @dataclass
 class Missing:
     missing_type: str
@@ -25,17 +100,20 @@ class Missing:
     end_date: datetime.datetime
 
 
+@_slots
 @dataclass
 class Review:
     review_code: str
     review_date: datetime.datetime
 
+@_slots
 @dataclass
 class LeavingCareData:
     accom: str
     in_touch: str
     activ: str
 
+@_slots
 @dataclass
 class AdoptionData:
     start_date: datetime.datetime
@@ -46,6 +124,7 @@ class AdoptionData:
     sex_adopter: str
     ls_adopter: str
 
+@_slots
 @dataclass
 class OutcomesData:
     sdq_score: Optional[int]
@@ -59,6 +138,7 @@ class OutcomesData:
     intervention_received: bool
     intervention_offered: bool
 
+@_slots
 @dataclass
 class Child:
     upn: str
@@ -8,7 +8,8 @@ from pathlib import Path
 start_date = datetime.datetime(2015, 1, 1)
 end_date = datetime.datetime(2020, 1 ,1)
 
-gen = ChildrenGenerator(start_date=start_date, end_date=end_date)
+# The same seed always generates the same children
+gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
 
 all_children = gen.generate(num_children=500)
 
@@ -4,7 +4,8 @@ from cscsynth import ChildrenGenerator
 start_date = datetime.datetime(2015, 1, 1)
 end_date = datetime.datetime(2020, 1 ,1)
 
-gen = ChildrenGenerator(start_date=start_date, end_date=end_date)
+# The same seed always generates the same children
+gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
 
 children = gen.generate(num_children=10)
 
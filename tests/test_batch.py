@@ -0,0 +1,91 @@
+import datetime
+import json
+import pandas as pd
+import pytest
+from cscsynth.batch import LocalAuthority, generate_local_authorities, read_manifest
+from cscsynth.types import Probabilities
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2021, 1, 1)
+periods = [(datetime.datetime(2019, 4, 1), datetime.datetime(2020, 3, 31))]
+local_authorities = [
+    LocalAuthority('Barnet', 300),
+    LocalAuthority('Camden', 200, Probabilities(is_uasc=1)),
+    LocalAuthority('Ealing', 100, seed=5),
+]
+
+
+def test_generate_local_authorities(tmpdir):
+    index = generate_local_authorities(local_authorities, str(tmpdir), start_date, end_date, periods, seed=1)
+
+    assert json.loads(tmpdir.join('index.json').read()) == index
+    assert [la['name'] for la in index['local_authorities']] == ['Barnet', 'Camden', 'Ealing']
+    assert [la['first_index'] for la in index['local_authorities']] == [0, 300, 500]
+    assert index['local_authorities'][2]['seed'] == 5
+
+    # Ids are unique across the local authorities, and every child in a census is in the index
+    children = pd.read_csv(str(tmpdir.join('children.csv')))
+    assert len(children) == 600
+    assert children['child_id'].is_unique and children['upn'].is_unique
+    for la in local_authorities:
+        header = pd.read_csv(str(tmpdir.join(la.name, '2019-04-01_2020-03-31', 'header.csv')))
+        assert set(header['CHILD']) <= set(children.loc[children['local_authority'] == la.name, 'child_id'])
+
+    # Each local authority has its own probabilities
+    uasc = pd.read_csv(str(tmpdir.join('Camden', '2019-04-01_2020-03-31', 'uasc.csv')))
+    header = pd.read_csv(str(tmpdir.join('Camden', '2019-04-01_2020-03-31', 'header.csv')))
+    assert len(uasc) == len(header)
+
+
+def test_generate_local_authorities_in_parallel(tmpdir):
+    serial = generate_local_authorities(local_authorities, str(tmpdir.join('serial')), start_date, end_date, periods,
+                                        seed=1)
+    parallel = generate_local_authorities(local_authorities, str(tmpdir.join('parallel')), start_date, end_date,
+                                          periods, seed=1, workers=2)
+
+    for la in local_authorities:
+        file_name = ('2019-04-01_2020-03-31', 'episodes.csv')
+        assert tmpdir.join('serial', la.name, *file_name).read() == tmpdir.join('parallel', la.name, *file_name).read()
+    assert tmpdir.join('serial', 'children.csv').read() == tmpdir.join('parallel', 'children.csv').read()
+    assert [la['seed'] for la in serial['local_authorities']] == [la['seed'] for la in parallel['local_authorities']]
+
+
+def test_generate_local_authorities_checks(tmpdir):
+    with pytest.raises(ValueError):
+        generate_local_authorities([LocalAuthority('A', 1), LocalAuthority('A', 1)], str(tmpdir), start_date,
+                                   end_date, periods)
+    with pytest.raises(ValueError):
+        generate_local_authorities([LocalAuthority('A', 600), LocalAuthority('B', 500)], str(tmpdir.join('ids')),
+                                   start_date, end_date, periods, child_id_range=(1, 1000))
+    for name in ['../outside', 'a/b', '..', '', 'index.json']:
+        with pytest.raises(ValueError):
+            generate_local_authorities([LocalAuthority(name, 1)], str(tmpdir.join('names')), start_date, end_date,
+                                       periods)
+    # Nothing is written for a batch that fails its checks
+    assert tmpdir.listdir() == []
+
+
+def test_generate_local_authorities_id_ranges(tmpdir):
+    index = generate_local_authorities(local_authorities, str(tmpdir), start_date, end_date, periods, seed=1,
+                                       child_id_range=(1000, 1599), upn_number_range=(1, 600))
+
+    assert index['child_id_range'] == [1000, 1599]
+    children = pd.read_csv(str(tmpdir.join('children.csv')), dtype={'upn': str})
+    assert sorted(children['child_id']) == list(range(1000, 1600))
+    assert children['upn'].is_unique and children['upn'].str[1:].astype(int).between(1, 600).all()
+    for la in local_authorities:
+        header = pd.read_csv(str(tmpdir.join(la.name, '2019-04-01_2020-03-31', 'header.csv')))
+        assert set(header['CHILD']) <= set(children.loc[children['local_authority'] == la.name, 'child_id'])
+
+
+def test_read_manifest(tmpdir):
+    manifest = tmpdir.join('manifest.json')
+    manifest.write(json.dumps([
+        {'name': 'Barnet', 'num_children': 10},
+        {'name': 'Camden', 'num_children': 20, 'seed': 3, 'probabilities': {'is_uasc': 0.5}},
+    ]))
+
+    assert read_manifest(str(manifest)) == [
+        LocalAuthority('Barnet', 10),
+        LocalAuthority('Camden', 20, Probabilities(is_uasc=0.5), seed=3),
+    ]
@@ -0,0 +1,96 @@
+import datetime
+import os
+import numpy as np
+import pytest
+from cscsynth import ChildrenGenerator
+from cscsynth.cache import PopulationCache, fingerprint
+from cscsynth.columnar import ChildrenArrays
+from cscsynth.population import ChildrenSequence
+from cscsynth.types import Probabilities
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+
+
+def test_from_children_round_trip(tmpdir):
+    children = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1).generate(500)
+
+    path = str(tmpdir.join('population.npz'))
+    ChildrenArrays.from_children(children).save(path)
+    assert ChildrenArrays.load(path).to_children() == children
+
+
+def test_population_cache(tmpdir, monkeypatch):
+    cache = PopulationCache(str(tmpdir))
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+
+    children = cache.generate(gen, 200)
+    assert cache.path(gen, 200).exists()
+
+    # A hit loads the population rather than generating it, and decodes the children as they are used
+    monkeypatch.setattr(gen, 'generate', None)
+    loaded = cache.generate(gen, 200)
+    assert isinstance(loaded, ChildrenSequence)
+    assert loaded == children
+    assert list(loaded) == children
+    assert loaded[150] == children[150]
+    assert cache.generate(ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1), 200) == children
+
+    arrays = cache.generate_arrays(gen, 200)
+    assert np.array_equal(cache.generate_arrays(gen, 200).episodes['start_date'], arrays.episodes['start_date'])
+
+    assert cache.invalidate(gen, 200) == 2
+    assert cache.size() == 0
+
+
+def test_fingerprint(monkeypatch):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+    key = fingerprint(gen, 100)
+
+    assert fingerprint(ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1), 100) == key
+    assert fingerprint(gen, 101) != key
+    assert fingerprint(gen, 100, 'generate_arrays') != key
+    assert fingerprint(ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2), 100) != key
+    assert fingerprint(ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1,
+                                         probabilities=Probabilities(is_uasc=0.5)), 100) != key
+    # The order of the reasons changes which reason is drawn, and so the population
+    reasons = Probabilities().reason_for_episode_change
+    reversed_reasons = Probabilities(reason_for_episode_change=dict(reversed(list(reasons.items()))))
+    assert fingerprint(ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1,
+                                         probabilities=reversed_reasons), 100) != key
+    monkeypatch.setattr('cscsynth.cache.__version__', '99.0')
+    assert fingerprint(gen, 100) != key
+
+
+def test_population_cache_evicts_least_recently_used(tmpdir):
+    cache = PopulationCache(str(tmpdir))
+    gens = [ChildrenGenerator(start_date=start_date, end_date=end_date, seed=seed) for seed in range(3)]
+
+    cache.generate(gens[0], 100)
+    cache.generate(gens[1], 100)
+    os.utime(cache.path(gens[0], 100), ns=(1, 1))
+    os.utime(cache.path(gens[1], 100), ns=(2, 2))
+    # Using the first population makes the second the least recently used
+    cache.generate(gens[0], 100)
+
+    cache.max_bytes = cache.size() + 1000
+    cache.generate(gens[2], 100)
+
+    assert cache.path(gens[0], 100).exists()
+    assert not cache.path(gens[1], 100).exists()
+    assert cache.path(gens[2], 100).exists()
+    assert cache.invalidate() == 2
+
+
+def test_population_cache_replaces_damaged_files(tmpdir):
+    cache = PopulationCache(str(tmpdir))
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+    children = cache.generate(gen, 50)
+
+    cache.path(gen, 50).write_bytes(b'not a population')
+    assert cache.generate(gen, 50) == children
+
+
+def test_population_cache_checks_arguments(tmpdir):
+    with pytest.raises(ValueError):
+        PopulationCache(str(tmpdir)).invalidate(ChildrenGenerator(start_date=start_date, end_date=end_date))
@@ -0,0 +1,68 @@
+import datetime
+from cscsynth import ChildrenGenerator
+from cscsynth.census import (snapshot_arrays_for_period, snapshot_children_for_period, snapshot_children_for_periods,
+                             write_census_arrays_for_periods)
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+census_start = datetime.datetime(2017, 4, 1)
+census_end = datetime.datetime(2018, 4, 1)
+
+
+def test_snapshot_leaves_population_unchanged():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+    population = gen.generate(500)
+
+    children = snapshot_children_for_period(census_start, census_end, population)
+
+    assert 0 < len(children) < len(population)
+    assert population == gen.generate(500)
+
+    population_by_id = {c.child_id: c for c in population}
+    for child in children:
+        original = population_by_id[child.child_id]
+        for episode in child.episodes:
+            assert episode.start_date < census_end
+            if episode.end_date is None:
+                assert any(e.start_date == episode.start_date and e.end_date > census_end for e in original.episodes)
+            else:
+                # Unchanged episodes are shared with the population rather than copied
+                assert any(e is episode for e in original.episodes)
+        if child.adoption_data is not None and child.adoption_data.end_date is None:
+            assert original.adoption_data.end_date is not None
+
+
+def test_snapshot_children_for_periods(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2)
+    population = gen.generate(500)
+    periods = [(datetime.datetime(year, 4, 1), datetime.datetime(year + 1, 3, 31)) for year in range(2014, 2021)]
+    # Overlapping periods are handled too
+    periods.append((datetime.datetime(2016, 1, 1), datetime.datetime(2018, 1, 1)))
+
+    snapshots = snapshot_children_for_periods(periods, iter(population), output_dir=tmpdir)
+
+    assert list(snapshots) == periods
+    # A list is indexed rather than read in one pass, which gives the same snapshots
+    assert snapshot_children_for_periods(periods, population) == snapshots
+    for period_start, period_end in periods:
+        expected = snapshot_children_for_period(period_start, period_end, population)
+        assert snapshots[period_start, period_end] == expected
+        header = tmpdir / f'{period_start:%Y-%m-%d}_{period_end:%Y-%m-%d}' / 'header.csv'
+        assert len(header.readlines()) == len(expected) + 1
+
+
+def test_snapshot_arrays_for_period(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=3)
+    arrays = gen.generate_arrays(1000)
+    population = arrays.to_children()
+    periods = [(datetime.datetime(year, 4, 1), datetime.datetime(year + 1, 3, 31)) for year in range(2014, 2021)]
+
+    for period_start, period_end in periods:
+        snapshot = snapshot_arrays_for_period(period_start, period_end, arrays)
+        assert snapshot.to_children() == snapshot_children_for_period(period_start, period_end, population)
+
+    write_census_arrays_for_periods(periods[:2], arrays, tmpdir / 'arrays')
+    snapshot_children_for_periods(periods[:2], population, output_dir=tmpdir / 'objects')
+    for period_start, period_end in periods[:2]:
+        name = f'{period_start:%Y-%m-%d}_{period_end:%Y-%m-%d}'
+        assert (tmpdir / 'arrays' / name / 'episodes.csv').read() == (tmpdir / 'objects' / name / 'episodes.csv').read()
@@ -0,0 +1,87 @@
+import datetime
+import numpy as np
+from cscsynth import ChildrenGenerator, childrengenerator
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+
+
+def test_generate_is_reproducible():
+    first = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=10).generate(200)
+    second = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=10).generate(200)
+    other = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=11).generate(200)
+
+    assert first == second
+    assert first != other
+
+
+def test_generate_is_independent_of_workers(monkeypatch):
+    monkeypatch.setattr(childrengenerator, 'CHUNK_SIZE', 40)
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=3)
+
+    serial = gen.generate(150)
+    parallel = gen.generate(150, workers=3)
+
+    assert serial == parallel
+    assert len({c.child_id for c in parallel}) == 150
+    assert len({c.upn for c in parallel}) == 150
+
+
+def test_iter_children():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=6)
+    population = gen.generate(130)
+
+    children = gen.iter_children(130, chunk_size=50)
+    assert not isinstance(children, list)
+    assert list(children) == population
+    assert list(gen.iter_children(130, chunk_size=20, workers=2)) == population
+
+
+def test_random_access():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=4)
+    population = gen.generate(300)
+
+    assert gen.child(123) == population[123]
+    assert gen.children(range(250, 300)) == population[250:]
+
+    # An unseeded generator is still consistent with itself
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date)
+    assert gen.child(5) == gen.generate(6)[5]
+
+
+def test_random_streams_are_separate():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=4)
+    root = np.random.SeedSequence(gen.entropy)
+
+    # The ids key, the children's buffered streams and the array engine each have their own seed sequence
+    first_words = {
+        int(root.generate_state(1, np.uint64)[0]),
+        gen.ids.key,
+        int(gen.uniforms.seed_sequence.generate_state(1, np.uint64)[0]),
+        int(gen._seed_sequence(childrengenerator._ARRAYS_SPAWN_KEY).generate_state(1, np.uint64)[0]),
+    }
+    assert len(first_words) == 4
+    assert gen.uniforms.stream(0).random() != np.random.default_rng(root).random()
+
+
+def test_unbuffered_random():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=4, buffered_random=False)
+    population = gen.generate(100)
+
+    assert gen.child(42) == population[42]
+    assert population == ChildrenGenerator(start_date=start_date, end_date=end_date, seed=4,
+                                           buffered_random=False).generate(100)
+    # A different stream to the buffered default, but the same ids
+    buffered = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=4).generate(100)
+    assert population != buffered
+    assert [c.child_id for c in population] == [c.child_id for c in buffered]
+
+
+
+def test_ids_match_between_engines():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=5)
+    arrays = gen.generate_arrays(20)
+    children = gen.generate(20)
+
+    assert arrays.children['child_id'].tolist() == [c.child_id for c in children]
+    assert arrays.children['upn'].astype(str).tolist() == [c.upn for c in children]
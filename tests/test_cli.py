@@ -0,0 +1,70 @@
+import datetime
+import pytest
+from cscsynth import ChildrenGenerator
+from cscsynth.census import _fan_out, snapshot_children_for_periods
+from cscsynth.cli import _generator, _parser, main
+from cscsynth.csv import TABLES
+from cscsynth.ids import IdService
+
+periods = [
+    (datetime.datetime(2018, 4, 1), datetime.datetime(2019, 3, 31)),
+    (datetime.datetime(2019, 4, 1), datetime.datetime(2020, 3, 31)),
+]
+
+
+def test_cli_csv(tmpdir, capsys):
+    main([str(tmpdir.join('cli')), '-n', '500', '--seed', '3', '--chunk-size', '100',
+          '--period', '2018-04-01', '2019-03-31', '--period', '2019-04-01', '2020-03-31'])
+    assert 'Generated 500 children' in capsys.readouterr().out
+
+    # The same as snapshotting the whole population at once
+    gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1), seed=3)
+    snapshot_children_for_periods(periods, gen.generate(500), output_dir=str(tmpdir.join('library')))
+    for start_date, end_date in periods:
+        name = f'{start_date:%Y-%m-%d}_{end_date:%Y-%m-%d}'
+        for table in TABLES:
+            assert tmpdir.join('cli', name, table.file_name).read() == tmpdir.join('library', name, table.file_name).read()
+
+
+def test_cli_arrays(tmpdir):
+    main([str(tmpdir), '-n', '300', '--seed', '3', '--engine', 'arrays', '--format', 'xml', '--end-date', '2020-06-01'])
+    assert tmpdir.join('2019-04-01_2020-03-31', 'fake_903.xml').size() > 0
+
+
+def test_cli_xml(tmpdir):
+    main([str(tmpdir), '-n', '100', '--seed', '3', '--format', 'xml', '--end-date', '2020-06-01'])
+    assert tmpdir.join('2019-04-01_2020-03-31', 'fake_903.xml').size() > 0
+
+
+def test_cli_more_children_than_default_ids():
+    # The default child id range only covers 1000001 children, so is widened to fit
+    gen = _generator(_parser().parse_args(['output', '-n', '2000000', '--seed', '3']))
+    assert gen.ids.capacity >= 2_000_000
+    last = gen.child(1_999_999)
+    assert 0 <= last.child_id <= 1_999_999
+    assert last.child_id != gen.child(999_999).child_id
+
+    # The defaults are unchanged for smaller populations
+    assert _generator(_parser().parse_args(['output', '-n', '1000'])).ids.child_id_range == (0, 1_000_000)
+
+
+def test_cli_checks_id_capacity_before_writing(tmpdir, capsys):
+    with pytest.raises(SystemExit):
+        main([str(tmpdir.join('out')), '-n', '200', '--child-id-range', '0', '99'])
+    assert 'only 100 children' in capsys.readouterr().err
+    assert not tmpdir.join('out').exists()
+
+    with pytest.raises(ValueError):
+        ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2021, 1, 1),
+                          ids=IdService(1, child_id_range=(0, 99))).iter_children(200)
+
+
+def test_fan_out_error():
+    def fail(items):
+        for item in items:
+            if item == 5:
+                raise ValueError('consumer failed')
+
+    seen = []
+    with pytest.raises(ValueError):
+        _fan_out(range(10_000), [fail, seen.extend], max_pending=2)
@@ -0,0 +1,120 @@
+import datetime
+import numpy as np
+from cscsynth import ChildrenGenerator
+from cscsynth.columnar import generate_reviews_batch, _sample_event_days
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+
+
+def test_generate_arrays_shapes():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+    arrays = gen.generate_arrays(2000)
+
+    assert len(arrays) == 2000
+    assert all(len(column) == 2000 for column in arrays.children.values())
+    for table, offsets in [
+        (arrays.episodes, arrays.episode_offsets),
+        (arrays.reviews, arrays.review_offsets),
+        (arrays.missing, arrays.missing_offsets),
+    ]:
+        assert offsets[0] == 0
+        assert np.all(np.diff(offsets) >= 0)
+        assert all(len(column) == offsets[-1] for column in table.values())
+
+    # Every child has at least one episode
+    assert np.all(np.diff(arrays.episode_offsets) >= 1)
+    assert len(np.unique(arrays.children['child_id'])) == 2000
+    assert len(np.unique(arrays.children['upn'])) == 2000
+
+
+def test_generate_arrays_is_reproducible():
+    first = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=5).generate_arrays(500)
+    second = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=5).generate_arrays(500)
+
+    for name, column in first.episodes.items():
+        assert np.array_equal(column, second.episodes[name])
+    assert np.array_equal(first.children['upn'], second.children['upn'])
+
+
+def test_to_children():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2)
+    children = gen.generate_arrays(1000).to_children()
+
+    assert len(children) == 1000
+    for child in children:
+        assert len(child.upn) == 13
+        assert child.episodes[0].reason_for_new_episode == 'S'
+        assert child.episodes[0].start_date >= start_date
+        assert child.episodes[-1].end_date <= child.dob + datetime.timedelta(days=18 * 365)
+
+        for previous, current in zip(child.episodes, child.episodes[1:]):
+            if current.reason_for_new_episode == 'S':
+                assert previous.reason_end != 'X1'
+            else:
+                assert previous.end_date == current.start_date
+                assert previous.reason_end == 'X1'
+                assert (previous.reason_place_change is not None) == (current.reason_for_new_episode in ['P', 'B'])
+
+        for review in child.reviews:
+            assert any(e.start_date <= review.review_date < e.end_date for e in child.episodes)
+
+
+def test_take():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=4)
+    arrays = gen.generate_arrays(200)
+    children = arrays.to_children()
+
+    rows = [150, 3, 3, 199, 0]
+    assert arrays.take(rows).to_children() == [children[i] for i in rows]
+    assert arrays.take([]).to_children() == []
+
+
+def test_generate_arrays_matches_generate():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=3)
+    arrays = gen.generate_arrays(5000)
+    children = gen.generate(1000)
+
+    assert abs(np.diff(arrays.episode_offsets).mean() - np.mean([len(c.episodes) for c in children])) < 0.5
+    assert abs(np.diff(arrays.review_offsets).mean() - np.mean([len(c.reviews) for c in children])) < 0.5
+    assert abs(np.diff(arrays.missing_offsets).mean() - np.mean([len(c.missing_periods) for c in children])) < 0.05
+    assert abs((arrays.children['sex'] == 2).mean() - np.mean([c.sex == 2 for c in children])) < 0.06
+
+
+def test_sample_event_days():
+    rng = np.random.default_rng(4)
+    lengths = np.full(5000, 1000)
+    periods, days = _sample_event_days(rng, lengths, 1 / 300)
+
+    assert np.all(days < 1000)
+    counts = np.bincount(periods, minlength=len(lengths))
+    # Binomial(1000, 1 / 300)
+    assert abs(counts.mean() - 1000 / 300) < 0.1
+    assert abs(counts.var() - 1000 / 300 * (1 - 1 / 300)) < 0.3
+
+    # Events are sorted and distinct within each period
+    same_period = periods[1:] == periods[:-1]
+    assert np.all(days[1:][same_period] > days[:-1][same_period])
+
+
+def test_generate_reviews_batch():
+    children = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=6).generate(200)
+    episodes_by_child = [c.episodes for c in children]
+
+    reviews_by_child = generate_reviews_batch(episodes_by_child, 1 / 100, np.random.default_rng(6))
+
+    assert len(reviews_by_child) == len(children)
+    for episodes, reviews in zip(episodes_by_child, reviews_by_child):
+        for review in reviews:
+            assert any(e.start_date <= review.review_date < e.end_date for e in episodes)
+
+
+def test_to_children_shares_dates():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=3)
+    children = gen.generate_arrays(500).to_children()
+
+    for child in children:
+        assert not hasattr(child, '__dict__')
+        for previous, current in zip(child.episodes, child.episodes[1:]):
+            if current.reason_for_new_episode != 'S':
+                assert previous.end_date is current.start_date
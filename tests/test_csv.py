@@ -0,0 +1,82 @@
+import datetime
+import numpy as np
+import pytest
+from cscsynth import csv
+from cscsynth import ChildrenGenerator
+from cscsynth.census import iter_snapshot_children_for_period, snapshot_arrays_for_period, snapshot_children_for_period
+from cscsynth.csv import TABLES, create_csv, create_csv_from_arrays, create_episodes, create_header, create_missing, create_oc2
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+census_start = datetime.datetime(2017, 4, 1)
+census_end = datetime.datetime(2018, 4, 1)
+
+
+def test_create_csv_in_chunks(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+    children = snapshot_children_for_period(census_start, census_end, gen.generate(300))
+
+    create_csv(children, tmpdir / 'whole')
+    # Small enough that some chunks have no rows for the sparser tables
+    streamed = iter_snapshot_children_for_period(census_start, census_end, gen.iter_children(300))
+    create_csv(streamed, tmpdir / 'chunked', chunk_size=7)
+
+    for table in TABLES:
+        assert (tmpdir / 'chunked' / table.file_name).read() == (tmpdir / 'whole' / table.file_name).read()
+
+
+def test_create_csv_from_arrays(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=4)
+    snapshot = snapshot_arrays_for_period(census_start, census_end, gen.generate_arrays(500))
+
+    create_csv(snapshot.to_children(), tmpdir / 'objects')
+    create_csv_from_arrays(snapshot, tmpdir / 'arrays', chunk_size=60)
+
+    for table in TABLES:
+        assert (tmpdir / 'arrays' / table.file_name).read() == (tmpdir / 'objects' / table.file_name).read()
+
+
+def test_create_csv_matches_dataframes(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2)
+    children = snapshot_children_for_period(census_start, census_end, gen.generate(300))
+
+    create_csv(children, tmpdir)
+
+    for create_table, file_name in [
+        (create_header, 'header.csv'),
+        (create_episodes, 'episodes.csv'),
+        (create_oc2, 'oc2.csv'),
+        (create_missing, 'missing.csv'),
+    ]:
+        df = create_table(children)
+        assert (tmpdir / file_name).read() == df.to_csv(index=False)
+        # Empty tables still have their header
+        assert list(create_table([]).columns) == list(df.columns)
+
+    episodes = create_episodes(children)
+    assert episodes['CHILD'].dtype == 'int64'
+    assert episodes['DEC'].isna().sum() > 0
+    assert create_header(children)['MOTHER'].dtype == 'Int64'
+
+
+def test_create_csv_rejects_unquotable_values(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=3)
+    child = gen.child(0)
+    child.ethnicity = 'WHITE, BRITISH'
+
+    with pytest.raises(ValueError):
+        create_csv([child], tmpdir)
+
+
+def test_date_text_caches_are_bounded(monkeypatch):
+    monkeypatch.setattr(csv, '_MAX_CACHED_DATES', 10)
+    dates = csv._DateStrings('%d/%m/%Y')
+    day_text = csv._DayText(dates)
+
+    for first in [18000, 19000]:
+        values = np.arange(first, first + 100).astype('datetime64[D]')
+        expected = [d.strftime('%d/%m/%Y').encode() for d in values.astype('datetime64[us]').tolist()]
+        assert day_text(values).tolist() == expected
+        assert len(dates) <= 10
+        # Only the days of the column are covered, as covering both columns would be too many days
+        assert len(day_text._days[1]) == 100
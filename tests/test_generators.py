@@ -1,6 +1,14 @@
+import datetime
 import itertools
+import math
 import re
-from cscsynth.generators import generate_upn
+import numpy as np
+import pytest
+from scipy.stats import chi2_contingency
+from cscsynth.rng import BufferedRandom, Random, UniformBlocks, WeightedSampler
+from cscsynth import types
+from cscsynth.types import Probabilities, date_of_day, day_of
+from cscsynth.generators import generate_upn, generate_care_episode, generate_episodes, generate_missing_data, generate_reviews, _days_until_event, reason_for_episode_change_sampler
 
 def test_generate_upn():
     generator = generate_upn()
@@ -11,4 +19,176 @@ def test_generate_upn():
         assert re.match(r'[A-Z][0-9]{12}', upn)
 
         assert upn not in seen_upns
-        seen_upns.add(upn)
\ No newline at end of file
+        seen_upns.add(upn)
+
+def test_day_of():
+    assert day_of(datetime.datetime(1970, 1, 1)) == 0
+    assert day_of(datetime.datetime(2020, 2, 29, 13, 30)) == 18321
+    for day in [-1000, 0, 18321, 20000]:
+        assert day_of(date_of_day(day)) == day
+    # The same object for every call with the same day
+    assert date_of_day(18321) is date_of_day(18321)
+    assert date_of_day(None) is None
+
+
+def test_date_caches_are_bounded(monkeypatch):
+    monkeypatch.setattr(types, '_MAX_CACHED_DATES', 10)
+    monkeypatch.setattr(types, '_dates_by_day', {})
+    monkeypatch.setattr(types, '_interned_dates', {})
+
+    for day in range(18000, 18100):
+        assert day_of(date_of_day(day)) == day
+    assert len(types._dates_by_day) <= 10
+    assert len(types._interned_dates) <= 10
+
+
+def test_generators_return_whole_days():
+    rng = Random(12)
+    start_date = datetime.datetime(2015, 1, 1)
+    episodes = generate_episodes(start_date, datetime.datetime(2005, 6, 1), Probabilities(), rng)
+    missing = generate_missing_data(start_date, datetime.datetime(2020, 1, 1), 1, rng)
+
+    dates = [d for e in episodes for d in [e.start_date, e.end_date]] + [m.start_date for m in missing]
+    assert all(type(d) is datetime.datetime and d == date_of_day(day_of(d)) for d in dates)
+    assert all(start_date <= m.start_date <= datetime.datetime(2020, 1, 1) for m in missing)
+
+
+def _reference_change_days(length_of_episode, daily_episode_changing, rng):
+    # The original per-day sampling, kept here to check the event-driven version against.
+    return [i for i in range(length_of_episode) if rng.random() < daily_episode_changing]
+
+
+def test_generate_care_episode_matches_daily_sampling():
+    rng = Random(1234)
+    probabilities = Probabilities()
+    start_date = datetime.datetime(2015, 1, 1)
+    dob = datetime.datetime(2010, 6, 1)
+    length_of_episode = 1500
+    runs = 3000
+
+    expected = [len(_reference_change_days(length_of_episode, probabilities.daily_episode_changing, rng)) + 1 for _ in range(runs)]
+    actual = []
+    for _ in range(runs):
+        episodes = generate_care_episode(start_date, length_of_episode, probabilities, dob, rng)
+        actual.append(len(episodes))
+
+        # The episodes should still tile the period exactly
+        assert episodes[0].start_date == start_date
+        assert episodes[-1].end_date == start_date + datetime.timedelta(days=length_of_episode)
+        for previous, current in zip(episodes, episodes[1:]):
+            assert previous.end_date == current.start_date
+            assert previous.reason_end == 'X1'
+
+    # Both are Binomial(length, p) + 1, so compare the binned counts with a chi-squared test
+    bins = np.arange(1, 13)
+    expected_counts = np.histogram(np.clip(expected, 1, 11), bins=bins)[0]
+    actual_counts = np.histogram(np.clip(actual, 1, 11), bins=bins)[0]
+    _, p_value = chi2_contingency([expected_counts, actual_counts])[:2]
+    assert p_value > 0.001
+
+    mean = length_of_episode * probabilities.daily_episode_changing + 1
+    assert abs(np.mean(actual) - mean) < 0.15
+
+
+def test_days_until_event_distribution():
+    rng = Random(42)
+    p = 1 / 50
+    samples = np.array([_days_until_event(p, rng) for _ in range(20000)])
+
+    # Geometric (starting at 0) has mean (1 - p) / p
+    assert abs(samples.mean() - (1 - p) / p) < 2
+    assert samples.min() == 0
+
+    assert _days_until_event(1, rng) == 0
+    assert _days_until_event(0, rng) == math.inf
+
+
+@pytest.mark.parametrize('random_class', [Random, BufferedRandom])
+def test_random_distributions(random_class):
+    rng = random_class(7)
+
+    poisson = np.array([rng.poisson(3.5) for _ in range(20000)])
+    assert abs(poisson.mean() - 3.5) < 0.1
+    assert abs(poisson.var() - 3.5) < 0.2
+    assert rng.poisson(0) == 0
+    assert abs(np.mean([rng.poisson(500) for _ in range(200)]) - 500) < 10
+
+    # Failures before the first success, as scipy.stats.nbinom(n=1, p)
+    nbinom = np.array([rng.negative_binomial(1, 0.01) for _ in range(20000)])
+    assert abs(nbinom.mean() - 99) < 3
+
+
+def test_buffered_random():
+    # The same draws whatever the block size
+    first, second = BufferedRandom(5, block_size=7), BufferedRandom(5, block_size=1000)
+    assert [first.random() for _ in range(100)] == [second.random() for _ in range(100)]
+    assert [first.randint(1, 6) for _ in range(100)] == [second.randint(1, 6) for _ in range(100)]
+    assert [BufferedRandom(6).random() for _ in range(2)] != [first.random() for _ in range(2)]
+
+    rng = BufferedRandom(8)
+    rolls = [rng.randint(1, 6) for _ in range(60000)]
+    assert set(rolls) == {1, 2, 3, 4, 5, 6}
+    assert np.allclose(np.bincount(rolls)[1:] / len(rolls), 1 / 6, atol=0.01)
+    choices = [rng.choice('ABC') for _ in range(30000)]
+    assert np.allclose([choices.count(c) / len(choices) for c in 'ABC'], 1 / 3, atol=0.01)
+
+    # Wide ranges are drawn from getrandbits rather than a single uniform
+    assert all(0 <= rng.getrandbits(70) < 2 ** 70 for _ in range(100))
+    assert max(rng.getrandbits(70) for _ in range(100)).bit_length() > 64
+    assert len({rng.randint(0, 10 ** 15) for _ in range(1000)}) == 1000
+
+    with pytest.raises(TypeError):
+        rng.getstate()
+
+
+def test_uniform_blocks():
+    blocks = UniformBlocks(9, block_size=8)
+
+    # Each stream is the same however the streams are drawn together
+    together = [[rng.random() for _ in range(20)] for rng in blocks.streams(range(10), batch_size=4)]
+    alone = [[rng.random() for _ in range(20)] for rng in map(blocks.stream, range(10))]
+    reversed_order = [[rng.random() for _ in range(20)] for rng in blocks.streams(reversed(range(10)))]
+    assert together == alone == reversed_order[::-1]
+
+    # The streams carry on past their first block, and are all different
+    assert len({draw for draws in together for draw in draws}) == 200
+
+
+def test_generate_reviews_inside_episodes():
+    rng = Random(3)
+    probabilities = Probabilities()
+    start_date = datetime.datetime(2015, 1, 1)
+    dob = datetime.datetime(2008, 3, 1)
+
+    total_reviews = total_days = 0
+    for _ in range(300):
+        episodes = generate_episodes(start_date, dob, probabilities, rng)
+        reviews = generate_reviews(episodes, 1 / 100, rng)
+
+        for review in reviews:
+            assert any(e.start_date <= review.review_date < e.end_date for e in episodes)
+        total_reviews += len(reviews)
+        total_days += sum((e.end_date - e.start_date).days for e in episodes)
+
+    assert abs(total_reviews / total_days - 1 / 100) < 0.001
+
+def test_weighted_sampler():
+    values, weights = ['A', 'B', 'C', 'D'], [0.2, 0, 0.5, 0.3]
+    sampler = WeightedSampler(values, weights)
+
+    # Scalar draws match Random.choices for the same seed
+    first, second = Random(3), Random(3)
+    assert [sampler(first) for _ in range(1000)] == [second.choices(values, weights)[0] for _ in range(1000)]
+
+    samples = sampler.sample(np.random.default_rng(0), 100_000)
+    counts = [np.count_nonzero(samples == value) / len(samples) for value in values]
+    assert counts[1] == 0
+    assert np.allclose(counts, weights, atol=0.01)
+
+def test_reason_for_episode_change_sampler_is_cached():
+    probabilities = Probabilities()
+    sampler = reason_for_episode_change_sampler(probabilities)
+    assert reason_for_episode_change_sampler(Probabilities()) is sampler
+
+    probabilities.reason_for_episode_change = {'P': 1}
+    assert reason_for_episode_change_sampler(probabilities).values == ('P',)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from cscsynth.ids import DEFAULT_CHILD_ID_RANGE, FeistelPermutation, IdService, child_id_range_for
+from cscsynth.generators import generate_child_id
+from cscsynth.rng import Random
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 17, 1000, 4097])
+def test_feistel_permutation_is_a_bijection(size):
+    permutation = FeistelPermutation(size, key=1234)
+    values = [permutation(i) for i in range(size)]
+
+    assert sorted(values) == list(range(size))
+    assert permutation.permute_array(np.arange(size)).tolist() == values
+
+
+def test_feistel_permutation_depends_on_key():
+    first = FeistelPermutation(10_000, key=1).permute_array(np.arange(100))
+    second = FeistelPermutation(10_000, key=2).permute_array(np.arange(100))
+    assert not np.array_equal(first, second)
+
+    with pytest.raises(ValueError):
+        FeistelPermutation(10, key=1)(10)
+
+
+def test_id_service():
+    ids = IdService(key=99)
+    child_ids = ids.child_ids(np.arange(ids.capacity))
+
+    assert ids.capacity == 1_000_001
+    assert len(np.unique(child_ids)) == ids.capacity
+    assert child_ids.min() == 0 and child_ids.max() == 1_000_000
+
+    upns = ids.upns(np.arange(50_000))
+    assert len(np.unique(upns)) == 50_000
+    assert [ids.upn(i) for i in range(100)] == upns[:100].astype(str).tolist()
+    assert [ids.child_id(i) for i in range(100)] == child_ids[:100].tolist()
+
+
+def test_id_service_ranges():
+    ids = IdService(key=5, child_id_range=(100, 199), upn_number_range=(1, 10))
+
+    assert ids.capacity == 100
+    assert sorted(ids.child_id(i) for i in range(100)) == list(range(100, 200))
+    assert all(1 <= int(ids.upn(i)[1:]) <= 10 for i in range(100))
+
+
+def test_child_id_range_for():
+    assert child_id_range_for(1000) == DEFAULT_CHILD_ID_RANGE
+    assert child_id_range_for(3_000_000) == (0, 2_999_999)
+    assert IdService(key=5, child_id_range=child_id_range_for(3_000_000)).capacity == 3_000_000
+
+
+def test_id_service_offset():
+    ids = IdService(key=5)
+    offset_ids = IdService(key=5, offset=1000)
+
+    assert offset_ids.capacity == ids.capacity - 1000
+    assert offset_ids.child_ids(np.arange(10)).tolist() == ids.child_ids(np.arange(1000, 1010)).tolist()
+    assert [offset_ids.upn(i) for i in range(10)] == [ids.upn(1000 + i) for i in range(10)]
+
+
+def test_generate_child_id_exhausts_range():
+    child_ids = list(generate_child_id(Random(1), low=10, high=5000))
+    assert sorted(child_ids) == list(range(10, 5001))
@@ -0,0 +1,63 @@
+import datetime
+import numpy as np
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period
+from cscsynth.intervals import IntervalIndex, PopulationIndex
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+
+
+def test_interval_index():
+    starts = np.array(['2020-01-01', '2020-01-05', '2020-01-03', '2020-01-10'], dtype='datetime64[D]')
+    ends = np.array(['2020-01-05', '2020-01-08', 'NaT', '2020-01-10'], dtype='datetime64[D]')
+    index = IntervalIndex(starts, ends)
+
+    assert index.containing(datetime.date(2020, 1, 5)).tolist() == [1, 2]
+    assert index.containing(np.datetime64('2020-01-01')).tolist() == [0]
+    assert index.overlapping(datetime.date(2020, 1, 4), datetime.date(2020, 1, 6)).tolist() == [0, 1, 2]
+    assert index.count_overlapping(datetime.date(2020, 1, 4), datetime.date(2020, 1, 6)) == 3
+    assert index.count_per_day(datetime.date(2019, 12, 31), datetime.date(2020, 1, 10)).tolist() == [
+        0, 1, 1, 2, 2, 2, 2, 2, 1, 1, 1,
+    ]
+
+
+def test_population_index():
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+    children = gen.generate(400)
+    index = PopulationIndex.from_children(children)
+
+    day = datetime.datetime(2017, 6, 1)
+    in_care = [i for i, c in enumerate(children) if any(e.start_date <= day < e.end_date for e in c.episodes)]
+    assert index.children_in_care_on(day).tolist() == in_care
+
+    period_start, period_end = datetime.datetime(2017, 4, 1), datetime.datetime(2018, 4, 1)
+    child, number = index.episodes_overlapping(period_start, period_end)
+    assert sorted(zip(child.tolist(), number.tolist())) == [
+        (i, n) for i, c in enumerate(children) for n, e in enumerate(c.episodes)
+        if e.start_date < period_end and e.end_date > period_start
+    ]
+
+    # Some children have overlapping episodes, which are only counted once
+    days = [day + datetime.timedelta(days=n) for n in range(0, 400, 7)]
+    assert index.looked_after_per_day(days[0], days[-1])[::7].tolist() == [
+        sum(any(e.start_date <= d < e.end_date for e in c.episodes) for c in children) for d in days
+    ]
+
+    # Building from the arrays gives the same index as building from the children
+    arrays = gen.generate_arrays(300)
+    from_arrays = PopulationIndex.from_arrays(arrays)
+    from_children = PopulationIndex.from_children(arrays.to_children())
+    assert np.array_equal(from_arrays.care.starts, from_children.care.starts)
+    assert np.array_equal(from_arrays.care.ends, from_children.care.ends)
+    assert np.array_equal(from_arrays.children_in_care_on(day), from_children.children_in_care_on(day))
+
+
+def test_snapshot_with_index():
+    children = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2).generate(400)
+    index = PopulationIndex.from_children(children)
+
+    for year in range(2014, 2020):
+        period_start, period_end = datetime.datetime(year, 4, 1), datetime.datetime(year + 1, 4, 1)
+        assert snapshot_children_for_period(period_start, period_end, children, index=index) == \
+            snapshot_children_for_period(period_start, period_end, children)
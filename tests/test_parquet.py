@@ -0,0 +1,51 @@
+import datetime
+import pandas as pd
+import pytest
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_arrays_for_period, snapshot_children_for_period
+from cscsynth.csv import TABLES, create_episodes, create_header
+from cscsynth.parquet import create_parquet, create_parquet_from_arrays
+
+pytest.importorskip('pyarrow')
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+census_start = datetime.datetime(2017, 4, 1)
+census_end = datetime.datetime(2018, 4, 1)
+
+
+def test_create_parquet(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1)
+    children = snapshot_children_for_period(census_start, census_end, gen.generate(300))
+
+    create_parquet(children, tmpdir, chunk_size=50)
+
+    for table in TABLES:
+        assert (tmpdir / table.file_name.replace('.csv', '.parquet')).exists()
+
+    episodes = pd.read_parquet(tmpdir / 'episodes.parquet')
+    expected = create_episodes(children)
+    assert len(episodes) == len(expected)
+    assert episodes['CHILD'].tolist() == expected['CHILD'].tolist()
+    assert isinstance(episodes['LS'].dtype, pd.CategoricalDtype)
+    assert episodes['LS'].astype(str).tolist() == expected['LS'].tolist()
+
+    # DEC is written with a two digit year in the CSV, but is a full date here
+    assert episodes['DECOM'].tolist() == [e.start_date.date() for c in children for e in c.episodes]
+    assert episodes['DEC'].tolist() == [e.end_date.date() if e.end_date else None for c in children for e in c.episodes]
+
+    header = pd.read_parquet(tmpdir / 'header.parquet')
+    assert header['UPN'].tolist() == create_header(children)['UPN'].tolist()
+
+
+def test_create_parquet_from_arrays(tmpdir):
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2)
+    snapshot = snapshot_arrays_for_period(census_start, census_end, gen.generate_arrays(300))
+
+    create_parquet(snapshot.to_children(), tmpdir / 'objects', chunk_size=50)
+    create_parquet_from_arrays(snapshot, tmpdir / 'arrays', chunk_size=50)
+
+    for table in TABLES:
+        file_name = table.file_name.replace('.csv', '.parquet')
+        expected = pd.read_parquet(tmpdir / 'objects' / file_name)
+        pd.testing.assert_frame_equal(pd.read_parquet(tmpdir / 'arrays' / file_name), expected)
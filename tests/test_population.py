@@ -0,0 +1,90 @@
+import datetime
+import pickle
+import numpy as np
+import pytest
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period, snapshot_children_for_periods, write_census_for_periods
+from cscsynth.csv import create_csv
+from cscsynth.intervals import PopulationIndex
+from cscsynth.population import MappedPopulation, write_population
+
+start_date = datetime.datetime(2015, 1, 1)
+end_date = datetime.datetime(2020, 1, 1)
+
+
+@pytest.fixture(scope='module')
+def children():
+    return ChildrenGenerator(start_date=start_date, end_date=end_date, seed=1).generate(300)
+
+
+def test_mapped_population(tmpdir, children):
+    population = write_population(children, str(tmpdir.join('population.bin')))
+
+    assert len(population) == 300
+    assert list(population) == children
+    assert population[7] == children[7]
+    assert population[-1] == children[-1]
+    assert population[10:20] == children[10:20]
+    with pytest.raises(IndexError):
+        population[300]
+
+    # The columns are views of the file, not copies
+    assert isinstance(population.arrays.episodes['start_date'], np.memmap)
+
+    # Reopening and unpickling map the file again
+    assert MappedPopulation(str(tmpdir.join('population.bin')))[3] == children[3]
+    assert pickle.loads(pickle.dumps(population))[3] == children[3]
+
+
+def test_mapped_population_lookup(tmpdir, children):
+    population = write_population(children, str(tmpdir.join('population.bin')))
+
+    for i in [0, 150, 299]:
+        assert population.index_of_child_id(children[i].child_id) == i
+        assert population.index_of_upn(children[i].upn) == i
+    assert population.child_by_id(children[42].child_id) == children[42]
+    assert population.child_by_upn(children[42].upn) == children[42]
+
+    with pytest.raises(KeyError):
+        population.child_by_id(-1)
+    with pytest.raises(KeyError):
+        population.child_by_upn('Z999999999999')
+
+
+def test_census_of_mapped_population(tmpdir, children):
+    population = write_population(children, str(tmpdir.join('population.bin')))
+    period = (datetime.datetime(2018, 4, 1), datetime.datetime(2019, 3, 31))
+
+    expected = snapshot_children_for_period(*period, children)
+    assert snapshot_children_for_period(*period, population) == expected
+    assert snapshot_children_for_period(*period, population,
+                                        index=PopulationIndex.from_arrays(population.arrays)) == expected
+    assert snapshot_children_for_periods([period], population)[period] == expected
+
+    # The mapped population is indexed and only the children in the census decoded, which writes the same files as
+    # streaming the whole population
+    periods = [period, (datetime.datetime(2016, 4, 1), datetime.datetime(2017, 3, 31))]
+    write_census_for_periods(periods, population, str(tmpdir.join('indexed')))
+    write_census_for_periods(periods, iter(children), str(tmpdir.join('streamed')))
+    for name in ['2018-04-01_2019-03-31', '2016-04-01_2017-03-31']:
+        for file_name in ['header.csv', 'episodes.csv']:
+            assert tmpdir.join('indexed', name, file_name).read() == tmpdir.join('streamed', name, file_name).read()
+
+    create_csv(snapshot_children_for_period(*period, population), str(tmpdir.join('mapped')))
+    create_csv(expected, str(tmpdir.join('list')))
+    assert tmpdir.join('mapped', 'episodes.csv').read() == tmpdir.join('list', 'episodes.csv').read()
+
+
+def test_mapped_population_from_arrays(tmpdir):
+    arrays = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2).generate_arrays(200)
+    population = write_population(arrays, str(tmpdir.join('population.bin')))
+
+    for name, column in arrays.episodes.items():
+        assert np.array_equal(population.arrays.episodes[name], column)
+    assert list(population) == arrays.to_children()
+
+
+def test_mapped_population_checks_file(tmpdir):
+    tmpdir.join('other.bin').write_binary(b'not a population')
+    with pytest.raises(ValueError):
+        MappedPopulation(str(tmpdir.join('other.bin')))
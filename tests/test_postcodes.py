@@ -0,0 +1,66 @@
+import datetime
+import pickle
+import re
+import numpy as np
+import pytest
+from cscsynth import ChildrenGenerator
+from cscsynth.postcodes import PostcodePool, RandomPostcodes
+from cscsynth.rng import Random
+
+ONS_CSV = """pcd,pcd2,pcds,dointr,doterm,lat,long
+AB1 0AA,AB1  0AA,AB1 0AA,198001,199606,57.10,-2.24
+AB101AA,AB10 1AA,AB10 1AA,199606,,57.15,-2.10
+SW1A1AA,SW1A 1AA,SW1A 1AA,198001,,51.50,-0.14
+E1  6AN,E1   6AN,E1 6AN,198001,,51.52,-0.07
+"""
+LIVE_POSTCODES = {'AB10 1AA', 'SW1A 1AA', 'E1 6AN'}
+
+
+@pytest.fixture
+def pool(tmpdir):
+    source = tmpdir.join('onspd.csv')
+    source.write(ONS_CSV)
+    return PostcodePool.build(str(source), str(tmpdir.join('postcodes')))
+
+
+def test_random_postcodes():
+    postcodes = RandomPostcodes()
+    assert re.fullmatch(r'[A-Z][0-9]{1,2} [0-9][A-Z]{2}', postcodes.postcode(Random(0)))
+
+    bulk = postcodes.postcodes(np.random.default_rng(0), 1000)
+    assert all(re.fullmatch(rb'[A-Z][0-9]{1,2} [0-9][A-Z]{2}', postcode) for postcode in bulk)
+
+
+def test_postcode_pool(pool):
+    # The terminated postcode is left out
+    assert len(pool) == 3
+    assert {pool.postcode(Random(seed)) for seed in range(50)} == LIVE_POSTCODES
+    assert set(np.char.decode(pool.postcodes(np.random.default_rng(0), 100)).tolist()) == LIVE_POSTCODES
+
+    copy = pickle.loads(pickle.dumps(pool))
+    assert copy.path == pool.path
+    assert copy.postcode(Random(1)) == pool.postcode(Random(1))
+
+
+def test_postcode_pool_needs_column(tmpdir):
+    source = tmpdir.join('postcodes.csv')
+    source.write('postcode\nAB10 1AA\n')
+    with pytest.raises(ValueError):
+        PostcodePool.build(str(source), str(tmpdir.join('postcodes.npy')))
+
+
+def test_postcode_pool_rejects_long_postcodes(tmpdir):
+    source = tmpdir.join('postcodes.csv')
+    source.write('pcds\nAB10 1AA\nNOT A POSTCODE\nE1 6AN\nSW1A 1AAB\n')
+    with pytest.raises(ValueError, match='on lines 3, 5$'):
+        PostcodePool.build(str(source), str(tmpdir.join('postcodes.npy')), chunk_size=2)
+    assert not tmpdir.join('postcodes.npy').exists()
+
+
+def test_generate_with_postcode_pool(pool):
+    gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2020, 1, 1),
+                            seed=0, postcodes=pool)
+
+    for children in [gen.generate(100), gen.generate_arrays(100).to_children()]:
+        postcodes = {postcode for c in children for e in c.episodes for postcode in (e.home_postcode, e.place_postcode)}
+        assert postcodes == LIVE_POSTCODES
@@ -0,0 +1,67 @@
+import datetime
+import json
+import threading
+import time
+from cscsynth import ChildrenGenerator
+from cscsynth.census import snapshot_children_for_period
+from cscsynth.csv import create_csv
+from cscsynth.stats import Stats, collect_stats
+from cscsynth.xml import create_xml
+
+
+def test_collect_stats(tmpdir):
+    gen = ChildrenGenerator(start_date=datetime.datetime(2015, 1, 1), end_date=datetime.datetime(2020, 1, 1), seed=0)
+    progress = []
+
+    with collect_stats(progress=progress.append, progress_interval=0) as stats:
+        children = gen.generate(200)
+        snapshots = snapshot_children_for_period(datetime.datetime(2017, 4, 1), datetime.datetime(2018, 4, 1), children)
+        create_csv(snapshots, tmpdir)
+        create_xml(snapshots, tmpdir.join('903.xml'))
+
+    assert stats['children'].items == 200
+    assert stats['episodes'].items == sum(len(c.episodes) for c in children)
+    assert stats['reviews'].items == sum(len(c.reviews) for c in children)
+    assert stats['episode_changes'].items == sum(e.reason_for_new_episode != 'S' for c in children for e in c.episodes)
+    assert stats['episodes'].calls == 200
+    assert stats['generate'].seconds >= stats['episodes'].seconds > 0
+
+    assert stats['snapshot'].items == len(snapshots)
+    assert stats['csv'].items == len(snapshots)
+    assert stats['csv'].bytes == sum(f.size() for f in tmpdir.listdir(lambda f: f.ext == '.csv'))
+    assert stats['xml'].items == len(snapshots)
+
+    assert progress and progress[-1] is stats
+    assert json.loads(stats.to_json())['children']['items'] == 200
+    assert 'episodes' in stats.summary()
+
+    # Nothing is recorded once the block has ended
+    gen.generate(10)
+    assert stats['children'].items == 200
+
+
+def test_stats_from_several_threads():
+    progress = []
+    stats = Stats(progress=progress.append, progress_interval=3600)
+    # Due a progress report, which only one of the threads should make
+    stats._last_progress = time.perf_counter() - 3600
+    barrier = threading.Barrier(8)
+
+    def record(thread):
+        barrier.wait()
+        for i in range(1000):
+            stats.add(f'stage {i % 10}', items=1)
+            with stats.stage(f'thread {thread}'):
+                pass
+
+    threads = [threading.Thread(target=record, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(progress) == 1
+    assert {name: stage.items for name, stage in stats.stages.items() if name.startswith('stage')} == {
+        f'stage {i}': 800 for i in range(10)
+    }
+    assert all(stats[f'thread {thread}'].calls == 1000 for thread in range(8))
@@ -1,3 +1,4 @@
+import gzip
 import os
 import datetime
 from lxml import etree
@@ -20,9 +21,28 @@ def test_xml_schema(tmpdir):
     census_end = datetime.datetime(2018, 4, 1)
     children = snapshot_children_for_period(census_start, census_end, all_children)
 
-    output_path = os.path.join(os.path.dirname(__file__), 'output', 'generated_903.xml')
+    output_path = os.path.join(tmpdir, 'generated_903.xml')
     create_xml(children, output_path)
     
     created_xml = etree.parse(output_path)
 
     xmlschema.assert_(created_xml)
+
+
+def test_xml_gzip(tmpdir):
+    start_date = datetime.datetime(2015, 1, 1)
+    end_date = datetime.datetime(2020, 1 ,1)
+    census_start = datetime.datetime(2017, 4, 1)
+    census_end = datetime.datetime(2018, 4, 1)
+
+    gen = ChildrenGenerator(start_date=start_date, end_date=end_date, seed=2)
+    children = snapshot_children_for_period(census_start, census_end, gen.generate(num_children=200))
+
+    plain_path = os.path.join(tmpdir, 'generated_903.xml')
+    gzip_path = os.path.join(tmpdir, 'generated_903.xml.gz')
+    create_xml(children, plain_path)
+    create_xml(iter(children), gzip_path, compress=True)
+
+    with open(plain_path, 'rb') as plain, gzip.open(gzip_path, 'rb') as compressed:
+        assert compressed.read() == plain.read()
+    assert os.path.getsize(gzip_path) < os.path.getsize(plain_path)